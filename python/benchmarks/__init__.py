@@ -0,0 +1,5 @@
+"""
+Benchmarks for the DXF processing pipeline.
+
+Run from the `python` directory, e.g. `python -m benchmarks.bench_intersecting`.
+"""
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+DXF loading benchmark: the former temp-file round trip against parsing
+straight from the stream with dxf_utils.read_dxf_stream.
+
+Generates a drawing of lines, circles and polylines, keeps its bytes in
+memory the way a GridFS download arrives, and reports wall time and the
+tracemalloc peak of each loader for text and binary DXF.
+"""
+
+import argparse
+import io
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+import ezdxf
+
+from dxf_utils import read_dxf_stream
+
+
+def drawing_bytes(entities: int, fmt: str, seed: int) -> bytes:
+    rng = random.Random(seed)
+    doc = ezdxf.new("R2018")
+    msp = doc.modelspace()
+    for i in range(entities):
+        x, y = rng.uniform(0, 5000), rng.uniform(0, 5000)
+        kind = i % 3
+        if kind == 0:
+            msp.add_line((x, y), (x + rng.uniform(1, 50), y + rng.uniform(1, 50)))
+        elif kind == 1:
+            msp.add_circle((x, y), rng.uniform(1, 20))
+        else:
+            msp.add_lwpolyline([(x, y), (x + 10, y), (x + 10, y + 10), (x, y + 10)], close=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.dxf")
+        doc.saveas(path, fmt=fmt)
+        with open(path, "rb") as fp:
+            return fp.read()
+
+
+def load_via_temp_file(stream: io.BytesIO):
+    with tempfile.NamedTemporaryFile(delete=False) as temp_file:
+        temp_file.write(stream.read())
+        temp_file_path = temp_file.name
+    try:
+        return ezdxf.readfile(temp_file_path)
+    finally:
+        # the old loader never removed it, the benchmark does
+        os.unlink(temp_file_path)
+
+
+def load_via_stream(stream: io.BytesIO):
+    return read_dxf_stream(stream)
+
+
+def measure(loader, data: bytes):
+    start = time.perf_counter()
+    doc = loader(io.BytesIO(data))
+    elapsed = time.perf_counter() - start
+    count = len(doc.modelspace())
+    del doc
+
+    # tracing slows parsing down several times, so it gets a run of its own
+    tracemalloc.start()
+    loader(io.BytesIO(data))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, elapsed, peak
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("-n", "--entities", type=int, default=20000, help="entities in the generated drawing")
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args()
+
+    for fmt in ("asc", "bin"):
+        data = drawing_bytes(args.entities, fmt, args.seed)
+        print(f"{fmt} DXF, {len(data) / 2**20:.1f} MiB, {args.entities} entities")
+        for name, loader in (("temp file", load_via_temp_file), ("stream", load_via_stream)):
+            count, elapsed, peak = measure(loader, data)
+            print(f"  {name:>9}: {elapsed:7.3f}s  peak {peak / 2**20:7.1f} MiB  ({count} entities)")
+
+
+if __name__ == "__main__":
+    main()
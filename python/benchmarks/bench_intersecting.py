@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Scaling benchmark for _combine_intersecting_polygons.
+
+Scatters unit squares over a field whose size grows with the square count,
+so the share of overlapping outlines stays roughly constant, and times one
+merge pass for each size.
+"""
+
+import argparse
+import random
+import time
+
+from polygonizer.core import _combine_intersecting_polygons
+from polygonizer.dto import ClosedPolygon, Point
+
+
+def random_squares(count: int, density: float, seed: int) -> list[ClosedPolygon]:
+    rng = random.Random(seed)
+    side = (count / density) ** 0.5
+    polys = []
+    for i in range(count):
+        x = rng.uniform(0, side)
+        y = rng.uniform(0, side)
+        polys.append(ClosedPolygon(
+            points=[Point(x, y), Point(x + 1, y), Point(x + 1, y + 1), Point(x, y + 1), Point(x, y)],
+            handles=[f"sq_{i}"]
+        ))
+    return polys
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--sizes", type=int, nargs="+", default=[100, 300, 1000, 3000, 10000])
+    p.add_argument("--density", type=float, default=0.3, help="squares per unit area")
+    p.add_argument("-t", "--tol", type=float, default=0.01)
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args()
+
+    print(f"{'polygons':>10} {'merged':>10} {'best_s':>10} {'us/poly':>10}")
+    for size in args.sizes:
+        polys = random_squares(size, args.density, args.seed)
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            result = _combine_intersecting_polygons(polys, args.tol)
+            best = min(best, time.perf_counter() - start)
+        print(f"{size:>10} {len(result):>10} {best:>10.4f} {best / size * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Side-by-side benchmark of the join-based and planar polygonizer engines.
+
+Without --dxf a messy drawing is generated: outlines exported as loose,
+shuffled segments with sub-tolerance gaps, overlapping outlines and
+engraving strokes inside parts. For every input both engines run on the
+same flattened parts, and the report lists their times and how many
+polygons (as sets of source handles) the two engines agree on.
+"""
+
+import argparse
+import logging
+import random
+import time
+
+from polygonizer.core import combine_polygon_parts
+from polygonizer.dto import PolygonPart, Point
+from polygonizer.planar import polygonize_parts
+
+
+def messy_parts(count: int, tol: float, seed: int) -> list[PolygonPart]:
+    rng = random.Random(seed)
+    parts = []
+    for i in range(count):
+        x = (i % 50) * 30
+        y = (i // 50) * 30
+        w = rng.uniform(8, 20)
+        h = rng.uniform(8, 20)
+        corners = [Point(x, y), Point(x + w, y), Point(x + w, y + h), Point(x, y + h)]
+        # outline as loose segments, every joint off by less than tol
+        for k in range(4):
+            a = corners[k]
+            b = corners[(k + 1) % 4]
+            jitter = rng.uniform(-tol, tol) * 0.4
+            segment = [Point(a.x + jitter, a.y - jitter), b]
+            if rng.random() < 0.5:
+                segment.reverse()
+            parts.append(PolygonPart(points=segment, handles=[f"p{i}_edge{k}"]))
+        # engraving stroke inside the part
+        parts.append(PolygonPart(
+            points=[Point(x + 2, y + 2), Point(x + w / 2, y + h - 2), Point(x + w - 2, y + 2)],
+            handles=[f"p{i}_stroke"]
+        ))
+        # every fifth part gets an overlapping tab
+        if i % 5 == 0:
+            tab = [Point(x + w - 2, y + 2), Point(x + w + 3, y + 2), Point(x + w + 3, y + 6), Point(x + w - 2, y + 6), Point(x + w - 2, y + 2)]
+            parts.append(PolygonPart(points=tab, handles=[f"p{i}_tab"]))
+    rng.shuffle(parts)
+    return parts
+
+
+def dxf_parts(path: str, tol: float) -> list[PolygonPart]:
+    from dxf_utils import load_dxf_file
+    from polygonizer.dxf import polygon_parts_from_dxf
+
+    loaded = load_dxf_file(path)
+    return [part for part in polygon_parts_from_dxf(loaded.doc, tol, loaded.blocks) if part.is_valid()]
+
+
+def run_join(parts: list[PolygonPart], tol: float):
+    closed = [part.to_closed_polygon() for part in parts if part.is_closed(tol)]
+    opened = [part for part in parts if not part.is_closed(tol)]
+    return combine_polygon_parts(opened, closed, tol, "bench")[1]
+
+
+def run_planar(parts: list[PolygonPart], tol: float):
+    return polygonize_parts(parts, tol, "bench")
+
+
+def timed(fn, parts, tol):
+    # both engines may mutate handle lists, so each run gets fresh copies
+    fresh = [PolygonPart(points=part.coords, handles=list(part.handles)) for part in parts]
+    start = time.perf_counter()
+    result = fn(fresh, tol)
+    return result, time.perf_counter() - start
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--dxf", nargs="*", help="DXF files to compare instead of generated drawings")
+    p.add_argument("--sizes", type=int, nargs="+", default=[100, 500, 2000], help="generated parts per drawing")
+    p.add_argument("-t", "--tol", type=float, default=0.05)
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    if args.dxf:
+        inputs = [(path, dxf_parts(path, args.tol)) for path in args.dxf]
+    else:
+        inputs = [(f"generated x{size}", messy_parts(size, args.tol, args.seed)) for size in args.sizes]
+
+    print(f"{'input':>20} {'parts':>8} {'join_s':>8} {'planar_s':>9} {'join':>6} {'planar':>7} {'same':>6}")
+    for name, parts in inputs:
+        join_result, join_time = timed(run_join, parts, args.tol)
+        planar_result, planar_time = timed(run_planar, parts, args.tol)
+        join_groups = {frozenset(poly.handles) for poly in join_result}
+        planar_groups = {frozenset(poly.handles) for poly in planar_result}
+        print(f"{name:>20} {len(parts):>8} {join_time:>8.3f} {planar_time:>9.3f} "
+              f"{len(join_groups):>6} {len(planar_groups):>7} {len(join_groups & planar_groups):>6}")
+
+
+if __name__ == "__main__":
+    main()
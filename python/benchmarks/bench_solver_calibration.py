@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Calibration of the solver cost model of solver_config.py on this machine.
+
+Times nest_rust on generated jobs over a grid of part counts, outline
+vertex counts and n_samples, fits the linear cost model to the timings and
+reports the fit error. With --output the coefficients are written as JSON
+for NEST_SOLVER_COST_MODEL.
+"""
+
+import argparse
+import math
+import time
+
+import numpy as np
+from shapely.geometry import Polygon
+
+import nest_bridge
+from nest import NestPolygone, NestRequest, buildNestRequestObject
+from polygone import DxfPolygon
+from solver_config import CostModel
+
+
+def request_object(parts: int, vertices: int, n_samples: int, rng) -> dict:
+    angles = np.linspace(0, 2 * math.pi, vertices, endpoint=False)
+    distinct = max(parts // 4, 1)
+    polygones = []
+    for i in range(distinct):
+        radius = rng.uniform(20, 60, vertices)
+        outline = Polygon(np.column_stack((np.cos(angles) * radius, np.sin(angles) * radius))).convex_hull
+        polygones.append(NestPolygone(DxfPolygon(outline, []), parts // distinct + (i < parts % distinct)))
+
+    side = math.sqrt(parts) * 150
+    obj = buildNestRequestObject(NestRequest(polygones, side, side, 1, 0.1, parts))
+    obj["config"]["n_samples"] = n_samples
+    return obj
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--parts", type=int, nargs="+", default=[4, 16, 64, 256])
+    p.add_argument("--vertices", type=int, nargs="+", default=[8, 64, 256])
+    p.add_argument("--samples", type=int, nargs="+", default=[20000, 100000, 500000])
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--output", help="write the fitted model as JSON")
+    args = p.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    rows = []
+    for parts in args.parts:
+        for vertices in args.vertices:
+            for n_samples in args.samples:
+                obj = request_object(parts, vertices, n_samples, rng)
+                items = obj["input"]["Items"]
+                mean_vertices = sum(len(item["Shape"]["Data"]) * item["Demand"] for item in items) / parts
+
+                start = time.perf_counter()
+                nest_bridge.run_nest(obj)
+                elapsed = time.perf_counter() - start
+                rows.append((n_samples, parts, mean_vertices, elapsed))
+                print(f"parts {parts:4d}  vertices {mean_vertices:6.1f}  samples {n_samples:7d}: {elapsed:8.2f}s")
+
+    n_samples, parts, mean_vertices, seconds = map(np.array, zip(*rows))
+    model = CostModel.fit(n_samples, parts, mean_vertices, seconds)
+    predicted = np.array([model.predict(*row[:3]) for row in rows])
+    relative = np.abs(predicted - seconds) / np.maximum(seconds, 1e-3)
+    print(model)
+    print(f"relative error: median {np.median(relative):.1%}, max {relative.max():.1%}")
+    if args.output:
+        model.save(args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,8 @@
 from __future__ import annotations
 
-from polygonizer.main import close_polygon_from_dxf 
+from polygonizer.main import close_polygon_from_dxf, ENGINES, ENGINE_JOIN
 import ezdxf
-from dxf_utils import read_dxf_file
+from dxf_utils import load_dxf_file
 import argparse
 from utils.logger import setup_json_logger
 
@@ -13,11 +13,12 @@ if __name__ == "__main__":
     p.add_argument("--dxf", help="Input DXF file")
     p.add_argument("-t", "--tol", type=float, default=0.05, help="snap tolerance in drawing units")
     p.add_argument("-o", "--out", default="polygons.json", help="output json")
+    p.add_argument("-e", "--engine", choices=ENGINES, default=ENGINE_JOIN, help="polygonizer engine")
     args = p.parse_args()
     
-    doc = read_dxf_file(args.dxf)
+    loaded = load_dxf_file(args.dxf)
 
-    result = close_polygon_from_dxf(doc, args.tol, logger_tag="dxf_debug")
+    result = close_polygon_from_dxf(loaded.doc, args.tol, logger_tag="dxf_debug", engine=args.engine, blocks=loaded.blocks)
     logger.info("polygones found", extra={"count": len(result)})
     
     import matplotlib.pyplot as plt
@@ -26,8 +27,8 @@ if __name__ == "__main__":
     # Plot the polygons in result
     fig, ax = plt.subplots()
     for poly in result:
-        xs = [p.x for p in poly.points]
-        ys = [p.y for p in poly.points]
+        xs = poly.coords[:, 0]
+        ys = poly.coords[:, 1]
         ax.plot(xs, ys, marker='o')
         if hasattr(poly, "handles") and poly.handles:
             centroid_x = np.mean(xs)
@@ -1,37 +1,130 @@
-import tempfile
-import uuid
+from __future__ import annotations
+
+import io
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import BinaryIO, Iterable, Iterator
 import ezdxf
+import numpy as np
 from ezdxf.document import Drawing
+from ezdxf.entities import DXFEntity, Insert
+from ezdxf.filemanagement import dxf_stream_info
+from ezdxf.lldxf.tagger import binary_tags_loader
 from gridfs.synchronous.grid_file import GridOut
-from ezdxf.disassemble import recursive_decompose
+from ezdxf.protocols import SupportsVirtualEntities, virtual_entities
+from polygonizer.dxf import BlockInstance
 from utils.logger import setup_json_logger
 
 logger = setup_json_logger("dxf_utils")
 
-def read_dxf(dxf_stream: GridOut) -> Drawing:
+# Dropped while loading, text never contributes to a part outline
+TEXT_ENTITY_TYPES = frozenset(("TEXT", "MTEXT", "ATTRIB"))
+
+@dataclass
+class LoadedDxf:
+    """
+    A cleaned DXF document and, for every model space entity that was
+    decomposed from a block reference, where it came from. `dropped`
+    counts the entities left out of `doc`, by reason.
     """
-    Reads a DXF stream and returns the modelspace without entities TEXT and MTEXT.
+    doc: Drawing
+    blocks: dict[str, BlockInstance] = field(default_factory=dict)
+    dropped: dict[str, int] = field(default_factory=dict)
+
+def load_dxf(dxf_stream: GridOut) -> LoadedDxf:
+    """
+    Reads a DXF stream and returns the document without entities TEXT and MTEXT.
 
     Parameters:
         dxf_stream: The DXF string to process.
 
     Returns:
-        Modelspace: The modelspace of the DXF document.
+        LoadedDxf: The DXF document and its block reference origins.
     """
-    with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-        temp_file.write(dxf_stream.read())
-        temp_file_path = temp_file.name
+    return _clean_document(read_dxf_stream(dxf_stream))
 
-    return read_dxf_file(temp_file_path)
+def read_dxf(dxf_stream: GridOut) -> Drawing:
+    return load_dxf(dxf_stream).doc
 
 def read_dxf_file(dxf_path: str) -> Drawing:
-    doc = ezdxf.readfile(dxf_path)
-    msp = doc.modelspace()
+    return load_dxf_file(dxf_path).doc
 
-    text_entities = [entity for entity in msp if entity.dxftype() in ("TEXT", "MTEXT")]
-    
-    for entity in text_entities:
-        msp.delete_entity(entity)
+def _block_instance(entity, inserts: dict[int, tuple[int, np.ndarray, object]]) -> BlockInstance | None:
+    """Origin of a decomposed *entity*, one matrix per block reference."""
+    insert = entity.source_block_reference
+    source = entity.source_of_copy
+    if insert is None or source is None:
+        return None
+    placement = inserts.get(id(insert))
+    if placement is None:
+        # keyed by id(), so the reference itself is kept alive next to its matrix
+        placement = inserts[id(insert)] = (len(inserts), np.array(list(insert.matrix44().rows()), dtype=np.float64), insert)
+    return BlockInstance(block=insert.dxf.name, source=source, insert=placement[0], matrix=placement[1])
+
+# First bytes of every binary DXF file
+BINARY_DXF_SENTINEL = b"AutoCAD Binary DXF\r\n\x1a\x00"
+
+def read_dxf_stream(stream: BinaryIO, errors: str = "surrogateescape") -> Drawing:
+    """
+    Parses a DXF document straight from a binary stream, like
+    `ezdxf.readfile` does for paths, without an intermediate file.
+
+    Text DXF is decoded on the fly in small chunks with the encoding found
+    in its header, so peak memory is the parsed document, not a copy of the
+    file.  Binary DXF has to be read completely, ezdxf only parses it from
+    bytes.  Streams that cannot seek (needed to rewind after the header) are
+    buffered in memory first.
+    """
+    if not stream.seekable():
+        stream = io.BytesIO(stream.read())
+
+    start = stream.tell()
+    sentinel = stream.read(len(BINARY_DXF_SENTINEL))
+    if sentinel == BINARY_DXF_SENTINEL:
+        data = sentinel + stream.read()
+        return Drawing.load(binary_tags_loader(data, errors=errors))
+
+    # Header values are ASCII, every encoding can read them
+    stream.seek(start)
+    header = io.TextIOWrapper(stream, encoding="utf-8", errors="ignore")
+    try:
+        info = dxf_stream_info(header)
+    finally:
+        # detach, or the wrapper closes the stream when it is collected
+        header.detach()
+
+    stream.seek(start)
+    text = io.TextIOWrapper(stream, encoding=info.encoding, errors=errors)
+    try:
+        return ezdxf.read(text)
+    finally:
+        text.detach()
+
+def load_dxf_file(dxf_path: str) -> LoadedDxf:
+    return _clean_document(ezdxf.readfile(dxf_path))
+
+def _decompose(entities: Iterable[DXFEntity], dropped: Counter) -> Iterator[DXFEntity]:
+    """
+    `ezdxf.disassemble.recursive_decompose`, except that block entities
+    ezdxf cannot transform are counted in `dropped` instead of vanishing.
+    """
+    def skipped(entity: DXFEntity, reason: str) -> None:
+        dropped[f"block entity skipped: {reason}"] += 1
+
+    for entity in entities:
+        if isinstance(entity, Insert):
+            if entity.mcount > 1:
+                yield from _decompose(entity.multi_insert(), dropped)
+            else:
+                yield from entity.attribs
+                yield from _decompose(entity.virtual_entities(skipped_entity_callback=skipped), dropped)
+        elif isinstance(entity, SupportsVirtualEntities):
+            yield from _decompose(virtual_entities(entity), dropped)
+        else:
+            yield entity
+
+def _clean_document(doc: Drawing) -> LoadedDxf:
+    msp = doc.modelspace()
         
     new_doc = ezdxf.new(dxfversion=doc.dxfversion)
     new_msp = new_doc.modelspace()
@@ -48,20 +141,38 @@ def read_dxf_file(dxf_path: str) -> Drawing:
             existing_layer.dxf.linetype = layer.dxf.linetype
             existing_layer.dxf.lineweight = layer.dxf.lineweight
             
-    entities = recursive_decompose(msp)
+    blocks: dict[str, BlockInstance] = {}
+    inserts: dict[int, tuple[int, np.ndarray, object]] = {}
+    dropped: Counter = Counter()
     
-    # Copy all entities (except text entities which were already removed)
-    for entity in entities:
+    # One pass: filter text, decompose block references and move every entity
+    # into the new document. Entities from decomposition are already fresh
+    # virtual copies and are adopted as they are, model space entities are
+    # copied once. Binding assigns handles from the new document's counter.
+    for entity in _decompose(msp, dropped):
+        kind = entity.dxftype()
+        if kind in TEXT_ENTITY_TYPES:
+            dropped[f"text: {kind}"] += 1
+            continue
         try:
-            new_entity = entity.copy()
-            new_entity.dxf.handle = uuid.uuid4().hex[:8].upper()
-            new_msp.add_entity(new_entity.copy())
+            new_entity = entity.copy() if entity.dxf.handle is not None else entity
+            instance = _block_instance(entity, inserts)
+            new_msp.add_entity(new_entity)
         except Exception as e:
+            dropped[f"copy failed: {kind}"] += 1
             logger.warning("Warning: Could not copy entity", extra={
-                "entity_type": entity.dxftype(),
+                "entity_type": kind,
                 "handle": getattr(entity.dxf, 'handle', 'unknown'),
                 "error": e
             })
             continue
+        if instance is not None:
+            blocks[new_entity.dxf.handle] = instance
+        # drop the links back into the source document
+        new_entity.del_source_of_copy()
+        new_entity.del_source_block_reference()
+    
+    if dropped:
+        logger.info("dropped entities", extra={"dropped": dict(dropped)})
     
-    return new_doc
\ No newline at end of file
+    return LoadedDxf(doc=new_doc, blocks=blocks, dropped=dict(dropped))
@@ -1,13 +1,34 @@
+import ezdxf
 from ezdxf import transform
+from ezdxf.document import Drawing
 from ezdxf.entities import DXFGraphic
-import json
-import nest_rust
+import math
+import os
+import numpy as np
+import nest_portfolio
+import solver_config
 from polygone import DxfPolygon
+from polygonizer.congruence import congruent_groups
+import shapely
 from shapely.geometry import Polygon
 from utils.logger import setup_json_logger
 
 logger = setup_json_logger("nest")
 
+# Offset of the outlines by the spacing: shapely join style ("round", "mitre"
+# or "bevel"), mitre limit, and segments per quarter circle of round joins,
+# "auto" for as few as the tolerance allows
+OFFSET_JOIN_STYLE = os.environ.get("NEST_OFFSET_JOIN_STYLE", "round")
+OFFSET_MITRE_LIMIT = float(os.environ.get("NEST_OFFSET_MITRE_LIMIT", 5.0))
+# shapely's default, never exceeded by "auto"
+MAX_QUAD_SEGS = 16
+OFFSET_QUAD_SEGS = os.environ.get("NEST_OFFSET_QUAD_SEGS", str(MAX_QUAD_SEGS))
+# rotations of a part the solver may use, in degrees
+ALLOWED_ORIENTATIONS = [0, 90, 180, 270]
+# "entities" copies the entities of every placement into the layout,
+# "blocks" defines each part once as a BLOCK and places it by INSERTs
+OUTPUT_MODE = os.environ.get("NEST_OUTPUT_MODE", "entities")
+
 class NestPolygone:
     def __init__(self, polygone_group, count):
         self.polygone_group: DxfPolygon = polygone_group
@@ -18,90 +39,110 @@ class NestPolygone:
 
 
 class NestRequest:
-    def __init__(self, files: list[NestPolygone], width: float, height: float, spacing: float, tolerance: float, sheet_count: int):
+    def __init__(self, files: list[NestPolygone], width: float, height: float, spacing: float, tolerance: float, sheet_count: int, time_budget: float = None):
         self.items: list[NestPolygone] = files
         self.width = width
         self.height = height
         self.spacing = spacing
         self.tolerance = tolerance 
         self.sheet_count = sheet_count
+        # solver seconds the configuration is planned for, None for the fixed configuration
+        self.time_budget = time_budget
+
+class NestItem:
+    """
+    One solver item: the outline of `polygone_group` stands for every
+    congruent instance, given as (index into NestRequest.items, alignment
+    matrix onto the outline). Placements are handed out to the instances in
+    order, each instance receiving as many as its count.
+    """
+    def __init__(self, polygone_group: DxfPolygon, instances: list[tuple[int, np.ndarray]], counts: list[int]):
+        self.polygone_group = polygone_group
+        self.instances = instances
+        self.counts = counts
+
+    @property
+    def demand(self) -> int:
+        return sum(self.counts)
+
+    def placements(self):
+        for instance, count in zip(self.instances, self.counts):
+            for _ in range(count):
+                yield instance
 
 class NestResultLayout:
-    def __init__(self, dxf_entities: list[DXFGraphic] = []):
+    def __init__(self, dxf_entities: list[DXFGraphic] = [], blocks: dict[int, list[DXFGraphic]] = None, inserts: list[tuple[int, transform.Matrix44]] = None):
         self.dxf_entities = dxf_entities
+        # "blocks" output: source entities of each part by NestRequest.items
+        # index, defined once, and the part and matrix of every placement
+        self.blocks = blocks or {}
+        self.inserts = inserts or []
 
 class NestResult:
-    def __init__(self, requestCount: int, placedCount: int, layouts: list[NestResultLayout] = []):
+    def __init__(self, requestCount: int, placedCount: int, layouts: list[NestResultLayout] = [], layoutCount: int = None):
         self.requestCount = requestCount
         self.placedCount = placedCount
+        # a list, or an iterator building them one by one when nest() streams
         self.layouts = layouts
+        self.layoutCount = len(layouts) if layoutCount is None else layoutCount
 
     def __str__(self) -> str:
-        return f"NestResult -> RequestCount: {self.requestCount}, PlacedCount: {self.placedCount}, Layouts count: {len(self.layouts)}"
+        return f"NestResult -> RequestCount: {self.requestCount}, PlacedCount: {self.placedCount}, Layouts count: {self.layoutCount}"
 
 
 class Transform:
-    def __init__(self, fileIndex, x, y, angle):
+    def __init__(self, fileIndex, x, y, angle, alignment=None):
         self.fileIndex = fileIndex
         self.x = x
         self.y = y
         self.angle = angle
+        # 3x3 matrix taking the instance onto the outline the solver placed
+        self.alignment = alignment
 
     def __str__(self) -> str:
         return f"Transform -> FileIndex: {self.fileIndex}, X: {self.x}, Y: {self.y}, Angle: {self.angle}"
 
 
-def nest(nest_request: NestRequest) -> NestResult:
+def nest(nest_request: NestRequest, stream_layouts: bool = False) -> NestResult:
     items: list = nest_request.items
     totalRequest = 0
     for i in range(len(items)):
         totalRequest += items[i].count
 
-    nest_request_object = buildNestRequestObject(nest_request)
-    nest_request_json = json.dumps(nest_request_object)
+    nest_items = buildNestItems(nest_request)
+    logger.info("Nest items", extra={"parts": len(items), "items": len(nest_items)})
+
+    nest_request_object = buildNestRequestObject(nest_request, nest_items)
 
     try:
-        result_json = nest_rust.run_nest(nest_request_json)
+        item_areas = np.array([nest_item.polygone_group.polygon.area for nest_item in nest_items])
+        solution = nest_portfolio.run_portfolio(
+            nest_request_object, item_areas, nest_request.width * nest_request.height)
     except Exception as e:
         logger.error("Error executing Rust code:", extra={"error": e})
         raise e
 
-    try:
-        result = json.loads(result_json)
-        solution = result.get("Solution")
-    except json.JSONDecodeError as e:
-        logger.error("Error decoding JSON result:", extra={"error": e})
-        raise e
-    
-    layouts = solution.get("Layouts")
-    
-    totalPlacedItems = 0
-    
-    for layout in layouts:
-        placedItems = layout.get("PlacedItems")
-        totalPlacedItems += len(placedItems)
-        
+    totalPlacedItems = len(solution.placements)
+
     if (totalPlacedItems != totalRequest):
         return NestResult(totalRequest, totalPlacedItems, [])
 
-    nest_result_layouts = []
-    
-    for layout in layouts:
-        transforms = []
-        placedItems = layout.get("PlacedItems")
-        for item in placedItems:
-            index = item.get("Index")
-            transformation = item.get("Transformation")
-            rotation = transformation.get("Rotation")
-            translation = transformation.get("Translation")
-            x = translation[0]
-            y = translation[1]
-            transforms.append(Transform(index, x, y, rotation))
-        
-        dxf_entities = buildResultDxf(nest_request, transforms)
-        nest_result_layouts.append(NestResultLayout(dxf_entities))
-
-    return NestResult(totalRequest, totalPlacedItems, nest_result_layouts)
+    instances = [nest_item.placements() for nest_item in nest_items]
+
+    def buildLayouts():
+        for layout_index in range(solution.layout_count):
+            transforms = []
+            for index, rotation, x, y in solution.layout(layout_index)[["item", "rotation", "x", "y"]].tolist():
+                fileIndex, alignment = next(instances[index])
+                transforms.append(Transform(fileIndex, x, y, rotation, alignment))
+
+            if OUTPUT_MODE == "blocks":
+                yield buildResultBlocks(nest_request, transforms)
+            else:
+                yield NestResultLayout(buildResultDxf(nest_request, transforms))
+
+    nest_result_layouts = buildLayouts() if stream_layouts else list(buildLayouts())
+    return NestResult(totalRequest, totalPlacedItems, nest_result_layouts, solution.layout_count)
 
 
 def buildResultDxf(nestRequest: NestRequest, transforms) -> list[DXFGraphic]:
@@ -116,18 +157,130 @@ def buildResultDxf(nestRequest: NestRequest, transforms) -> list[DXFGraphic]:
             # Add all entities to the List
             entities.append(nest_poly.polygone_group.entities[i].copy())
 
-        rotationMatrix = transform.Matrix44.z_rotate(innerTransform.angle)
-        translationMatrix = transform.Matrix44.translate(innerTransform.x, innerTransform.y, 0)
-
-        transform.inplace(entities, m=rotationMatrix * translationMatrix)
+        transform.inplace(entities, m=placementMatrix(innerTransform))
         for entity in entities:
             dxf_entities.append(entity)
 
     return dxf_entities
 
 
-def buildNestRequestObject(nestRequest: NestRequest):
-    items = buildRequestItems(nestRequest)
+def buildResultBlocks(nestRequest: NestRequest, transforms) -> NestResultLayout:
+    blocks = {}
+    inserts = []
+    for innerTransform in transforms:
+        if innerTransform.fileIndex not in blocks:
+            blocks[innerTransform.fileIndex] = nestRequest.items[innerTransform.fileIndex].polygone_group.entities
+        inserts.append((innerTransform.fileIndex, placementMatrix(innerTransform)))
+    return NestResultLayout([], blocks, inserts)
+
+
+def partBlockName(index: int) -> str:
+    return f"PART_{index + 1}"
+
+
+def insertAttribs(matrix: transform.Matrix44) -> dict:
+    """Rotation and scale of an INSERT placing a block by the 2D `matrix`, a mirror flips the y scale."""
+    ux, uy = matrix.ux, matrix.uy
+    mirrored = ux.x * uy.y - ux.y * uy.x < 0
+    return {
+        "rotation": math.degrees(ux.angle),
+        "xscale": ux.magnitude,
+        "yscale": -uy.magnitude if mirrored else uy.magnitude,
+    }
+
+
+def buildLayoutDoc(nest_layout: NestResultLayout) -> Drawing:
+    doc = ezdxf.new(dxfversion='R2010', units=4)
+    msp = doc.modelspace()
+
+    block_entities = {
+        index: [entity.copy() for entity in entities] for index, entities in nest_layout.blocks.items()
+    }
+    entities = nest_layout.dxf_entities + [entity for part in block_entities.values() for entity in part]
+    
+    # Get all unique colors from entities
+    colors = set()
+    for entity in entities:
+        if hasattr(entity, 'dxf') and hasattr(entity.dxf, 'color'):
+            colors.add(entity.dxf.color)
+    
+    # Create layers for each color and add them to the document
+    for color in colors:
+        layer_name = f"Color_{color}"
+        if layer_name not in doc.layers:
+            layer = doc.layers.add(name=layer_name)
+            layer.color = color
+    
+    # Attach entities to their corresponding color layers
+    for entity in entities:
+        if hasattr(entity, 'dxf') and hasattr(entity.dxf, 'color'):
+            color = entity.dxf.color
+            layer_name = f"Color_{color}"
+            entity.dxf.layer = layer_name
+
+    for entity in nest_layout.dxf_entities:
+        msp.add_entity(entity)
+
+    # Parts defined once, placed by reference
+    for index, part in block_entities.items():
+        block = doc.blocks.new(name=partBlockName(index))
+        for entity in part:
+            block.add_entity(entity)
+    for index, matrix in nest_layout.inserts:
+        msp.add_blockref(partBlockName(index), matrix.origin, dxfattribs=insertAttribs(matrix))
+
+    return doc
+
+
+def placementMatrix(innerTransform: Transform) -> transform.Matrix44:
+    rotationMatrix = transform.Matrix44.z_rotate(innerTransform.angle)
+    translationMatrix = transform.Matrix44.translate(innerTransform.x, innerTransform.y, 0)
+
+    matrix = rotationMatrix * translationMatrix
+    if innerTransform.alignment is not None:
+        matrix = alignmentMatrix(innerTransform.alignment) * matrix
+    return matrix
+
+
+def alignmentMatrix(alignment: np.ndarray) -> transform.Matrix44:
+    # ezdxf transforms row vectors, the alignment column vectors
+    return transform.Matrix44([
+        alignment[0, 0], alignment[1, 0], 0, 0,
+        alignment[0, 1], alignment[1, 1], 0, 0,
+        0, 0, 1, 0,
+        alignment[0, 2], alignment[1, 2], 0, 1
+    ])
+
+
+def buildNestItems(nestRequest: NestRequest) -> list[NestItem]:
+    """
+    Collapse congruent parts into one item each, the solver only sees
+    distinct outlines. Parts are only merged when they have the same holes
+    and one turns into the other by an allowed orientation, so an instance
+    is never placed at an angle its own item would not allow.
+    """
+    indices = [i for i, file in enumerate(nestRequest.items) if not file.polygone_group.polygon.is_empty]
+    rings = [nestRequest.items[i].polygone_group.polygon.exterior.coords for i in indices]
+    holes = [nestRequest.items[i].polygone_group.holes for i in indices]
+
+    nest_items = []
+    for group in congruent_groups(rings, nestRequest.tolerance, holes, ALLOWED_ORIENTATIONS):
+        instances = [(indices[member], alignment) for member, alignment in group.members]
+        nest_items.append(NestItem(
+            nestRequest.items[indices[group.representative]].polygone_group,
+            instances,
+            [nestRequest.items[i].count for i, _ in instances]
+        ))
+    return nest_items
+
+
+def buildNestRequestObject(nestRequest: NestRequest, nestItems: list[NestItem] = None):
+    items = buildRequestItems(nestRequest, nestItems)
+    if nestRequest.time_budget is None:
+        solver = solver_config.DEFAULT_PLAN
+    else:
+        solver = solver_config.plan(items, nestRequest.time_budget)
+        logger.info("Solver plan", extra={"budget": nestRequest.time_budget, **solver})
 
     return {
         "uuid": "1234",
@@ -157,8 +310,8 @@ def buildNestRequestObject(nestRequest: NestRequest):
         },
         "config": {
             "cde_config": {
-                "quadtree_depth": 5,
-                "hpg_n_cells": 2000,
+                "quadtree_depth": solver["quadtree_depth"],
+                "hpg_n_cells": solver["hpg_n_cells"],
                 "item_surrogate_config": {
                     "pole_coverage_goal": 0.9,
                     "max_poles": 10,
@@ -168,55 +321,105 @@ def buildNestRequestObject(nestRequest: NestRequest):
             },
             "poly_simpl_tolerance": nestRequest.tolerance,
             "prng_seed": 0,
-            "n_samples": 500000,
+            "n_samples": solver["n_samples"],
             "ls_frac": 0.2
         }
     }
 
 
-def buildRequestItems(nestRequest: NestRequest):
-    data = []
-    for file in nestRequest.items:
-        fileItems = convertPolygoneGroupToJaguarRequest(
-            file.polygone_group, file.count, nestRequest.spacing, nestRequest.tolerance)
-        data.extend(fileItems)
-    return data
-
+def buildRequestItems(nestRequest: NestRequest, nestItems: list[NestItem] = None):
+    if nestItems is None:
+        nestItems = buildNestItems(nestRequest)
+    return convertPolygoneGroupsToJaguarRequest(
+        [nestItem.polygone_group for nestItem in nestItems],
+        [nestItem.demand for nestItem in nestItems],
+        nestRequest.spacing, nestRequest.tolerance)
+
+
+def offsetQuadSegs(spacing: float, tolerance: float) -> int:
+    """Segments per quarter circle of a round offset, or fewer so no chord strays more than `tolerance` from the arc."""
+    if OFFSET_QUAD_SEGS != "auto":
+        return int(OFFSET_QUAD_SEGS)
+    if spacing <= 0 or tolerance >= spacing:
+        return 1
+    segment_angle = 2 * math.acos(1 - tolerance / spacing)
+    return min(MAX_QUAD_SEGS, max(1, math.ceil(math.pi / 2 / segment_angle)))
+
+
+def offsetDistance(spacing: float, quadSegs: int) -> float:
+    """
+    Buffer distance for `spacing` with `quadSegs` segments per quarter
+    circle. Below shapely's default the round joins are pushed out by the
+    chord error, so no chord comes closer to the outline than `spacing`.
+    GEOS rounds the segment count of each join, so a chord spans up to 1.5
+    segment angles.
+    """
+    if OFFSET_JOIN_STYLE != "round" or quadSegs >= MAX_QUAD_SEGS:
+        return spacing
+    return spacing / math.cos(0.75 * math.pi / 2 / quadSegs)
+
+
+def thinRing(ring: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Keep the first vertex and every vertex at least sqrt(2) * tolerance away
+    from the last vertex kept.
+
+    Neighbour distances are checked for the whole ring at once; only after a
+    dropped vertex does the comparison point differ from the predecessor, so
+    those stretches are re-walked one by one.
+    """
+    min_distance = 2 * tolerance * tolerance
+    steps = ring[1:] - ring[:-1]
+    near = np.flatnonzero(np.einsum("ij,ij->i", steps, steps) < min_distance) + 1
+    if not len(near):
+        return ring
+
+    keep = np.ones(len(ring), dtype=bool)
+    rows = ring.tolist()
+    n = len(rows)
+    i = int(near[0])
+    while i < n:
+        last_x, last_y = rows[i - 1]
+        while i < n and (rows[i][0] - last_x) ** 2 + (rows[i][1] - last_y) ** 2 < min_distance:
+            keep[i] = False
+            i += 1
+        nxt = np.searchsorted(near, i + 1)
+        if nxt == len(near):
+            break
+        i = int(near[nxt])
+    return ring[keep]
+
+
+def convertPolygoneGroupsToJaguarRequest(groups: list[DxfPolygon], counts: list[int], spacing: float, tolerance: float) -> list[dict]:
+    """Offset all outlines by `spacing` in one call and thin their vertices by `tolerance`, one item per non-empty group."""
+    counts = [count for group, count in zip(groups, counts) if not group.polygon.is_empty]
+    polygons = np.array([group.polygon for group in groups if not group.polygon.is_empty], dtype=object)
+    quadSegs = offsetQuadSegs(spacing, tolerance)
+    buffered = shapely.buffer(
+        polygons, offsetDistance(spacing, quadSegs),
+        quad_segs=quadSegs, join_style=OFFSET_JOIN_STYLE, mitre_limit=OFFSET_MITRE_LIMIT
+    )
+    rings = shapely.get_exterior_ring(buffered)
+    if shapely.is_missing(rings).any():
+        raise Exception(f"Invalid polygon, offset is not a single polygon, {buffered[shapely.is_missing(rings)][0]}")
+    coords, ring_index = shapely.get_coordinates(rings, return_index=True)
+    bounds = np.searchsorted(ring_index, np.arange(len(rings) + 1))
 
-def convertPolygoneGroupToJaguarRequest(grop: DxfPolygon, count: int, spacing: float, tolerance: float) -> list[dict]:
     items = []
-    poly: Polygon = grop.polygon
-    if poly.is_empty:
-        return []
+    for i, count in enumerate(counts):
+        points = thinRing(coords[bounds[i]:bounds[i + 1]], tolerance)
+        if len(points) < 3:
+            raise Exception(f"Invalid polygon, less than 3 points, {points}")
+        items.append({
+            "Demand": count,
+            "AllowedOrientations": ALLOWED_ORIENTATIONS,
+            "Shape": {
+                "Type": "SimplePolygon",
+                "Data": points
+            }
+        })
+    return items
 
-    poly = poly.buffer(spacing)
 
-    xs, ys = poly.exterior.xy
-    points: list[list[float]] = []
-    
-    prev_point = [xs[0], ys[0]]
-    points.append(prev_point)
-    
-    for i in range(len(xs)):
-        # check in new paint avay from previus point by tolerance
-        dx = xs[i] - prev_point[0]
-        dy = ys[i] - prev_point[1]
-        distance = (dx * dx + dy * dy)
-        if distance < (tolerance * tolerance * 2):
-            continue
-        prev_point = [xs[i], ys[i]]
-        points.append([xs[i], ys[i]])
-        
-    if len(points) < 3:
-        raise Exception(f"Invalid polygon, less than 3 points, {points}")
-    
-    items.append({
-        "Demand": count,
-        "AllowedOrientations": [0, 90, 180, 270],
-        "Shape": {
-            "Type": "SimplePolygon",
-            "Data": points
-        }
-    })
-
-    return items
+def convertPolygoneGroupToJaguarRequest(grop: DxfPolygon, count: int, spacing: float, tolerance: float) -> list[dict]:
+    return convertPolygoneGroupsToJaguarRequest([grop], [count], spacing, tolerance)
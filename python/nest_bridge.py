@@ -0,0 +1,81 @@
+"""
+Transport of a nest request to nest_rust and of its placements back.
+
+`run_nest` sends the whole request object as one JSON string through
+`nest_rust.run_nest` and decodes the layouts it returns into a
+`NestSolution`: the placements as `PLACEMENT_DTYPE` records, in layout
+order, which the portfolio and the layout building index directly.
+"""
+from __future__ import annotations
+
+import importlib.metadata
+import json
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+
+from utils.logger import setup_json_logger
+
+logger = setup_json_logger("nest_bridge")
+
+PLACEMENT_DTYPE = np.dtype([
+    ("layout", "<u4"),
+    ("item", "<u4"),
+    ("rotation", "<f8"),
+    ("x", "<f8"),
+    ("y", "<f8"),
+])
+
+@dataclass
+class NestSolution:
+    layout_count: int
+    placements: np.ndarray
+
+    def layout(self, index: int) -> np.ndarray:
+        return self.placements[self.placements["layout"] == index]
+
+def _shape_data(item: dict) -> np.ndarray:
+    return np.asarray(item["Shape"]["Data"], dtype="<f8").reshape(-1, 2)
+
+def encode_json(request_object: dict) -> str:
+    items = [
+        {**item, "Shape": {**item["Shape"], "Data": _shape_data(item).tolist()}}
+        for item in request_object["input"]["Items"]
+    ]
+    return json.dumps({**request_object, "input": {**request_object["input"], "Items": items}})
+
+def decode_json(result_json: str) -> NestSolution:
+    layouts = json.loads(result_json).get("Solution").get("Layouts")
+    placements = np.array([
+        (
+            layout_index,
+            placed["Index"],
+            placed["Transformation"]["Rotation"],
+            placed["Transformation"]["Translation"][0],
+            placed["Transformation"]["Translation"][1],
+        )
+        for layout_index, layout in enumerate(layouts)
+        for placed in layout.get("PlacedItems")
+    ], dtype=PLACEMENT_DTYPE)
+    return NestSolution(len(layouts), placements)
+
+@lru_cache(maxsize=1)
+def solver_version() -> Optional[str]:
+    """Version of the installed nest_rust build, None where it is not installed."""
+    try:
+        return importlib.metadata.version("nest_rust")
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+def run_nest(request_object: dict) -> NestSolution:
+    # imported here so the codecs work where the extension is not built
+    import nest_rust
+
+    result_json = nest_rust.run_nest(encode_json(request_object))
+    try:
+        return decode_json(result_json)
+    except json.JSONDecodeError as e:
+        logger.error("Error decoding JSON result:", extra={"error": e})
+        raise e
@@ -0,0 +1,160 @@
+"""
+Portfolio of solver runs: the same nest request with several PRNG seeds
+(and optionally several `ls_frac` values) solved side by side, one process
+per run and at most `workers` at once. The best solution wins: most items placed, then fewest layouts, then
+highest utilization of the sheets used. Runs still going are terminated as
+soon as one solution reaches the target, i.e. places every item on no more
+sheets than the parts' area requires or reaches the target utilization.
+
+The first variant is the request as built, so a portfolio of one is a
+plain solver run.
+
+A run that raises, or whose process dies (a Rust panic or a crash), is
+skipped, as are runs not finished within the time limit; the best of the
+remaining solutions wins.
+"""
+from __future__ import annotations
+
+import math
+import multiprocessing
+import os
+import time
+from multiprocessing.connection import Connection, wait
+from multiprocessing.process import BaseProcess
+from typing import Callable, Optional
+
+import numpy as np
+
+import nest_bridge
+from nest_bridge import NestSolution
+from utils.logger import setup_json_logger
+
+logger = setup_json_logger("nest_portfolio")
+
+PORTFOLIO_SIZE = int(os.environ.get("NEST_PORTFOLIO_SIZE", 1))
+PORTFOLIO_WORKERS = int(os.environ.get("NEST_PORTFOLIO_WORKERS", os.cpu_count() or 1))
+# ls_frac values cycled through the variants, comma separated; empty keeps the request's
+PORTFOLIO_LS_FRACS = [float(f) for f in os.environ.get("NEST_PORTFOLIO_LS_FRACS", "").split(",") if f.strip()]
+PORTFOLIO_TARGET_UTILIZATION = float(os.environ.get("NEST_PORTFOLIO_TARGET_UTILIZATION", 1.0))
+# wall-clock limit of one run in seconds, 0 for none
+PORTFOLIO_RUN_TIMEOUT = float(os.environ.get("NEST_PORTFOLIO_RUN_TIMEOUT_S", 0))
+
+def variants(request_object: dict, size: int, ls_fracs: list[float]) -> list[dict]:
+    config = request_object["config"]
+    ls_fracs = ls_fracs or [config["ls_frac"]]
+    return [
+        {**request_object, "config": {**config, "prng_seed": config["prng_seed"] + i, "ls_frac": ls_fracs[i % len(ls_fracs)]}}
+        for i in range(size)
+    ]
+
+def utilization(solution: NestSolution, item_areas: np.ndarray, sheet_area: float) -> float:
+    if solution.layout_count == 0:
+        return 0.0
+    return float(item_areas[solution.placements["item"]].sum()) / (solution.layout_count * sheet_area)
+
+def _run_variant(solve: Callable[[dict], NestSolution], request_object: dict, connection: Connection) -> None:
+    """Send (solution, error, seconds) of one run back through `connection`."""
+    start = time.perf_counter()
+    try:
+        solution, error = solve(request_object), None
+    except Exception as e:
+        solution, error = None, str(e)
+    connection.send((solution, error, time.perf_counter() - start))
+    connection.close()
+
+def _stop(process: BaseProcess, connection: Connection) -> Optional[int]:
+    """Terminate the run if it still goes, returns its exit code."""
+    if process.is_alive():
+        process.terminate()
+    process.join()
+    exitcode = process.exitcode
+    process.close()
+    connection.close()
+    return exitcode
+
+def run_portfolio(
+    request_object: dict,
+    item_areas: np.ndarray,
+    sheet_area: float,
+    size: int = PORTFOLIO_SIZE,
+    workers: int = PORTFOLIO_WORKERS,
+    ls_fracs: Optional[list[float]] = None,
+    target_utilization: float = PORTFOLIO_TARGET_UTILIZATION,
+    timeout: float = PORTFOLIO_RUN_TIMEOUT,
+    solve: Callable[[dict], NestSolution] = nest_bridge.run_nest,
+) -> NestSolution:
+    """
+    Best solution of the portfolio. `solve` runs in the worker processes,
+    so it must be picklable, a module-level function.
+    """
+    requests = variants(request_object, max(size, 1), PORTFOLIO_LS_FRACS if ls_fracs is None else ls_fracs)
+    if len(requests) == 1:
+        return solve(requests[0])
+
+    items = request_object["input"]["Items"]
+    demand = sum(item["Demand"] for item in items)
+    min_layouts = math.ceil(float(np.dot(item_areas, [item["Demand"] for item in items])) / sheet_area)
+    workers = max(min(workers, len(requests)), 1)
+
+    context = multiprocessing.get_context("spawn")
+    waiting = list(requests)
+    # receiving end of each run still going: its process, config and deadline
+    running: dict[Connection, tuple[BaseProcess, dict, Optional[float]]] = {}
+    best, best_rank, errors = None, None, []
+    try:
+        while waiting or running:
+            while waiting and len(running) < workers:
+                request = waiting.pop(0)
+                receiver, sender = context.Pipe(duplex=False)
+                process = context.Process(target=_run_variant, args=(solve, request, sender))
+                process.start()
+                # the run's end only, so its death reads as end of file
+                sender.close()
+                running[receiver] = (process, request["config"], time.monotonic() + timeout if timeout > 0 else None)
+
+            deadlines = [deadline for _, _, deadline in running.values() if deadline is not None]
+            ready = wait(list(running), timeout=max(min(deadlines) - time.monotonic(), 0) if deadlines else None)
+
+            target_reached = False
+            now = time.monotonic()
+            for receiver, (process, config, deadline) in list(running.items()):
+                if receiver in ready:
+                    try:
+                        solution, error, elapsed = receiver.recv()
+                    except EOFError:
+                        solution, error = None, "the worker process died"
+                elif deadline is not None and now >= deadline:
+                    solution, error = None, f"run exceeded the time limit of {timeout:g}s"
+                else:
+                    continue
+                del running[receiver]
+                exitcode = _stop(process, receiver)
+
+                if error is not None:
+                    errors.append(error)
+                    logger.warning("Portfolio run failed", extra={"seed": config["prng_seed"], "ls_frac": config["ls_frac"], "error": error, "exitcode": exitcode})
+                    continue
+
+                usage = utilization(solution, item_areas, sheet_area)
+                rank = (len(solution.placements), -solution.layout_count, usage)
+                logger.info("Portfolio run", extra={
+                    "seed": config["prng_seed"],
+                    "ls_frac": config["ls_frac"],
+                    "placed": len(solution.placements),
+                    "layouts": solution.layout_count,
+                    "utilization": usage,
+                    "time": elapsed
+                })
+                if best_rank is None or rank > best_rank:
+                    best, best_rank = solution, rank
+                if len(solution.placements) == demand and (solution.layout_count <= min_layouts or usage >= target_utilization):
+                    target_reached = True
+            if target_reached:
+                break
+    finally:
+        for receiver, (process, _, _) in running.items():
+            _stop(process, receiver)
+
+    if best is None:
+        raise RuntimeError(f"All {len(requests)} portfolio runs failed: {errors[0]}")
+    return best
@@ -0,0 +1,85 @@
+"""
+Shared store of nest results keyed by a canonical hash of the request, so
+a resubmitted job reuses the layouts of an identical earlier one.
+
+An entry is claimed by the job computing it (`status: processing`) and
+completed with the job's output fields (`status: done`). A claim older than
+the stale limit, left behind by a worker that died, is taken over by the
+next identical job. Done entries expire after `ttl_days`.
+"""
+from __future__ import annotations
+
+import datetime
+import hashlib
+import json
+import os
+from typing import Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+RESULT_TTL_DAYS = float(os.environ.get("NEST_RESULT_TTL_DAYS", 30))
+
+def request_hash(owner_id, files: list[tuple[str, int]], params: dict, config: dict) -> str:
+    """
+    Hash of everything that determines a nest result: the owner (output
+    files are theirs), the identity and count of each file regardless of
+    order, the job parameters and the worker settings affecting the result.
+    """
+    canonical = json.dumps({
+        "owner": str(owner_id),
+        "files": sorted([file_id, int(count)] for file_id, count in files),
+        "params": params,
+        "config": config,
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class NestResultStore:
+    def __init__(self, db, collection_name: str = "nest_results", ttl_days: float = RESULT_TTL_DAYS):
+        self.ttl_days = ttl_days
+        self._results = db[collection_name]
+
+    def ensure_indexes(self) -> None:
+        """Create the index expiring done entries, once at worker start."""
+        self._results.create_index("finishedAt", expireAfterSeconds=int(self.ttl_days * 86400))
+
+    def claim(self, key: str, job_id, stale_seconds: float) -> Optional[dict]:
+        """
+        Claim computing `key` for `job_id`. Returns None when the claim
+        succeeded, else the entry of the identical request, done or still
+        processing.
+        """
+        now = datetime.datetime.now()
+        stale = self._results.find_one_and_update(
+            {"_id": key, "status": "processing", "startedAt": {"$lt": now - datetime.timedelta(seconds=stale_seconds)}},
+            {"$set": {"jobId": job_id, "startedAt": now}}
+        )
+        if stale is not None:
+            return None
+        try:
+            return self._results.find_one_and_update(
+                {"_id": key},
+                {"$setOnInsert": {"status": "processing", "jobId": job_id, "startedAt": now}},
+                upsert=True,
+                return_document=ReturnDocument.BEFORE
+            )
+        except DuplicateKeyError:
+            # an identical job inserted it at the same moment
+            return self._results.find_one({"_id": key})
+
+    def get(self, key: str) -> Optional[dict]:
+        return self._results.find_one({"_id": key})
+
+    def complete(self, key: str, job_id, result: dict) -> None:
+        self._results.update_one(
+            {"_id": key, "jobId": job_id},
+            {"$set": {**result, "status": "done", "finishedAt": datetime.datetime.now()}}
+        )
+
+    def discard(self, key: str) -> None:
+        """Drop a done entry whose layouts are no longer there to copy."""
+        self._results.delete_one({"_id": key, "status": "done"})
+
+    def abandon(self, key: str, job_id) -> None:
+        """Drop the claim of `job_id`, if it still holds it, so an identical job computes it."""
+        self._results.delete_one({"_id": key, "jobId": job_id, "status": "processing"})
@@ -0,0 +1,217 @@
+"""
+Content-addressed cache of polygonization results.
+
+A result is the cleaned DXF text plus its closed polygons, stored in the
+compact form of `polygonizer.codec`. Entries are keyed by the sha256 of the
+uploaded content, the tolerance, the polygonizer version and the engine, so
+a re-nest of the same drawing, uploaded once or again, skips loading and
+polygonizing.
+
+Two tiers: a byte-bounded LRU in the worker process and a GridFS bucket
+shared by all workers, trimmed to a size bound by least recent use.
+Results precomputed on upload are pinned in the shared tier, under a size
+bound of their own, until their first use.
+"""
+from __future__ import annotations
+
+import datetime
+import hashlib
+import os
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import gridfs
+from pymongo.errors import PyMongoError
+
+from polygonizer import __version__ as POLYGONIZER_VERSION
+from polygonizer.codec import decode_result, encode_result
+from polygonizer.dto import ClosedPolygon
+from utils.logger import setup_json_logger
+
+logger = setup_json_logger("polygon_cache")
+
+MEMORY_LIMIT = int(os.environ.get("NEST_POLYGON_CACHE_MEMORY_MB", 256)) * 2**20
+SHARED_LIMIT = int(os.environ.get("NEST_POLYGON_CACHE_SHARED_MB", 4096)) * 2**20
+PINNED_LIMIT = int(os.environ.get("NEST_POLYGON_CACHE_PINNED_MB", 1024)) * 2**20
+HASH_CHUNK_SIZE = 2**20
+
+def file_identity(dxf_stream, files=None) -> str:
+    """
+    sha256 of the content of a GridFS file, from `metadata.sha256` when it
+    was recorded, else hashed from the stream, which is rewound after. With
+    `files`, the files collection of the stream's bucket, a computed hash
+    is recorded so the next read of the upload does not hash it again.
+    """
+    digest = (getattr(dxf_stream, "metadata", None) or {}).get("sha256")
+    if not digest:
+        sha256 = hashlib.sha256()
+        for chunk in iter(lambda: dxf_stream.read(HASH_CHUNK_SIZE), b""):
+            sha256.update(chunk)
+        dxf_stream.seek(0)
+        digest = sha256.hexdigest()
+        if files is not None:
+            try:
+                files.update_one({"_id": dxf_stream._id}, {"$set": {"metadata.sha256": digest}})
+            except PyMongoError as e:
+                logger.warning("file hash not recorded", extra={"error": str(e)})
+    return f"sha256:{digest}"
+
+def cache_key(file_id: str, tolerance: float, engine: str) -> str:
+    raw = f"{file_id}|{float(tolerance)!r}|{POLYGONIZER_VERSION}|{engine}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class MemoryTier:
+    """LRU of encoded results, bounded by their total size in bytes."""
+    def __init__(self, limit_bytes: int = MEMORY_LIMIT):
+        self.limit_bytes = limit_bytes
+        self.size = 0
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+
+    def get(self, key: str) -> Optional[bytes]:
+        data = self._entries.get(key)
+        if data is not None:
+            self._entries.move_to_end(key)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        if len(data) > self.limit_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous)
+        self._entries[key] = data
+        self.size += len(data)
+        while self.size > self.limit_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class GridFSTier:
+    """
+    Encoded results in a GridFS bucket, one file per key. Reads refresh
+    `metadata.lastUsedAt`; writes trim the bucket back under `limit_bytes`
+    starting with the least recently used files. Pinned files (results
+    precomputed on upload, see worker_polygonize.py) are kept out of that
+    eviction until their first read unpins them; they are trimmed to
+    `pinned_limit_bytes` of their own, oldest first. `prune` removes what
+    can no longer be hit.
+    """
+    def __init__(self, db, bucket_name: str = "polygonCache", limit_bytes: int = SHARED_LIMIT, pinned_limit_bytes: int = PINNED_LIMIT):
+        self.limit_bytes = limit_bytes
+        self.pinned_limit_bytes = pinned_limit_bytes
+        self._bucket = gridfs.GridFSBucket(db, bucket_name=bucket_name)
+        self._files = db[f"{bucket_name}.files"]
+
+    def ensure_indexes(self) -> None:
+        """Create the indexes eviction sorts by, once at worker start."""
+        self._files.create_index("metadata.lastUsedAt")
+        self._files.create_index([("metadata.pinned", 1), ("metadata.lastUsedAt", 1)])
+
+    def get(self, key: str) -> Optional[bytes]:
+        meta = self._files.find_one_and_update(
+            {"filename": key},
+            {"$set": {"metadata.lastUsedAt": datetime.datetime.now(), "metadata.pinned": False}},
+            projection={"_id": 1},
+            sort=[("uploadDate", -1)]
+        )
+        if meta is None:
+            return None
+        try:
+            return self._bucket.open_download_stream(meta["_id"]).read()
+        except gridfs.errors.NoFile:
+            # evicted by another worker in between
+            return None
+
+    def put(self, key: str, data: bytes, metadata: dict, pinned: bool = False) -> None:
+        self._bucket.upload_from_stream(
+            key, data, metadata={**metadata, "pinned": pinned, "lastUsedAt": datetime.datetime.now()}
+        )
+        self._evict(pinned)
+
+    def prune(self, live_file_ids: set[str]) -> int:
+        """
+        Delete the entries of other polygonizer versions and of files not
+        in `live_file_ids`, i.e. deleted uploads. Returns how many went.
+        """
+        deleted = 0
+        for file in self._files.find({}, {"metadata.fileId": 1, "metadata.polygonizerVersion": 1}):
+            metadata = file.get("metadata") or {}
+            if metadata.get("polygonizerVersion") == POLYGONIZER_VERSION and metadata.get("fileId") in live_file_ids:
+                continue
+            try:
+                self._bucket.delete(file["_id"])
+            except gridfs.errors.NoFile:
+                continue
+            deleted += 1
+        return deleted
+
+    def _evict(self, pinned: bool) -> None:
+        query = {"metadata.pinned": True} if pinned else {"metadata.pinned": {"$ne": True}}
+        limit = self.pinned_limit_bytes if pinned else self.limit_bytes
+        totals = list(self._files.aggregate([{"$match": query}, {"$group": {"_id": None, "size": {"$sum": "$length"}}}]))
+        size = totals[0]["size"] if totals else 0
+        if size <= limit:
+            return
+        for file in self._files.find(query, {"length": 1}).sort("metadata.lastUsedAt", 1):
+            if size <= limit:
+                break
+            try:
+                self._bucket.delete(file["_id"])
+            except gridfs.errors.NoFile:
+                continue
+            size -= file["length"]
+
+class PolygonCache:
+    """
+    Memory tier in front of an optional shared tier. Failures of the shared
+    tier are logged and count as misses, a job never fails because of the
+    cache.
+    """
+    def __init__(self, memory: Optional[MemoryTier] = None, shared: Optional[GridFSTier] = None):
+        self.memory = memory if memory is not None else MemoryTier()
+        self.shared = shared
+        self.hits = {"memory": 0, "shared": 0}
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Tuple[List[ClosedPolygon], str]]:
+        tier = "memory"
+        data = self.memory.get(key)
+        if data is None and self.shared is not None:
+            tier = "shared"
+            try:
+                data = self.shared.get(key)
+            except PyMongoError as e:
+                logger.warning("polygon cache shared tier unavailable", extra={"error": str(e)})
+            if data is not None:
+                self.memory.put(key, data)
+
+        result = None
+        if data is not None:
+            try:
+                result = decode_result(data)
+            except ValueError as e:
+                logger.warning("polygon cache entry unreadable", extra={"key": key, "error": str(e)})
+
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits[tier] += 1
+        logger.info("polygon cache", extra={
+            "key": key,
+            "result": "miss" if result is None else f"{tier} hit",
+            "hits": sum(self.hits.values()),
+            "misses": self.misses
+        })
+        return result
+
+    def put(self, key: str, polygons: List[ClosedPolygon], dxf_text: str, pinned: bool = False, **metadata) -> None:
+        data = encode_result(polygons, dxf_text)
+        self.memory.put(key, data)
+        if self.shared is None:
+            return
+        try:
+            self.shared.put(key, data, {**metadata, "polygonizerVersion": POLYGONIZER_VERSION}, pinned=pinned)
+        except PyMongoError as e:
+            logger.warning("polygon cache shared tier unavailable", extra={"error": str(e)})
@@ -6,43 +6,98 @@ from typing import List
 
 from ezdxf.entities import DXFEntity
 from gridfs import GridOut
-from shapely import Point
 from shapely.geometry import Polygon
-from dxf_utils import read_dxf
+from dxf_utils import load_dxf
+from polygon_cache import PolygonCache, cache_key, file_identity
 from polygonizer.dto import ClosedPolygon
-from polygonizer.main import close_polygon_from_dxf
-from typing import Tuple
+from polygonizer.main import close_polygon_from_dxf, ENGINE_JOIN
+from typing import Optional, Tuple
 from ezdxf.document import Drawing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import ezdxf
+import io
+import numpy as np
+import multiprocessing
+import os
+import time
+from utils.logger import setup_json_logger
 
-@dataclass
-class DxfPolygon:
-    polygon: Polygon
-    entities: list[DXFEntity]
+logger = setup_json_logger("polygone")
 
-def _find_entity(doc: Drawing, handle: str) -> DXFEntity:
-    for entity in doc.modelspace():
-        if entity.dxf.handle == handle:
-            return entity
-    return None
-
-def _polygone_to_shapely(polygon: ClosedPolygon) -> Polygon:
-    points = [Point(point.x, point.y) for point in polygon.points]
-    return Polygon(points)
+# Polygonizer engine used when a job does not pick one, see polygonizer.main.ENGINES
+DEFAULT_ENGINE = os.environ.get("POLYGONIZER_ENGINE", ENGINE_JOIN)
+# Processes used to parse and polygonize the files of one job
+PARSE_WORKERS = int(os.environ.get("NEST_PARSE_WORKERS", os.cpu_count() or 1))
 
-def find_closed_polygons(dxf_stream: GridOut, tolerance: float) -> List[DxfPolygon]:
+class DxfSource:
     """
-    Loads a DXF file, finds all closed polygons, and returns their vertices and all associated entities (used, within, touching, or intersecting).
+    Cleaned document of one file kept as DXF text and parsed on first use,
+    for results that come from the cache or a worker process: the solver
+    only needs the outlines, the entities are needed once layouts are built.
+    """
+    def __init__(self, dxf_text: str, handles: List[str]):
+        self._text = dxf_text
+        # every handle its polygons refer to, checked once after parsing
+        self._handles = handles
+        self._doc: Optional[Drawing] = None
+        self._index: dict[str, DXFEntity] = {}
 
-    Args:
-        dxf_path (str): Path to the DXF file.
-        tolerance (float): Gap tolerance for edge joining and flattening.
+    def resolve(self, handles: List[str]) -> list[DXFEntity]:
+        if self._doc is None:
+            self._parse()
+        return [self._index[handle] for handle in handles if handle in self._index]
 
-    Returns:
-        List[Dict]: Each dict contains:
-            - 'vertices': ordered list of 2D points (tuples)
-            - 'entities': list of original DXF entity references (used, within, touching, or intersecting the polygon)
+    def _parse(self) -> None:
+        start_time = time.time()
+        self._doc = ezdxf.read(io.StringIO(self._text))
+        self._text = None
+        self._index = _entity_index(self._doc)
+        _warn_unresolved([handle for handle in self._handles if handle not in self._index])
+        logger.info("cached document parsed", extra={"entities": len(self._index), "time": time.time() - start_time})
+
+class DxfPolygon:
     """
-    doc = read_dxf(dxf_stream)
+    A closed outline with the DXF entities drawn for it. With a `source`
+    instead of `entities`, the entities are looked up by `handles` when
+    first used.
+    """
+    def __init__(
+        self,
+        polygon: Polygon,
+        entities: Optional[list[DXFEntity]] = None,
+        holes: Optional[list[np.ndarray]] = None,
+        source: Optional[DxfSource] = None,
+        handles: Optional[List[str]] = None
+    ):
+        self.polygon = polygon
+        self._entities = entities
+        # vertices of the closed polygons merged into `polygon` from inside it
+        self.holes = holes if holes is not None else []
+        self._source = source
+        self._handles = handles
+
+    @property
+    def entities(self) -> list[DXFEntity]:
+        if self._entities is None:
+            self._entities = self._source.resolve(self._handles) if self._source is not None else []
+        return self._entities
+
+def _entity_index(doc: Drawing) -> dict[str, DXFEntity]:
+    """Modelspace entities by handle, built once per document."""
+    return {entity.dxf.handle: entity for entity in doc.modelspace()}
+
+def _warn_unresolved(unresolved: List[str]) -> None:
+    if unresolved:
+        logger.warning("Handles not found in modelspace", extra={
+            "count": len(unresolved),
+            "handles": unresolved[:50]
+        })
+
+def _polygone_to_shapely(polygon: ClosedPolygon) -> Polygon:
+    return polygon.geometry
+
+def _apply_layer_colors(doc: Drawing) -> dict[str, int]:
     msp = doc.modelspace()
     
     layers_info = {}
@@ -62,14 +117,154 @@ def find_closed_polygons(dxf_stream: GridOut, tolerance: float) -> List[DxfPolyg
                 entity.dxf.color = color 
                 color_map[entity.dxf.handle] = color 
     
-    closed_polygons = close_polygon_from_dxf(doc, tolerance, "dxf_polygonizer")
-                
+    return color_map
+
+def _to_dxf_polygons(doc: Drawing, closed_polygons: List[ClosedPolygon]) -> List[DxfPolygon]:
+    index = _entity_index(doc)
+    unresolved = []
     result = []
     for polygon in closed_polygons:
+        entities = []
+        for handle in polygon.handles:
+            entity = index.get(handle)
+            if entity is None:
+                unresolved.append(handle)
+            else:
+                entities.append(entity)
         result.append(
             DxfPolygon(
                 polygon=_polygone_to_shapely(polygon),
-                entities=[_find_entity(doc, handle) for handle in polygon.handles]
+                entities=entities,
+                holes=polygon.holes
             )
         )
-    return result
\ No newline at end of file
+    
+    _warn_unresolved(unresolved)
+    return result
+
+def find_closed_polygons(dxf_stream: GridOut, tolerance: float, engine: str = DEFAULT_ENGINE) -> List[DxfPolygon]:
+    """
+    Loads a DXF file, finds all closed polygons, and returns their vertices and all associated entities (used, within, touching, or intersecting).
+
+    Args:
+        dxf_path (str): Path to the DXF file.
+        tolerance (float): Gap tolerance for edge joining and flattening.
+        engine (str): Polygonizer engine, "join" or "planar".
+
+    Returns:
+        List[Dict]: Each dict contains:
+            - 'vertices': ordered list of 2D points (tuples)
+            - 'entities': list of original DXF entity references (used, within, touching, or intersecting the polygon)
+    """
+    doc, closed_polygons = _polygonize(dxf_stream, tolerance, engine)
+    return _to_dxf_polygons(doc, closed_polygons)
+
+def _polygonize(dxf_stream, tolerance: float, engine: str) -> Tuple[Drawing, List[ClosedPolygon]]:
+    loaded = load_dxf(dxf_stream)
+    doc = loaded.doc
+    _apply_layer_colors(doc)
+    
+    closed_polygons = close_polygon_from_dxf(doc, tolerance, "dxf_polygonizer", engine, loaded.blocks)
+    return doc, closed_polygons
+
+def _dxf_text(doc: Drawing) -> str:
+    text_stream = io.StringIO()
+    doc.write(text_stream)
+    return text_stream.getvalue()
+
+@dataclass
+class PolygonizedDxf:
+    """Picklable result of polygonizing one DXF file in a worker process."""
+    dxf_text: str
+    polygons: List[ClosedPolygon]
+
+def polygonize_dxf(dxf_data: bytes, tolerance: float, engine: str = DEFAULT_ENGINE) -> PolygonizedDxf:
+    """
+    Process-pool entry point: the same work as `find_closed_polygons`, but
+    the cleaned document comes back as DXF text because ezdxf entities
+    cannot cross the process boundary.
+    """
+    doc, closed_polygons = _polygonize(io.BytesIO(dxf_data), tolerance, engine)
+    return PolygonizedDxf(dxf_text=_dxf_text(doc), polygons=closed_polygons)
+
+def _from_polygonized(polygonized: PolygonizedDxf) -> List[DxfPolygon]:
+    """Polygons of a cached or pooled result, the document is parsed when their entities are first used."""
+    source = DxfSource(polygonized.dxf_text, [handle for polygon in polygonized.polygons for handle in polygon.handles])
+    return [
+        DxfPolygon(polygon=_polygone_to_shapely(polygon), holes=polygon.holes, source=source, handles=polygon.handles)
+        for polygon in polygonized.polygons
+    ]
+
+_pools: dict[int, ProcessPoolExecutor] = {}
+
+def _polygonize_pool(workers: int) -> ProcessPoolExecutor:
+    """Pool of `workers` processes, started once and kept for the next jobs."""
+    if workers not in _pools:
+        _pools[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return _pools[workers]
+
+def find_closed_polygons_for_files(
+    dxf_streams: List[GridOut], 
+    tolerance: float, 
+    engine: str = DEFAULT_ENGINE,
+    workers: int = PARSE_WORKERS,
+    cache: Optional[PolygonCache] = None,
+    file_ids: Optional[List[str]] = None
+) -> List[List[DxfPolygon]]:
+    """
+    `find_closed_polygons` for every stream, in a long-lived pool of
+    `workers` processes when that is more than one and more than one file
+    has to be polygonized. With a `cache`, files polygonized before with the same
+    content, tolerance and engine are read back from it instead, and new
+    results are stored, under `file_ids` when the caller has the streams'
+    `file_identity` already. Results from the cache or the pool parse
+    their document only when their entities are first used. Results are
+    in the order of `dxf_streams`.
+    """
+    if cache is not None and file_ids is None:
+        file_ids = [file_identity(stream) for stream in dxf_streams]
+    keys = [cache_key(file_id, tolerance, engine) for file_id in file_ids] if cache is not None else []
+    groups: List[Optional[List[DxfPolygon]]] = [None] * len(dxf_streams)
+    if cache is not None:
+        for index, key in enumerate(keys):
+            cached = cache.get(key)
+            if cached is not None:
+                polygons, dxf_text = cached
+                groups[index] = _from_polygonized(PolygonizedDxf(dxf_text=dxf_text, polygons=polygons))
+    
+    def store(index: int, polygons: List[ClosedPolygon], dxf_text: str) -> None:
+        cache.put(
+            keys[index], polygons, dxf_text,
+            fileId=file_ids[index], tolerance=tolerance, engine=engine
+        )
+    
+    pending = [index for index, group in enumerate(groups) if group is None]
+    if min(workers, len(pending)) <= 1:
+        for index in pending:
+            doc, closed_polygons = _polygonize(dxf_streams[index], tolerance, engine)
+            if cache is not None:
+                store(index, closed_polygons, _dxf_text(doc))
+            groups[index] = _to_dxf_polygons(doc, closed_polygons)
+        return groups
+    
+    start_time = time.time()
+    pool = _polygonize_pool(workers)
+    try:
+        futures = {index: pool.submit(polygonize_dxf, dxf_streams[index].read(), tolerance, engine) for index in pending}
+        results = {index: future.result() for index, future in futures.items()}
+    except BrokenProcessPool:
+        # a worker died, the next job starts a fresh pool
+        _pools.pop(workers, None)
+        raise
+    
+    for index, polygonized in results.items():
+        if cache is not None:
+            store(index, polygonized.polygons, polygonized.dxf_text)
+        groups[index] = _from_polygonized(polygonized)
+    
+    logger.info("files polygonized in pool", extra={
+        "files": len(pending),
+        "workers": workers,
+        "time": time.time() - start_time
+    })
+    return groups
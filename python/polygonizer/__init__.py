@@ -3,13 +3,15 @@ Polygonizer module for processing DXF files and extracting polygons.
 """
 
 from .core import combine_polygon_parts
-from .dto import PolygonPart, Point, ClosedPolygon
+from .dto import PolygonPart, Point, ClosedPolygon, CombineStats
 
 __all__ = [
     'combine_polygon_parts',
     'PolygonPart', 
     'Point', 
-    'ClosedPolygon'
+    'ClosedPolygon',
+    'CombineStats'
 ]
 
-__version__ = "0.1.0" 
\ No newline at end of file
+# Part of the polygonization cache key (polygon_cache.py), bump whenever results change
+__version__ = "0.3.0" 
\ No newline at end of file
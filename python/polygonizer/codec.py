@@ -0,0 +1,95 @@
+"""
+Compact binary form of a polygonization result: the closed polygons as one
+float64 vertex array plus their holes and handle lists, and optionally the
+cleaned DXF text the handles refer to.
+
+Layout (little endian, zlib compressed after the magic):
+
+    header      polygon count u32, hole count u32, handle blob size u64,
+                text size u64
+    u32[n]      vertex count per polygon
+    u32[n]      handle count per polygon
+    u32[n]      hole count per polygon
+    u32[h]      vertex count per hole
+    f8[v, 2]    vertices of all polygons, then of all holes
+    bytes       handles, newline separated, UTF-8
+    bytes       DXF text, UTF-8 with surrogate escapes
+"""
+from __future__ import annotations
+
+import struct
+import zlib
+
+import numpy as np
+
+from polygonizer.dto import ClosedPolygon
+
+MAGIC = b"NPR\x02"
+_HEADER = struct.Struct("<IIQQ")
+
+def encode_result(polygons: list[ClosedPolygon], dxf_text: str = "", level: int = 1) -> bytes:
+    vertex_counts = np.array([len(p.coords) for p in polygons], dtype="<u4")
+    handle_counts = np.array([len(p.handles) for p in polygons], dtype="<u4")
+    hole_counts = np.array([len(p.holes) for p in polygons], dtype="<u4")
+    holes = [hole for p in polygons for hole in p.holes]
+    hole_vertex_counts = np.array([len(hole) for hole in holes], dtype="<u4")
+    rings = [p.coords for p in polygons] + holes
+    coords = np.concatenate(rings) if rings else np.empty((0, 2))
+    handles = "\n".join(h for p in polygons for h in p.handles).encode("utf-8")
+    # ezdxf decodes undecodable bytes as surrogates, keep them round-trippable
+    text = dxf_text.encode("utf-8", "surrogateescape")
+
+    payload = b"".join((
+        _HEADER.pack(len(polygons), len(holes), len(handles), len(text)),
+        vertex_counts.tobytes(),
+        handle_counts.tobytes(),
+        hole_counts.tobytes(),
+        hole_vertex_counts.tobytes(),
+        coords.astype("<f8", copy=False).tobytes(),
+        handles,
+        text,
+    ))
+    return MAGIC + zlib.compress(payload, level)
+
+def decode_result(data: bytes) -> tuple[list[ClosedPolygon], str]:
+    """Inverse of `encode_result`; raises ValueError on foreign or damaged data."""
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not an encoded polygonization result")
+    try:
+        payload = zlib.decompress(data[len(MAGIC):])
+    except zlib.error as e:
+        raise ValueError(f"Damaged polygonization result: {e}") from e
+
+    count, hole_total, handles_size, text_size = _HEADER.unpack_from(payload)
+    offset = _HEADER.size
+    vertex_counts = np.frombuffer(payload, dtype="<u4", count=count, offset=offset)
+    offset += 4 * count
+    handle_counts = np.frombuffer(payload, dtype="<u4", count=count, offset=offset)
+    offset += 4 * count
+    hole_counts = np.frombuffer(payload, dtype="<u4", count=count, offset=offset)
+    offset += 4 * count
+    hole_vertex_counts = np.frombuffer(payload, dtype="<u4", count=hole_total, offset=offset)
+    offset += 4 * hole_total
+    total = int(vertex_counts.sum()) + int(hole_vertex_counts.sum())
+    coords = np.frombuffer(payload, dtype="<f8", count=2 * total, offset=offset).reshape(-1, 2)
+    offset += 16 * total
+    handles_blob = payload[offset:offset + handles_size]
+    offset += handles_size
+    if offset + text_size != len(payload):
+        raise ValueError("Damaged polygonization result: size mismatch")
+    text = payload[offset:].decode("utf-8", "surrogateescape")
+
+    handles = handles_blob.decode("utf-8").split("\n") if handles_size else []
+    bounds = np.concatenate(([0], np.cumsum(np.concatenate((vertex_counts, hole_vertex_counts)), dtype=np.int64))).tolist()
+    polygons = []
+    handle_start = 0
+    hole_ring = count
+    for index, (n_handles, n_holes) in enumerate(zip(handle_counts.tolist(), hole_counts.tolist())):
+        polygons.append(ClosedPolygon(
+            points=coords[bounds[index]:bounds[index + 1]],
+            handles=handles[handle_start:handle_start + n_handles],
+            holes=[coords[bounds[ring]:bounds[ring + 1]] for ring in range(hole_ring, hole_ring + n_holes)]
+        ))
+        handle_start += n_handles
+        hole_ring += n_holes
+    return polygons, text
@@ -0,0 +1,180 @@
+"""
+Grouping of congruent outlines, i.e. outlines equal up to rotation and
+translation (mirror images are not congruent here, a part cannot be flipped).
+
+Each ring is described by its edge lengths and turn angles, quantized with
+the tolerance. That sequence is rotation and translation invariant but its
+start depends on the first vertex, so it is rotated to its lexicographically
+least rotation before hashing. The key of a part is that of its outline
+plus those of its holes. A hash match is only a candidate: it is accepted
+when a rigid fit of the outline vertices, in canonical order, brings every
+vertex within the tolerance, takes every hole onto a hole of the other part
+and, when `orientations` are given, rotates by one of them. An outline with
+rotational symmetry is tried at each of its symmetric starts.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+
+import numpy as np
+
+# Turn angles are quantized independently of the tolerance, a length
+# tolerance says little about angles of edges of unknown length.
+ANGLE_QUANTUM = 1e-3
+# Packs a quantized turn angle (|q| <= pi / ANGLE_QUANTUM) next to the length
+_ANGLE_SPAN = 1 << 13
+
+@dataclass(slots=True)
+class CongruentGroup:
+    """
+    Rings congruent to ring `representative`. `members` holds the index of
+    every ring of the group, the representative first, with the 3x3 matrix
+    mapping that ring onto the representative.
+    """
+    representative: int
+    members: list[tuple[int, np.ndarray]] = field(default_factory=list)
+
+def _ccw_ring(ring) -> np.ndarray:
+    pts = np.asarray(ring, dtype=float)[:, :2]
+    if len(pts) > 1 and np.array_equal(pts[0], pts[-1]):
+        pts = pts[:-1]
+    x, y = pts[:, 0], pts[:, 1]
+    if np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y) < 0:
+        pts = pts[::-1]
+    return pts
+
+def _least_rotation(seq: list[int]) -> int:
+    """Start of the lexicographically least rotation of `seq` (Booth's algorithm)."""
+    n = len(seq)
+    doubled = seq + seq
+    failure = [-1] * (2 * n)
+    k = 0
+    for j in range(1, 2 * n):
+        c = doubled[j]
+        i = failure[j - k - 1]
+        while i != -1 and c != doubled[k + i + 1]:
+            if c < doubled[k + i + 1]:
+                k = j - i - 1
+            i = failure[i]
+        if c != doubled[k + i + 1]:
+            if c < doubled[k]:
+                k = j
+            failure[j - k] = -1
+        else:
+            failure[j - k] = i + 1
+    return k
+
+def canonical_ring(ring, tolerance: float) -> tuple[tuple, np.ndarray]:
+    """
+    Hash key of a ring and its vertices (counter-clockwise, open) starting
+    at the canonical first vertex.
+    """
+    pts = _ccw_ring(ring)
+    edges = np.roll(pts, -1, axis=0) - pts
+    previous = np.roll(edges, 1, axis=0)
+    lengths = np.hypot(edges[:, 0], edges[:, 1])
+    turns = np.arctan2(
+        previous[:, 0] * edges[:, 1] - previous[:, 1] * edges[:, 0],
+        previous[:, 0] * edges[:, 0] + previous[:, 1] * edges[:, 1]
+    )
+    q_lengths = np.rint(lengths / max(tolerance, 1e-9)).astype(np.int64)
+    q_turns = np.rint(turns / ANGLE_QUANTUM).astype(np.int64)
+    codes = (q_lengths * _ANGLE_SPAN + q_turns + _ANGLE_SPAN // 2).tolist()
+
+    start = _least_rotation(codes) if codes else 0
+    return (len(codes), tuple(codes[start:] + codes[:start])), np.roll(pts, -start, axis=0)
+
+def _period(codes: tuple) -> int:
+    """Smallest shift mapping the cyclic sequence `codes` onto itself."""
+    n = len(codes)
+    for shift in range(1, n):
+        if n % shift == 0 and codes[shift:] + codes[:shift] == codes:
+            return shift
+    return max(n, 1)
+
+def rigid_alignment(points: np.ndarray, target: np.ndarray, tolerance: float) -> np.ndarray | None:
+    """
+    Rotation plus translation, as a 3x3 matrix, taking each of `points` onto
+    the vertex of `target` at the same index, or None when some vertex stays
+    further away than `tolerance`.
+    """
+    points_mean = points.mean(axis=0)
+    target_mean = target.mean(axis=0)
+    p = points - points_mean
+    t = target - target_mean
+    angle = np.arctan2(np.sum(p[:, 0] * t[:, 1] - p[:, 1] * t[:, 0]), np.sum(p * t))
+    c, s = np.cos(angle), np.sin(angle)
+    rotation = np.array([[c, -s], [s, c]])
+    offset = target_mean - rotation @ points_mean
+
+    deviation = points @ rotation.T + offset - target
+    if np.max(np.einsum("ij,ij->i", deviation, deviation)) > tolerance * tolerance:
+        return None
+    matrix = np.eye(3)
+    matrix[:2, :2] = rotation
+    matrix[:2, 2] = offset
+    return matrix
+
+def _rotation_allowed(matrix: np.ndarray, radius: float, orientations: list[float] | None, tolerance: float) -> bool:
+    """Whether the rotation of `matrix` is one of `orientations` (degrees), within `tolerance` at `radius`."""
+    if orientations is None:
+        return True
+    angle = np.arctan2(matrix[1, 0], matrix[0, 0])
+    offsets = np.radians(np.asarray(orientations, dtype=float)) - angle
+    error = np.min(np.abs(np.arctan2(np.sin(offsets), np.cos(offsets))))
+    return error * radius <= tolerance
+
+def _holes_match(holes: list[tuple[tuple, np.ndarray]], matrix: np.ndarray, target: list[tuple[tuple, np.ndarray]], tolerance: float) -> bool:
+    """Whether `matrix` takes each of `holes` onto a distinct hole of `target` with the same key."""
+    unused = list(target)
+    limit = tolerance * tolerance
+    for key, pts in holes:
+        moved = pts @ matrix[:2, :2].T + matrix[:2, 2]
+        for i, (target_key, target_pts) in enumerate(unused):
+            if target_key != key:
+                continue
+            # every vertex near some vertex of the other hole, in any start order
+            difference = moved[:, None, :] - target_pts[None, :, :]
+            if np.max(np.min(np.einsum("ijk,ijk->ij", difference, difference), axis=1)) <= limit:
+                del unused[i]
+                break
+        else:
+            return False
+    return True
+
+def congruent_groups(rings: list, tolerance: float, holes: list[list] | None = None, orientations: list[float] | None = None) -> list[CongruentGroup]:
+    """
+    Partition `rings` (vertex arrays, closed or open) into groups of congruent
+    rings, in order of first appearance. `holes` gives the hole rings of each
+    ring, parts with different holes stay apart. With `orientations`, the
+    rotations allowed between two parts in degrees, a part is only grouped
+    with one it matches at such a rotation. Near-congruent rings whose
+    quantized sequences differ stay apart; that only costs deduplication,
+    never a wrong match.
+    """
+    groups: list[CongruentGroup] = []
+    candidates: dict[tuple, list[tuple[CongruentGroup, np.ndarray, list]]] = {}
+    for index, ring in enumerate(rings):
+        ring_key, pts = canonical_ring(ring, tolerance)
+        ring_holes = [canonical_ring(hole, tolerance) for hole in (holes[index] if holes is not None else [])]
+        key = (ring_key, tuple(sorted(hole_key for hole_key, _ in ring_holes)))
+        radius = float(np.max(np.hypot(*(pts - pts.mean(axis=0)).T))) if len(pts) else 0.0
+        period = _period(ring_key[1])
+
+        bucket = candidates.setdefault(key, [])
+        for group, representative, representative_holes in bucket:
+            matrix = next((
+                matrix
+                for shift in range(0, len(pts), period)
+                if (matrix := rigid_alignment(np.roll(pts, -shift, axis=0), representative, tolerance)) is not None
+                and _rotation_allowed(matrix, radius, orientations, tolerance)
+                and _holes_match(ring_holes, matrix, representative_holes, tolerance)
+            ), None)
+            if matrix is not None:
+                group.members.append((index, matrix))
+                break
+        else:
+            group = CongruentGroup(index, [(index, np.eye(3))])
+            groups.append(group)
+            bucket.append((group, pts, ring_holes))
+    return groups
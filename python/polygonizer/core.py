@@ -1,13 +1,41 @@
 from operator import contains
+import math
 
+import numpy as np
 import shapely
-from polygonizer.dto import PolygonPart, ClosedPolygon, Point
+from polygonizer.dto import PolygonPart, ClosedPolygon, Point, CombineStats, coords_eq
 from shapely.geometry import Polygon
+from shapely.strtree import STRtree
 from utils.logger import setup_json_logger
 
 logger = setup_json_logger("polygonizer")
 
-def _combine_nested_polygons(polys: list[ClosedPolygon], tol: float) -> list[ClosedPolygon]:
+def _candidate_pairs(query_geoms: np.ndarray, tree_geoms: np.ndarray, dirty: set[int] | None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Return (query index, tree index) pairs whose envelopes overlap, without
+    self pairs. With `dirty`, only pairs where either side is dirty are
+    returned; pairs of two clean polygons were already checked by an
+    earlier pass.
+    """
+    if dirty is None:
+        query_idx, tree_idx = STRtree(tree_geoms).query(query_geoms)
+    else:
+        dirty_idx = np.fromiter(sorted(dirty), dtype=np.intp, count=len(dirty))
+        q1, t1 = STRtree(tree_geoms).query(query_geoms[dirty_idx])
+        t2, q2 = STRtree(query_geoms).query(tree_geoms[dirty_idx])
+        n = len(tree_geoms)
+        keys = np.unique(np.concatenate([dirty_idx[q1] * n + t1, q2 * n + dirty_idx[t2]]))
+        query_idx, tree_idx = np.divmod(keys, n)
+
+    not_self = query_idx != tree_idx
+    return query_idx[not_self], tree_idx[not_self]
+
+def _combine_nested_polygons(
+    polys: list[ClosedPolygon],
+    tol: float,
+    dirty: set[int] | None = None,
+    stats: CombineStats | None = None
+) -> list[ClosedPolygon]:
     """
     Return a **new list** where every polygon that was strictly contained
     inside another has been merged into its parent:
@@ -19,61 +47,87 @@ def _combine_nested_polygons(polys: list[ClosedPolygon], tol: float) -> list[Clo
     `tol` – optional buffer used to compensate for floating‑point
     noise: parent.buffer(+tol).covers(child) allows boundary‑touching
     cases to count as 'inside'.
+
+    Candidate (parent, child) pairs come from a single bulk STRtree query
+    of the buffered parents against all polygons, so only pairs whose
+    envelopes overlap get the exact predicate.
+
+    `dirty` – indices of polygons added or changed since the last pass;
+    when given, only pairs involving one of them are checked.
     """
-    # Convert once to Shapely objects
-    shp = []
-    for p in polys:
-        coords = [(pt.x, pt.y) for pt in p.points]
-        shp.append(Polygon(coords))
+    if not polys:
+        return []
+    if dirty is not None and not dirty:
+        return list(polys)
+
+    # Prepared Shapely objects and buffered parents, memoized on each polygon
+    shp = np.array([p.prepared_geometry for p in polys], dtype=object)
+    buffered = np.array([p.buffered(tol) for p in polys], dtype=object)
 
     # Sort by descending area so big parents come first
-    order = sorted(range(len(polys)), key=lambda i: shp[i].area, reverse=True)
+    order = sorted(range(len(polys)), key=lambda i: polys[i].area, reverse=True)
+    rank = np.empty(len(polys), dtype=np.intp)
+    rank[order] = np.arange(len(polys))
+
+    # (parent, child) pairs with overlapping envelopes, excluding self pairs
+    parents, children = _candidate_pairs(buffered, shp, dirty)
+    if stats is not None:
+        stats.nested_pair_checks += len(parents)
+
+    # Exact predicate on the candidates only: buffered parent must cover child
+    covered = shapely.covers(buffered[parents], shp[children])
+    parents, children = parents[covered], children[covered]
+
+    # Visit pairs in the same order as a scan of parents (by area) over children (by area)
+    visit = np.lexsort((rank[children], rank[parents]))
 
     keep = [True] * len(polys)
-    for i in order:
-        if not keep[i]:
+    for k in visit:
+        i, j = int(parents[k]), int(children[k])
+        if not keep[i] or not keep[j]:
             continue
         parent = shp[i]
-        for j in order:                                # check every *smaller* poly
-            if i == j or not keep[j]:
-                continue
-            child = shp[j]
-
-            # Strict inclusion test with numeric tolerance
-            # - contains(...)  ensures child interior is strictly inside parent interior
-            # - covers(...)    catches 'same boundary' degeneracies
-            # - For tolerance cases, we need to ensure the child is mostly inside the parent
-            
-            # First check if child is completely inside parent
-            if parent.contains(child):
-                inside = True
-            else:
-                # For boundary-touching cases, check if child is mostly inside parent
-                # by buffering the parent slightly and checking coverage
-                buffered_parent = parent.buffer(tol)
-                if buffered_parent.covers(child):
-                    # Additional check: ensure child area is significantly inside parent
-                    # (not just touching at edges)
-                    try:
-                        intersection_area = parent.intersection(child).area
-                    except Exception as e:
-                        logger.warning(f"Error computing intersection between polygons: {e}")
-                        logger.warning(f"Parent: {polys[i].handles}")
-                        logger.warning(f"Points: {polys[i].points}")
-                        inside = False
-                else:
-                    inside = False
-
-            if inside:
-                # merge handles
-                polys[i].handles = sorted(set(polys[i].handles) |
-                                          set(polys[j].handles))
-                keep[j] = False                       # drop child
+        child = shp[j]
+
+        # Strict inclusion test with numeric tolerance
+        # - contains(...)  ensures child interior is strictly inside parent interior
+        # - covers(...)    on the buffered parent catches boundary-touching cases,
+        #                  then the child must overlap the parent with a real area
+        #                  (not just touch it along an edge)
+        if parent.contains(child):
+            inside = True
+        else:
+            try:
+                inside = parent.intersection(child).area > 1e-9
+            except Exception as e:
+                logger.warning(f"Error computing intersection between polygons: {e}")
+                logger.warning(f"Parent: {polys[i].handles}")
+                logger.warning(f"Points: {polys[i].coords.tolist()}")
+                inside = False
+
+        if inside:
+            # merge handles
+            polys[i].handles = sorted(set(polys[i].handles) |
+                                      set(polys[j].handles))
+            polys[i].holes.extend([polys[j].coords, *polys[j].holes])
+            keep[j] = False                       # drop child
 
     # Build the cleaned list preserving original order
     return [p for p, k in zip(polys, keep) if k]
 
-def _combine_intersecting_polygons(polys: list[ClosedPolygon], tol: float) -> list[ClosedPolygon]:
+def _find_root(parent: list[int], i: int) -> int:
+    """Union-find lookup with path halving."""
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+def _combine_intersecting_polygons(
+    polys: list[ClosedPolygon],
+    tol: float,
+    dirty: set[int] | None = None,
+    stats: CombineStats | None = None
+) -> list[ClosedPolygon]:
     """
     Return a **new list** where every polygon that intersects with another has been merged into its parent:
     
@@ -83,216 +137,325 @@ def _combine_intersecting_polygons(polys: list[ClosedPolygon], tol: float) -> li
     
     `tol` – optional buffer used to compensate for floating‑point
     noise: polygons that are within `tol` distance are considered intersecting.
+
+    All intersecting pairs are found with one STRtree query, grouped into
+    connected components with union-find, and every component is merged
+    with a single `unary_union`. When the union is a MultiPolygon the
+    largest polygon is kept.
+
+    `dirty` – indices of polygons added or changed since the last pass;
+    when given, only pairs involving one of them are checked.
     """
     if not polys:
         return []
+    if dirty is not None and not dirty:
+        return list(polys)
 
-    # Use a copy to avoid modifying the original list
-    polys = polys[:]
-    
-    # Convert to Shapely objects
-    shp = [Polygon([(pt.x, pt.y) for pt in p.points]) for p in polys]
+    # Shapely objects memoized on each polygon, buffered to handle floating point issues, but respect tol=0
+    shp = np.array([p.geometry for p in polys], dtype=object)
+    buffered = np.array([p.buffered(tol) for p in polys], dtype=object) if tol > 0 else shp
 
-    # Keep merging until no more intersections are found
-    while True:
-        merged_in_pass = False
-        i = 0
-        while i < len(polys):
-            j = i + 1
-            while j < len(polys):
-                poly_i = shp[i]
-                poly_j = shp[j]
-
-                # Use a small buffer to handle floating point issues, but respect tol=0
-                buffered_i = poly_i.buffer(tol) if tol > 0 else poly_i
-                buffered_j = poly_j.buffer(tol) if tol > 0 else poly_j
-
-                if buffered_i.intersects(buffered_j):
-                    # Only merge if the intersection has an area (is a Polygon)
-                    intersection = buffered_i.intersection(buffered_j)
-                    if intersection.area > 1e-9:  # Use a small threshold for area
-                        # Merge polygons
-                        union_poly = poly_i.union(poly_j)
-                        
-                        # Create new combined polygon
-                        if union_poly.geom_type == 'Polygon':
-                            coords = list(union_poly.exterior.coords)
-                            points = [Point(x, y) for x, y in coords]
-                        elif union_poly.geom_type == 'MultiPolygon':
-                            # For MultiPolygon, take the largest polygon
-                            largest_poly = max(union_poly.geoms, key=lambda p: p.area)
-                            coords = list(largest_poly.exterior.coords)
-                            points = [Point(x, y) for x, y in coords]
-                        else:
-                            # Fallback
-                            points = polys[i].points
-
-                        # Combine handles
-                        combined_handles = sorted(set(polys[i].handles) | set(polys[j].handles))
-                        
-                        # Replace the first polygon with the merged one
-                        polys[i] = ClosedPolygon(points=points, handles=combined_handles)
-                        shp[i] = Polygon([(p.x, p.y) for p in points])
-
-                        # Remove the second polygon
-                        polys.pop(j)
-                        shp.pop(j)
-                        
-                        merged_in_pass = True
-                        # Restart inner loop since list is modified
-                        j = i + 1
-                    else:
-                        j += 1
-                else:
-                    j += 1
-            i += 1
-        
-        if not merged_in_pass:
-            break
-            
-    return polys
+    # Envelope-overlapping pairs, each reported once
+    left, right = _candidate_pairs(buffered, buffered, dirty)
+    upper = left < right
+    left, right = left[upper], right[upper]
+    if stats is not None:
+        stats.intersecting_pair_checks += len(left)
+
+    hit = shapely.intersects(buffered[left], buffered[right])
+    left, right = left[hit], right[hit]
+
+    # Only merge if the intersection has an area (is a Polygon)
+    overlap = shapely.area(shapely.intersection(buffered[left], buffered[right])) > 1e-9
+    left, right = left[overlap], right[overlap]
+
+    parent = list(range(len(polys)))
+    for i, j in zip(left.tolist(), right.tolist()):
+        root_i = _find_root(parent, i)
+        root_j = _find_root(parent, j)
+        if root_i != root_j:
+            # The smaller index becomes the root so the merged polygon keeps its position
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    components: dict[int, list[int]] = {}
+    for i in range(len(polys)):
+        components.setdefault(_find_root(parent, i), []).append(i)
+
+    result = []
+    for root, members in components.items():
+        if len(members) == 1:
+            result.append(polys[root])
+            continue
+
+        try:
+            union_poly = shapely.unary_union(shp[members])
+        except shapely.errors.GEOSException as e:
+            # Self-intersecting outlines from messy drawings, repair them and retry
+            logger.warning(f"Error computing union of polygons: {e}")
+            union_poly = shapely.unary_union(shapely.make_valid(shp[members]))
+
+        # Create new combined polygon
+        if union_poly.geom_type == 'Polygon':
+            coords = shapely.get_coordinates(union_poly.exterior)
+        elif union_poly.geom_type == 'MultiPolygon':
+            # For MultiPolygon, take the largest polygon
+            largest_poly = max(union_poly.geoms, key=lambda p: p.area)
+            coords = shapely.get_coordinates(largest_poly.exterior)
+        else:
+            # Fallback
+            coords = polys[root].coords
+
+        # Combine handles
+        combined_handles = sorted({h for i in members for h in polys[i].handles})
+        combined_holes = [hole for i in members for hole in polys[i].holes]
+        result.append(ClosedPolygon(points=coords, handles=combined_handles, holes=combined_holes))
+
+    return result
 
 def is_open_part_inside_closed_part(open_part: PolygonPart, closed_part: ClosedPolygon) -> bool:
     """
     Return True if the open part is inside the closed part, False otherwise.
     """
-    points = open_part.points
-    shapely_closed_part = Polygon([(p.x, p.y) for p in closed_part.points])
-    
-    for i in range(len(points)):
-        if not shapely_closed_part.contains(shapely.Point(points[i].x, points[i].y)):
-            return False
-    return True
+    xy = open_part.coords
+    shapely_closed_part = closed_part.prepared_geometry
+    return bool(shapely.contains_xy(shapely_closed_part, xy[:, 0], xy[:, 1]).all())
+
+def _attach_open_parts_to_closed(open_parts: list[PolygonPart], closed_parts: list[ClosedPolygon]) -> list[PolygonPart]:
+    """
+    Move the handles of every open part that lies inside a closed part into
+    the first such closed part, and return the open parts that are left.
+
+    Each closed polygon's prepared geometry is memoized; closed parts whose
+    bounding box does not enclose the open part's bounding box are skipped
+    before all vertices of the open part are tested in one `contains_xy` call.
+    """
+    if not open_parts or not closed_parts:
+        return open_parts
+
+    shp = [p.prepared_geometry for p in closed_parts]
+    min_x, min_y, max_x, max_y = np.array([p.bounds() for p in closed_parts]).T
+
+    remaining = []
+    for open_part in open_parts:
+        xy = open_part.coords
+        lo = xy.min(axis=0)
+        hi = xy.max(axis=0)
+        candidates = np.flatnonzero(
+            (min_x <= lo[0]) & (min_y <= lo[1]) & (max_x >= hi[0]) & (max_y >= hi[1])
+        )
+        for k in candidates:
+            if shapely.contains_xy(shp[k], xy[:, 0], xy[:, 1]).all():
+                closed_parts[k].handles.extend(open_part.handles)
+                break
+        else:
+            remaining.append(open_part)
+
+    return remaining
 
 def _combine_open_parts(part_a: PolygonPart, part_b: PolygonPart, tol: float) -> tuple[bool, PolygonPart]:
     """
     Return a tuple of (True if the parts are combined, the combined part).
     """
     
-    a_start= part_a.points[0]
-    a_end= part_a.points[-1]
-    b_start= part_b.points[0]
-    b_end= part_b.points[-1]
+    a = part_a.coords
+    b = part_b.coords
     
-    if a_start.eq_to(b_start, tol):
-        return True, PolygonPart(
-            points=list(reversed(part_b.points)) + part_a.points[1:],
-            handles=part_a.handles + part_b.handles
-        )
-    elif a_start.eq_to(b_end, tol):
-        return True, PolygonPart(
-            points=part_b.points + part_a.points[1:],
-            handles=part_a.handles + part_b.handles
-        )
-    elif a_end.eq_to(b_start, tol):
-        return True, PolygonPart(
-            points=part_a.points + part_b.points[1:],
-            handles=part_a.handles + part_b.handles
-        )
-    elif a_end.eq_to(b_end, tol):
-        return True, PolygonPart(
-            points=part_a.points[:-1] + list(reversed(part_b.points)),
-            handles=part_a.handles + part_b.handles
-        )
+    if coords_eq(a[0], b[0], tol):
+        points = np.concatenate((b[::-1], a[1:]))
+    elif coords_eq(a[0], b[-1], tol):
+        points = np.concatenate((b, a[1:]))
+    elif coords_eq(a[-1], b[0], tol):
+        points = np.concatenate((a, b[1:]))
+    elif coords_eq(a[-1], b[-1], tol):
+        points = np.concatenate((a[:-1], b[::-1]))
+    else:
+        return False, None
     
-    return False, None
+    return True, PolygonPart(points=points, handles=part_a.handles + part_b.handles)
+
+def _grid_cell(x: float, y: float, tol: float) -> tuple[int, int]:
+    return math.floor(x / tol), math.floor(y / tol)
+
+def _chain_open_parts(parts: list[PolygonPart], tol: float) -> list[PolygonPart]:
+    """
+    Return a **new list** where open parts whose endpoints meet are linked
+    into chains, in one pass over a hash grid of endpoints:
+
+        * Endpoints are bucketed into `tol`-sized cells, so every match
+          for an endpoint lies in its own cell or one of the 8 neighbours
+        * Each chain grows from its end, then from its start, until no
+          unused part touches it or it closes on itself
+        * A chain's `handles` = handles of its parts in chain order
+
+    Endpoints match with the same `Point.eq_to(..., tol)` rule as
+    `_combine_open_parts`. Chains are assembled with a single
+    `np.concatenate` of the oriented part arrays.
+    """
+    if tol <= 0 or len(parts) < 2:
+        return parts
+
+    # (start x, start y, end x, end y) of every part as plain floats
+    ends = [tuple(part.coords[[0, -1]].ravel().tolist()) for part in parts]
+
+    # cell -> [(part index, True if the endpoint is the part's start)]
+    grid: dict[tuple[int, int], list[tuple[int, bool]]] = {}
+    for idx, (sx, sy, ex, ey) in enumerate(ends):
+        grid.setdefault(_grid_cell(sx, sy, tol), []).append((idx, True))
+        grid.setdefault(_grid_cell(ex, ey, tol), []).append((idx, False))
+
+    used = [False] * len(parts)
+
+    def take_match(x: float, y: float) -> tuple[int, bool] | None:
+        cx, cy = _grid_cell(x, y, tol)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for idx, at_start in grid.get((cx + dx, cy + dy), ()):
+                    if used[idx]:
+                        continue
+                    ox, oy = ends[idx][:2] if at_start else ends[idx][2:]
+                    if abs(x - ox) < tol and abs(y - oy) < tol:
+                        used[idx] = True
+                        return idx, at_start
+        return None
+
+    def closed(a: tuple[float, float], b: tuple[float, float]) -> bool:
+        return abs(a[0] - b[0]) < tol and abs(a[1] - b[1]) < tol
+
+    result = []
+    for idx, part in enumerate(parts):
+        if used[idx]:
+            continue
+        used[idx] = True
+        start, end = ends[idx][:2], ends[idx][2:]
+        if closed(start, end):
+            result.append(part)
+            continue
+
+        # grow from the end: every piece drops its first vertex, the shared one
+        forward = [part.coords]
+        forward_handles = list(part.handles)
+        while not closed(start, end):
+            match = take_match(*end)
+            if match is None:
+                break
+            other, at_start = match
+            piece = parts[other].coords if at_start else parts[other].coords[::-1]
+            forward.append(piece[1:])
+            forward_handles.extend(parts[other].handles)
+            end = ends[other][2:] if at_start else ends[other][:2]
+
+        # grow from the start: every piece drops its last vertex, the shared one
+        backward = []
+        backward_handles = []
+        while not closed(start, end):
+            match = take_match(*start)
+            if match is None:
+                break
+            other, at_start = match
+            piece = parts[other].coords[::-1] if at_start else parts[other].coords
+            backward.append(piece[:-1])
+            backward_handles.append(parts[other].handles)
+            start = ends[other][2:] if at_start else ends[other][:2]
+
+        if len(forward) == 1 and not backward:
+            result.append(part)
+            continue
+
+        backward.reverse()
+        backward_handles.reverse()
+        result.append(PolygonPart(
+            points=np.concatenate(backward + forward),
+            handles=[h for handles in backward_handles for h in handles] + forward_handles
+        ))
+
+    return result
+
+def _dirty_indices(polys: list[ClosedPolygon], dirty_ids: set[int] | None) -> set[int] | None:
+    if dirty_ids is None:
+        return None
+    return {i for i, p in enumerate(polys) if id(p) in dirty_ids}
 
 def combine_polygon_parts(
     open_parts: list[PolygonPart], 
     closed_parts: list[ClosedPolygon], 
     tol: float,
-    logger_tag: str = "combine_polygon_parts"
+    logger_tag: str = "combine_polygon_parts",
+    stats: CombineStats | None = None
 ) -> tuple[list[PolygonPart], list[ClosedPolygon]]:
     """
     Returns a tuple of (list of open polygons, list of closed polygons).
+
+    The closed-polygon passes are incremental: after the first full pass
+    only polygons added or rebuilt since the previous pass (the dirty set)
+    are checked against the rest. Pass a `CombineStats` to read the number
+    of iterations and pair checks.
     """
     
     if not open_parts and not closed_parts:
         raise ValueError("Open and closed parts are empty")
     
+    if stats is None:
+        stats = CombineStats()
+    
+    # Chain all open parts up front so the closed-polygon passes see every closed chain at once
+    open_parts = _chain_open_parts(open_parts, tol)
+    
+    # ids of closed polygons added or rebuilt since the last pass, None = all of them
+    dirty_ids: set[int] | None = None
+    
     # Main processing loop
     while True:
+        stats.iterations += 1
         logger.info("combine_polygon_parts", extra={
             "open_parts": len(open_parts),
             "closed_parts": len(closed_parts)
         })
         
         original_close_part_conut = len(closed_parts)
-        closed_parts = _combine_nested_polygons(closed_parts, tol)
-        closed_parts = _combine_intersecting_polygons(closed_parts, tol)
+        closed_parts = _combine_nested_polygons(closed_parts, tol, _dirty_indices(closed_parts, dirty_ids), stats)
+        checked_ids = {id(p) for p in closed_parts}
+        closed_parts = _combine_intersecting_polygons(closed_parts, tol, _dirty_indices(closed_parts, dirty_ids), stats)
+        # only polygons created by merging still need to be checked
+        dirty_ids = {id(p) for p in closed_parts if id(p) not in checked_ids}
        
         if original_close_part_conut != len(closed_parts):
             continue
         
         # Check if any open parts have become closed
-        open_parts_to_remove = []
+        still_open = []
         for open_part in open_parts:
             if open_part.is_closed(tol):
-                closed_parts.append(open_part.to_closed_polygon())
-                open_parts_to_remove.append(open_part)
-       
-        for part in open_parts_to_remove:
-            open_parts.remove(part)
+                closed_polygon = open_part.to_closed_polygon()
+                closed_parts.append(closed_polygon)
+                dirty_ids.add(id(closed_polygon))
+            else:
+                still_open.append(open_part)
         
-        if len(open_parts_to_remove) != 0:
+        if len(still_open) != len(open_parts):
+            open_parts = still_open
             continue
         
-        # Try to combine open parts with each other
-        combined = False
+        # Link open parts whose endpoints meet into chains
         n = len(open_parts)
-        for i in range(n):
-            for j in range(i + 1, n):
-                combine, new_part = _combine_open_parts(open_parts[i], open_parts[j], tol)
-                if combine:
-                    # Remove the two parts that were combined
-                    open_parts.pop(j)  # Remove j first (higher index)
-                    open_parts.pop(i)  # Then remove i
-                    # Add the new combined part
-                    open_parts.append(new_part)
-                    combined = True
-                    break
-            if combined:
-                break
+        open_parts = _chain_open_parts(open_parts, tol)
         
         # If we combined open parts, continue the loop
-        if combined:
+        if len(open_parts) != n:
             continue
         
         # Try to combine open parts with closed parts
-        open_parts_to_remove = []
-        for open_part in open_parts:
-            for closed_part in closed_parts:
-                if is_open_part_inside_closed_part(open_part, closed_part):
-                    closed_part.handles.extend(open_part.handles)
-                    open_parts_to_remove.append(open_part)
-                    break
-        
-        # Remove open parts that were combined with closed parts
-        for part in open_parts_to_remove:
-            open_parts.remove(part)
+        n = len(open_parts)
+        open_parts = _attach_open_parts_to_closed(open_parts, closed_parts)
         
         # If we combined open parts with closed parts, continue the loop
-        if open_parts_to_remove:
+        if len(open_parts) != n:
             continue
         
         if open_parts:
             logger.info(f"{logger_tag} - open parts: {[part.handles for part in open_parts]}")
-            min_x = open_parts[0].points[0].x
-            max_x = open_parts[0].points[0].x
-            min_y = open_parts[0].points[0].y
-            max_y = open_parts[0].points[0].y
-            
-            for part in open_parts:
-                points = part.points
-                for point in points:
-                    if point.x < min_x:
-                        min_x = point.x
-                    if point.x > max_x:
-                        max_x = point.x
-                    if point.y < min_y:
-                        min_y = point.y
-                    if point.y > max_y:
-                        max_y = point.y
+            bounds = np.array([part.bounds() for part in open_parts])
+            min_x, min_y = bounds[:, :2].min(axis=0).tolist()
+            max_x, max_y = bounds[:, 2:].max(axis=0).tolist()
             
             close_polygone = ClosedPolygon(
                 points=[Point(min_x, min_y), Point(max_x, min_y), Point(max_x, max_y), Point(min_x, max_y), Point(min_x, min_y)],
@@ -300,9 +463,16 @@ def combine_polygon_parts(
             )
             
             closed_parts.append(close_polygone)
+            dirty_ids.add(id(close_polygone))
             open_parts = []
             continue
         
         break
     
+    logger.info(f"{logger_tag} - stats", extra={
+        "iterations": stats.iterations,
+        "nested_pair_checks": stats.nested_pair_checks,
+        "intersecting_pair_checks": stats.intersecting_pair_checks
+    })
+    
     return [], closed_parts
\ No newline at end of file
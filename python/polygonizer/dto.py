@@ -1,31 +1,165 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import List
+from typing import List, Sequence, Union
+
+import numpy as np
+import shapely
+from shapely.geometry import Polygon
 
 @dataclass(slots=True)
 class Point:
     x: float
     y: float
-   
+
     def eq_to(self, other: Point, tol: float) -> bool:
         return abs(self.x - other.x) < tol and abs(self.y - other.y) < tol
-    
-@dataclass(slots=True)
-class ClosedPolygon:
-    points: List[Point]
-    handles: List[str]
-    
-@dataclass(slots=True)
-class PolygonPart:
-    points: List[Point]
-    handles: List[str]
-    
+
+PointsLike = Union[np.ndarray, Sequence[Point]]
+
+def to_coords(points: PointsLike) -> np.ndarray:
+    """Return `points` as a contiguous (N, 2) float64 array."""
+    if isinstance(points, np.ndarray):
+        return np.ascontiguousarray(points, dtype=np.float64).reshape(-1, 2)
+    return np.array([(pt.x, pt.y) for pt in points], dtype=np.float64).reshape(-1, 2)
+
+def coords_eq(a: np.ndarray, b: np.ndarray, tol: float) -> bool:
+    """`Point.eq_to` for two coordinate rows."""
+    return abs(float(a[0]) - float(b[0])) < tol and abs(float(a[1]) - float(b[1])) < tol
+
+class _VertexChain:
+    """
+    Vertices stored as one (N, 2) float64 array in `coords`.
+    `points` is a list of `Point` views built on access for existing callers.
+    """
+    __slots__ = ("_coords", "handles")
+
+    def __init__(self, points: PointsLike, handles: List[str]):
+        self.coords = points
+        self.handles = handles
+
+    @property
+    def coords(self) -> np.ndarray:
+        return self._coords
+
+    @coords.setter
+    def coords(self, value: PointsLike) -> None:
+        # read-only view, so the only way to change vertices is to assign new ones
+        coords = to_coords(value).view()
+        coords.flags.writeable = False
+        self._coords = coords
+        self._invalidate()
+
+    def _invalidate(self) -> None:
+        pass
+
+    @property
+    def points(self) -> List[Point]:
+        return [Point(x, y) for x, y in self._coords.tolist()]
+
+    @points.setter
+    def points(self, value: PointsLike) -> None:
+        self.coords = value
+
+    def bounds(self) -> tuple[float, float, float, float]:
+        """Return (min_x, min_y, max_x, max_y)."""
+        lo = self._coords.min(axis=0)
+        hi = self._coords.max(axis=0)
+        return float(lo[0]), float(lo[1]), float(hi[0]), float(hi[1])
+
+    def __eq__(self, other: object) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.handles == other.handles and np.array_equal(self._coords, other._coords)
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return type(self), (self._coords, self.handles)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(points={self.points!r}, handles={self.handles!r})"
+
+class ClosedPolygon(_VertexChain):
+    """
+    Shapely geometry and the values derived from it are built on first
+    access and memoized until `coords` (or `points`) is assigned again.
+
+    `holes` holds the vertices of the closed polygons merged into this one
+    from inside it; `geometry` stays the outline only.
+    """
+    __slots__ = ("_geometry", "_area", "_bounds", "_prepared", "_buffered", "holes")
+
+    def __init__(self, points: PointsLike, handles: List[str], holes: List[PointsLike] | None = None):
+        super().__init__(points, handles)
+        self.holes = [to_coords(hole) for hole in holes] if holes else []
+
+    def __eq__(self, other: object) -> bool:
+        result = _VertexChain.__eq__(self, other)
+        if result is not True:
+            return result
+        return len(self.holes) == len(other.holes) and all(np.array_equal(a, b) for a, b in zip(self.holes, other.holes))
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return type(self), (self._coords, self.handles, self.holes)
+
+    def _invalidate(self) -> None:
+        self._geometry = None
+        self._area = None
+        self._bounds = None
+        self._prepared = False
+        self._buffered = None
+
+    @property
+    def geometry(self) -> Polygon:
+        if self._geometry is None:
+            self._geometry = Polygon(self._coords)
+        return self._geometry
+
+    @property
+    def prepared_geometry(self) -> Polygon:
+        """`geometry`, prepared in place for repeated predicates."""
+        geometry = self.geometry
+        if not self._prepared:
+            shapely.prepare(geometry)
+            self._prepared = True
+        return geometry
+
+    @property
+    def area(self) -> float:
+        if self._area is None:
+            self._area = self.geometry.area
+        return self._area
+
+    def bounds(self) -> tuple[float, float, float, float]:
+        if self._bounds is None:
+            self._bounds = _VertexChain.bounds(self)
+        return self._bounds
+
+    def buffered(self, tol: float) -> Polygon:
+        """`geometry.buffer(tol)`, prepared; the last tolerance used is memoized."""
+        if self._buffered is None or self._buffered[0] != tol:
+            geometry = self.geometry.buffer(tol)
+            shapely.prepare(geometry)
+            self._buffered = (tol, geometry)
+        return self._buffered[1]
+
+class PolygonPart(_VertexChain):
+    __slots__ = ()
+
     def is_valid(self) -> bool:
-        return len(self.points) >= 2 
-    
+        return len(self.coords) >= 2
+
     def is_closed(self, tol: float) -> bool:
-        return self.is_valid() and self.points[0].eq_to(self.points[-1], tol)
-    
+        return self.is_valid() and coords_eq(self.coords[0], self.coords[-1], tol)
+
     def to_closed_polygon(self) -> ClosedPolygon:
-        return ClosedPolygon(points=self.points, handles=self.handles)
+        return ClosedPolygon(points=self.coords, handles=self.handles)
+
+@dataclass(slots=True)
+class CombineStats:
+    iterations: int = 0
+    nested_pair_checks: int = 0
+    intersecting_pair_checks: int = 0
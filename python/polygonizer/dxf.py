@@ -1,6 +1,12 @@
 from __future__ import annotations
 
+from dataclasses import dataclass
+import functools
+import math
+
 import ezdxf
+from ezdxf.math import arc_angle_span_deg, ellipse_param_span
+import numpy as np
 from shapely.geometry import Polygon
 from shapely import contains, covers
 
@@ -10,13 +16,138 @@ from utils.logger import setup_json_logger
 
 logger = setup_json_logger("dxf_polygonizer")
 
-def _vec2(v):
-    """Return a Point object from a Vec3 or any 3-component iterable."""
-    return Point(x=float(v[0]), y=float(v[1]))  # works for Vec3, numpy rows, etc.
+# Analytic curves, whose tessellation is affine invariant and worth caching per
+# block definition. SPLINE is left out: ezdxf transforms fit points, not the curve.
+_CURVE_TYPES = frozenset(("ARC", "CIRCLE", "ELLIPSE"))
+
+@dataclass(slots=True)
+class BlockInstance:
+    """
+    Origin of a model space entity that was decomposed from a block
+    reference: `source` is the entity inside block definition `block`, and
+    `matrix` is the row-major 4x4 transform of the reference `insert` (an id
+    shared by every entity of the same reference) into WCS.
+    """
+    block: str
+    source: object
+    insert: int
+    matrix: np.ndarray
+
+class BlockTessellationCache:
+    """
+    Block-local vertices of block definition entities, keyed by block name
+    and tolerance, so each definition is tessellated once however often it
+    is inserted.
+    """
+    def __init__(self):
+        self._blocks: dict[tuple[str, float], dict[int, np.ndarray]] = {}
+
+    def vertices(self, block: str, tol: float, source) -> np.ndarray:
+        entities = self._blocks.setdefault((block, tol), {})
+        pts = entities.get(id(source))
+        if pts is None:
+            pts = entities[id(source)] = _flatten_entity(source, tol)[0]
+        return pts
+
+    def __len__(self) -> int:
+        return sum(len(entities) for entities in self._blocks.values())
+
+def _xy(vertices) -> np.ndarray:
+    """Return an (N, 2) float64 array from Vec3s or any iterable of 2+ component points."""
+    return np.array([(v[0], v[1]) for v in vertices], dtype=np.float64).reshape(-1, 2)
+
+def _close_ring(pts: np.ndarray) -> np.ndarray:
+    return np.concatenate((pts, pts[:1])) if len(pts) else pts
+
+def _arc_segment_count(radius: float, span: float, sagitta: float) -> int:
+    """
+    Closed form of `ezdxf.math.arc_segment_count`: the number of chords
+    needed so no chord is further than `sagitta` from an arc of `radius`
+    spanning `span` radians.  Sagittas larger than the radius are clamped
+    instead of raising.
+    """
+    half_chord = math.sqrt(max(2.0 * radius * sagitta - sagitta * sagitta, 0.0)) / radius
+    alpha = 2.0 * math.asin(min(half_chord, 1.0))
+    if alpha <= 0.0:
+        return 1
+    return max(math.ceil(span / alpha), 1)
+
+@functools.lru_cache(maxsize=256)
+def _unit_circle(count: int) -> np.ndarray:
+    """cos/sin of `count + 1` evenly spaced angles over a full turn, closed exactly."""
+    angles = np.linspace(0.0, math.tau, count + 1)
+    ring = np.column_stack((np.cos(angles), np.sin(angles)))
+    ring[-1] = ring[0]
+    ring.flags.writeable = False
+    return ring
+
+def _ocs_to_wcs_xy(entity, x: np.ndarray, y: np.ndarray, elevation: float) -> np.ndarray:
+    """Map OCS coordinates of *entity* to an (N, 2) array of WCS x/y."""
+    ocs = entity.ocs()
+    if not ocs.transform:
+        return np.column_stack((x, y))
+    ux, uy, uz = ocs.ux, ocs.uy, ocs.uz
+    return np.column_stack((
+        x * ux.x + y * uy.x + elevation * uz.x,
+        x * ux.y + y * uy.y + elevation * uz.y,
+    ))
+
+def _tessellate_arc(entity, start_deg: float, end_deg: float, tol: float) -> np.ndarray:
+    """Vertices of an ARC or CIRCLE from `start_deg` to `end_deg` (OCS, counter-clockwise)."""
+    radius = abs(entity.dxf.radius)
+    span = arc_angle_span_deg(start_deg, end_deg)
+    if radius <= 0.0 or span <= 0.0:
+        return _xy([])
+
+    count = _arc_segment_count(radius, math.radians(span), tol)
+    if span == 360.0 and start_deg == 0.0:
+        # every circle with the same segment count shares one unit ring
+        unit = _unit_circle(count)
+        cos_a, sin_a = unit[:, 0], unit[:, 1]
+    else:
+        angles = np.radians(np.linspace(start_deg, start_deg + span, count + 1))
+        cos_a, sin_a = np.cos(angles), np.sin(angles)
+    center = entity.dxf.center
+    pts = _ocs_to_wcs_xy(
+        entity,
+        center[0] + radius * cos_a,
+        center[1] + radius * sin_a,
+        center[2],
+    )
+    if span == 360.0:
+        pts[-1] = pts[0]
+    return pts
+
+def _tessellate_ellipse(entity, tol: float) -> np.ndarray:
+    """
+    Vertices of an ELLIPSE (a WCS entity) at evenly spaced parameters.
+
+    An ellipse is the affine image of a circle whose radius is the major
+    axis, and the affine map never stretches distances beyond that, so the
+    circle's segment count bounds the ellipse's sagitta as well.
+    """
+    start = entity.dxf.start_param
+    span = ellipse_param_span(start, entity.dxf.end_param)
+    major = entity.dxf.major_axis
+    radius = major.magnitude * max(1.0, abs(entity.dxf.ratio))
+    if radius <= 0.0 or span <= 0.0:
+        return _xy([])
+
+    count = _arc_segment_count(radius, span, tol)
+    params = np.linspace(start, start + span, count + 1)
+    cos_t, sin_t = np.cos(params), np.sin(params)
+    center, minor = entity.dxf.center, entity.minor_axis
+    pts = np.column_stack((
+        center.x + cos_t * major.x + sin_t * minor.x,
+        center.y + cos_t * major.y + sin_t * minor.y,
+    ))
+    if math.isclose(span, math.tau):
+        pts[-1] = pts[0]
+    return pts
 
 def _flatten_entity(entity, tol: float):
     """
-    Return list of Point vertices approximating *e*
+    Return an (N, 2) array of vertices approximating *e*
     and its DXF handle.  All curve entities are tessellated with the
     user–supplied *tol* so the maximum sagitta ≤ tol.
     """
@@ -24,60 +155,160 @@ def _flatten_entity(entity, tol: float):
     kind = entity.dxftype()
 
     if kind == "LINE":
-        pts = [_vec2(entity.dxf.start), _vec2(entity.dxf.end)]
+        pts = _xy([entity.dxf.start, entity.dxf.end])
 
     elif kind == "LWPOLYLINE":
-        pts = [_vec2(p) for p in entity.get_points(format="xy")]
+        pts = _xy(entity.get_points(format="xy"))
         if entity.closed:
-            pts.append(pts[0])
+            pts = _close_ring(pts)
 
     elif kind == "POLYLINE":
-        pts = [_vec2(p) for p in entity.points()]
+        pts = _xy(entity.points())
         if getattr(entity, "is_closed", False):
-            pts.append(pts[0])
+            pts = _close_ring(pts)
 
     elif kind == "ARC":
         radius = entity.dxf.radius
         if radius < tol:
-            pts = []
+            pts = _xy([])
         else:
-            pts = [_vec2(p) for p in entity.flattening(sagitta=tol)]
+            pts = _tessellate_arc(entity, entity.dxf.start_angle, entity.dxf.end_angle, tol)
 
     elif kind == "CIRCLE":
-        pts = [_vec2(p) for p in entity.flattening(sagitta=tol)]
+        pts = _tessellate_arc(entity, 0.0, 360.0, tol)
 
     elif kind == "ELLIPSE":
-        pts = [_vec2(p) for p in entity.flattening(distance=tol)]
+        pts = _tessellate_ellipse(entity, tol)
 
     elif kind == "SPLINE":
-        pts = [_vec2(p) for p in entity.flattening(distance=tol)]
+        pts = _xy(entity.flattening(distance=tol))
 
     else:
-        pts = []
+        pts = _xy([])
 
     return pts, h
 
-def _remove_duplicate_points(pts: list[Point], tol: float) -> list[Point]:
+def _remove_duplicate_points(pts: np.ndarray, tol: float) -> np.ndarray:
+    """
+    Drop every vertex closer than `tol` (per axis, like `Point.eq_to`) to
+    the last vertex kept.
+
+    Neighbour distances are checked for the whole array at once.  Only
+    after a dropped vertex does the comparison point differ from the
+    direct predecessor, so those stretches are re-walked one by one.
+    """
     if len(pts) < 2:
         return pts
-    
-    unique_pts = [pts[0]]
-    for i in range(1, len(pts)):
-        if not unique_pts[-1].eq_to(pts[i], tol):
-            unique_pts.append(pts[i])
-    
-    return unique_pts
-
-def polygon_parts_from_dxf(doc: ezdxf.Drawing, tol: float) -> list[PolygonPart]:
-    msp = doc.modelspace()
+
+    close = np.abs(pts[1:] - pts[:-1]) < tol
+    near = np.flatnonzero(close[:, 0] & close[:, 1]) + 1
+    if not len(near):
+        return pts
+
+    keep = np.ones(len(pts), dtype=bool)
+    rows = pts.tolist()
+    n = len(rows)
+    i = int(near[0])
+    while i < n:
+        last_x, last_y = rows[i - 1]
+        while i < n and abs(rows[i][0] - last_x) < tol and abs(rows[i][1] - last_y) < tol:
+            keep[i] = False
+            i += 1
+        # rows[i] is kept; the next drop candidate is the next near neighbour pair
+        nxt = np.searchsorted(near, i + 1)
+        if nxt == len(near):
+            break
+        i = int(near[nxt])
+
+    return pts[keep]
+
+def _local_tolerance(matrix: np.ndarray, tol: float) -> float | None:
+    """
+    Tolerance for tessellating block-local curves placed by `matrix`: `tol`
+    divided by the largest stretch of the transform (its largest singular
+    value), so the sagitta bound still holds after scaling, also for
+    non-uniform scales.  None if the transform mixes block z into WCS x/y
+    or collapses the block.
+    """
+    if abs(matrix[2, 0]) > 1e-12 or abs(matrix[2, 1]) > 1e-12:
+        return None
+    a, b, c, d = matrix[0, 0], matrix[0, 1], matrix[1, 0], matrix[1, 1]
+    stretch = (math.hypot(a + d, c - b) + math.hypot(a - d, b + c)) / 2.0
+    # rotations leave float noise in the stretch; rounding lets them share a cache key
+    stretch = round(stretch, 9)
+    if stretch <= 0.0:
+        return None
+    return tol / stretch
+
+def _place_block_curves(
+    entities: list,
+    blocks: dict[str, BlockInstance],
+    tol: float,
+    cache: BlockTessellationCache
+) -> dict[int, np.ndarray]:
+    """
+    WCS vertices of the block-derived curves among `entities`, by index.
+
+    Curves are grouped by their block definition entity and local tolerance;
+    each group is tessellated once (through `cache`) and placed at every
+    reference in one stacked matrix product.
+    """
+    local_tols: dict[int, float | None] = {}
+    groups: dict[tuple[int, float], list[tuple[int, BlockInstance]]] = {}
+    for idx, e in enumerate(entities):
+        instance = blocks.get(e.dxf.handle)
+        if instance is None or instance.source.dxftype() not in _CURVE_TYPES:
+            continue
+        if instance.insert not in local_tols:
+            local_tols[instance.insert] = _local_tolerance(instance.matrix, tol)
+        local_tol = local_tols[instance.insert]
+        if local_tol is not None:
+            groups.setdefault((id(instance.source), local_tol), []).append((idx, instance))
+
+    placed: dict[int, np.ndarray] = {}
+    for (_, local_tol), members in groups.items():
+        first = members[0][1]
+        local = cache.vertices(first.block, local_tol, first.source)
+        matrices = np.stack([instance.matrix for _, instance in members])
+        # (k, 2) @ (n, 2, 2) + (n, 1, 2) -> (n, k, 2)
+        world = local @ matrices[:, :2, :2] + matrices[:, None, 3, :2]
+        for (idx, _), pts in zip(members, world):
+            placed[idx] = pts
+    return placed
+
+def polygon_parts_from_dxf(
+    doc: ezdxf.Drawing,
+    tol: float,
+    blocks: dict[str, BlockInstance] | None = None
+) -> list[PolygonPart]:
+    """
+    Flatten every model space entity into a `PolygonPart`.
+
+    `blocks` maps handles of entities decomposed from block references to
+    their `BlockInstance` (see `dxf_utils.load_dxf`); curves among them are
+    tessellated once per block definition and placed per reference.
+    """
+    entities = list(doc.modelspace())
+    cache = BlockTessellationCache()
+    placed = _place_block_curves(entities, blocks, tol, cache) if blocks else {}
+
     all_pts: list[PolygonPart] = []
-    for e in msp:
-        pts, handle = _flatten_entity(e, tol)
+    for idx, e in enumerate(entities):
+        pts = placed.get(idx)
+        if pts is None:
+            pts, handle = _flatten_entity(e, tol)
+        else:
+            handle = e.dxf.handle
         pts = _remove_duplicate_points(pts, tol)
         if len(pts) >= 2:
             all_pts.append(
                 PolygonPart(points=pts, handles=[handle])
             )
-    
-    return all_pts
 
+    if placed:
+        logger.info("block tessellation cache", extra={
+            "block_entities": len(placed),
+            "tessellated": len(cache)
+        })
+
+    return all_pts
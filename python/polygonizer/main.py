@@ -1,27 +1,46 @@
 import sys
-from polygonizer.dxf import polygon_parts_from_dxf
+from polygonizer.dxf import BlockInstance, polygon_parts_from_dxf
 from polygonizer.dto import ClosedPolygon
 from polygonizer.core import combine_polygon_parts
+from polygonizer.planar import polygonize_parts
 from utils.logger import setup_json_logger
 
-from typing import List
+from typing import Dict, List, Optional
 from ezdxf.document import Drawing
 import time
 
 logger = setup_json_logger("dxf_polygonizer")
 
-def close_polygon_from_dxf(doc: Drawing, tolerance: float, logger_tag: str) -> List[ClosedPolygon]:
+# Join endpoints and merge overlaps in a fixpoint loop (polygonizer.core)
+ENGINE_JOIN = "join"
+# Node all segments once and extract faces (polygonizer.planar)
+ENGINE_PLANAR = "planar"
+ENGINES = (ENGINE_JOIN, ENGINE_PLANAR)
+
+def close_polygon_from_dxf(
+    doc: Drawing, 
+    tolerance: float, 
+    logger_tag: str, 
+    engine: str = ENGINE_JOIN, 
+    blocks: Optional[Dict[str, BlockInstance]] = None
+) -> List[ClosedPolygon]:
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown polygonizer engine: {engine}")
+    
     start_time = time.time()
     
-    polygon_parts = polygon_parts_from_dxf(doc, tolerance)
+    polygon_parts = polygon_parts_from_dxf(doc, tolerance, blocks)
     
     valid_parts = [part for part in polygon_parts if part.is_valid()]
-    logger.info("valid_parts length:", extra={"valid_parts": len(valid_parts)})
-    
-    closed_parts = [part for part in valid_parts if part.is_closed(tolerance)]
-    open_parts = [part for part in valid_parts if not part.is_closed(tolerance)]
+    logger.info("valid_parts length:", extra={"valid_parts": len(valid_parts), "engine": engine})
     
-    open_parts, closed_parts = combine_polygon_parts(open_parts, closed_parts, tolerance, logger_tag)
+    if engine == ENGINE_PLANAR:
+        open_parts, closed_parts = [], polygonize_parts(valid_parts, tolerance, logger_tag)
+    else:
+        closed_parts = [part.to_closed_polygon() for part in valid_parts if part.is_closed(tolerance)]
+        open_parts = [part for part in valid_parts if not part.is_closed(tolerance)]
+        
+        open_parts, closed_parts = combine_polygon_parts(open_parts, closed_parts, tolerance, logger_tag)
     
     logger.info("result", extra={
         "closed_parts": len(closed_parts),
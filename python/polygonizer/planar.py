@@ -0,0 +1,120 @@
+import math
+
+import numpy as np
+import shapely
+from shapely.strtree import STRtree
+
+from polygonizer.core import _combine_nested_polygons, _combine_intersecting_polygons
+from polygonizer.dto import PolygonPart, ClosedPolygon, Point
+from utils.logger import setup_json_logger
+
+logger = setup_json_logger("polygonizer")
+
+def _snap_endpoints(parts: list[PolygonPart], tol: float) -> list[np.ndarray]:
+    """
+    Return a copy of every part's coordinates where endpoints closer than
+    `tol` (per axis, like `Point.eq_to`) are moved onto one shared vertex,
+    so the noding step sees them as connected.
+    """
+    if tol <= 0:
+        return [part.coords for part in parts]
+
+    # cell -> representative endpoints already placed in that cell
+    grid: dict[tuple[int, int], list[tuple[float, float]]] = {}
+
+    def snap(x: float, y: float) -> tuple[float, float]:
+        cx, cy = math.floor(x / tol), math.floor(y / tol)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for rx, ry in grid.get((cx + dx, cy + dy), ()):
+                    if abs(x - rx) < tol and abs(y - ry) < tol:
+                        return rx, ry
+        grid.setdefault((cx, cy), []).append((x, y))
+        return x, y
+
+    snapped = []
+    for part in parts:
+        coords = part.coords.copy()
+        coords[0] = snap(*coords[0].tolist())
+        coords[-1] = snap(*coords[-1].tolist())
+        snapped.append(coords)
+    return snapped
+
+def _merge_closed(closed_parts: list[ClosedPolygon], tol: float) -> list[ClosedPolygon]:
+    while True:
+        count = len(closed_parts)
+        closed_parts = _combine_nested_polygons(closed_parts, tol)
+        closed_parts = _combine_intersecting_polygons(closed_parts, tol)
+        if count == len(closed_parts):
+            return closed_parts
+
+def polygonize_parts(parts: list[PolygonPart], tol: float, logger_tag: str = "polygonize_parts") -> list[ClosedPolygon]:
+    """
+    Planar-graph polygonizer: returns the closed polygons formed by `parts`.
+
+        * Endpoints closer than `tol` are snapped together
+        * All segments are noded once with `unary_union`
+        * Faces are extracted with `shapely.polygonize`; adjacent and
+          nested faces are merged into outlines with the same passes as
+          the join-based engine
+        * Every source part is mapped to the smallest outline that covers
+          it (buffered by `tol`), which gives the polygon its `handles`
+        * Parts outside every outline are boxed into one polygon, like the
+          join-based engine does with open parts that never close
+    """
+    if not parts:
+        raise ValueError("Open and closed parts are empty")
+
+    coords = _snap_endpoints(parts, tol)
+    lines = shapely.linestrings(
+        np.concatenate(coords),
+        indices=np.repeat(np.arange(len(coords)), [len(c) for c in coords])
+    )
+    # zero-length lines (a part snapped onto itself) add nothing to the graph
+    usable = shapely.length(lines) > 0
+
+    noded = shapely.unary_union(lines[usable])
+    faces = shapely.get_parts(shapely.polygonize(shapely.get_parts(noded)))
+
+    # the shell of every face; holes are faces of their own and merge back in
+    closed_parts = _merge_closed([
+        ClosedPolygon(points=shapely.get_coordinates(face.exterior), handles=[])
+        for face in faces
+        if not face.is_empty
+    ], tol)
+
+    # smallest covering outline for every source part
+    owner = np.full(len(parts), -1, dtype=np.intp)
+    if closed_parts:
+        buffered = np.array([p.buffered(tol) if tol > 0 else p.prepared_geometry for p in closed_parts], dtype=object)
+        area = np.array([p.area for p in closed_parts])
+        line_idx, outline_idx = STRtree(buffered).query(lines, predicate="covered_by")
+        by_area = np.lexsort((area[outline_idx], line_idx))
+        line_idx, outline_idx = line_idx[by_area], outline_idx[by_area]
+        first = np.unique(line_idx, return_index=True)[1]
+        owner[line_idx[first]] = outline_idx[first]
+
+    for idx, outline in enumerate(owner.tolist()):
+        if outline >= 0:
+            closed_parts[outline].handles.extend(parts[idx].handles)
+    closed_parts = [p for p in closed_parts if p.handles]
+
+    leftover = [parts[idx] for idx in np.flatnonzero(owner < 0)]
+    if leftover:
+        logger.info(f"{logger_tag} - open parts: {[part.handles for part in leftover]}")
+        bounds = np.array([part.bounds() for part in leftover])
+        min_x, min_y = bounds[:, :2].min(axis=0).tolist()
+        max_x, max_y = bounds[:, 2:].max(axis=0).tolist()
+        closed_parts.append(ClosedPolygon(
+            points=[Point(min_x, min_y), Point(max_x, min_y), Point(max_x, max_y), Point(min_x, max_y), Point(min_x, min_y)],
+            handles=[h for part in leftover for h in part.handles],
+        ))
+        closed_parts = _merge_closed(closed_parts, tol)
+
+    logger.info(f"{logger_tag} - planar", extra={
+        "parts": len(parts),
+        "faces": len(faces),
+        "closed_parts": len(closed_parts)
+    })
+
+    return closed_parts
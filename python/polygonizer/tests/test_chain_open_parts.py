@@ -0,0 +1,67 @@
+import pytest
+from polygonizer.core import _chain_open_parts
+from polygonizer.dto import PolygonPart, Point
+
+
+class TestChainOpenParts:
+    """Test cases for _chain_open_parts function"""
+
+    def test_shuffled_segments_form_closed_chains(self):
+        """Test that shuffled and reversed segments of two squares become two closed chains"""
+        parts = [
+            PolygonPart(points=[Point(0, 0), Point(1, 0)], handles=["a1"]),
+            PolygonPart(points=[Point(5, 5), Point(6, 5)], handles=["b1"]),
+            PolygonPart(points=[Point(0, 0), Point(0, 1)], handles=["a4"]),
+            PolygonPart(points=[Point(6, 6), Point(6, 5)], handles=["b2"]),
+            PolygonPart(points=[Point(1, 1), Point(1, 0)], handles=["a2"]),
+            PolygonPart(points=[Point(5, 6), Point(6, 6)], handles=["b3"]),
+            PolygonPart(points=[Point(0, 1), Point(1, 1)], handles=["a3"]),
+            PolygonPart(points=[Point(5, 6), Point(5, 5)], handles=["b4"]),
+        ]
+
+        result = _chain_open_parts(parts, 0.1)
+
+        assert len(result) == 2
+        assert all(part.is_closed(0.1) for part in result)
+        assert set(result[0].handles) == {"a1", "a2", "a3", "a4"}
+        assert set(result[1].handles) == {"b1", "b2", "b3", "b4"}
+        assert len(result[0].points) == 5
+
+    def test_chain_grows_in_both_directions(self):
+        """Test that a part in the middle of a polyline picks up parts on both ends"""
+        parts = [
+            PolygonPart(points=[Point(1, 0), Point(2, 0)], handles=["middle"]),
+            PolygonPart(points=[Point(2, 0), Point(3, 0)], handles=["right"]),
+            PolygonPart(points=[Point(0, 0), Point(1, 0)], handles=["left"]),
+        ]
+
+        result = _chain_open_parts(parts, 0.1)
+
+        assert len(result) == 1
+        assert result[0].handles == ["left", "middle", "right"]
+        assert result[0].points == [Point(0, 0), Point(1, 0), Point(2, 0), Point(3, 0)]
+
+    def test_endpoints_within_tolerance_across_cells(self):
+        """Test that endpoints closer than tol join even when they fall in neighbouring grid cells"""
+        parts = [
+            PolygonPart(points=[Point(0, 0), Point(0.999, 0)], handles=["a"]),
+            PolygonPart(points=[Point(1.001, 0), Point(2, 0)], handles=["b"]),
+        ]
+
+        result = _chain_open_parts(parts, 0.01)
+
+        assert len(result) == 1
+        assert result[0].handles == ["a", "b"]
+
+    def test_unconnected_parts_returned_unchanged(self):
+        """Test that parts without matching endpoints are returned as they are"""
+        part_a = PolygonPart(points=[Point(0, 0), Point(1, 0)], handles=["a"])
+        part_b = PolygonPart(points=[Point(0, 1), Point(1, 1)], handles=["b"])
+
+        result = _chain_open_parts([part_a, part_b], 0.1)
+
+        assert result == [part_a, part_b]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from polygonizer.codec import decode_result, encode_result
+from polygonizer.dto import ClosedPolygon, Point
+
+
+class TestResultCodec:
+    """Test cases for the binary polygonization result format"""
+
+    def test_round_trip(self):
+        """Test that vertices, handle lists and text survive encoding"""
+        polygons = [
+            ClosedPolygon(points=[Point(0, 0), Point(1.5, 0), Point(1.5, 2.25), Point(0, 0)], handles=["1A", "2B"]),
+            ClosedPolygon(points=np.array([[10, 10], [11, 10], [10, 11], [10, 10]]), handles=["3C"]),
+        ]
+
+        decoded, text = decode_result(encode_result(polygons, "0\nSECTION\n"))
+
+        assert decoded == polygons
+        assert text == "0\nSECTION\n"
+
+    def test_holes_round_trip(self):
+        """Test that the holes of each polygon survive encoding"""
+        polygons = [
+            ClosedPolygon(points=[Point(0, 0), Point(9, 0), Point(9, 9), Point(0, 0)], handles=["1"], holes=[
+                np.array([[1, 1], [2, 1], [2, 2], [1, 1]]),
+                np.array([[5, 5], [6, 5], [6, 6], [5, 5], [5.5, 5.25]]),
+            ]),
+            ClosedPolygon(points=[Point(20, 0), Point(21, 0), Point(21, 1), Point(20, 0)], handles=["2"]),
+            ClosedPolygon(points=[Point(30, 0), Point(39, 0), Point(39, 9), Point(30, 0)], handles=["3"], holes=[
+                np.array([[31, 1], [32, 1], [32, 2], [31, 1]]),
+            ]),
+        ]
+
+        decoded, _ = decode_result(encode_result(polygons))
+
+        assert decoded == polygons
+        assert [len(p.holes) for p in decoded] == [2, 0, 1]
+
+    def test_text_with_surrogate_escapes(self):
+        """Test that undecodable bytes kept by ezdxf as surrogates round-trip"""
+        text = b"LAYER \xe4\xff".decode("utf-8", "surrogateescape")
+
+        _, decoded = decode_result(encode_result([], text))
+
+        assert decoded == text
+
+    def test_empty_result(self):
+        """Test that a result without polygons round-trips"""
+        assert decode_result(encode_result([])) == ([], "")
+
+    def test_rejects_foreign_and_damaged_data(self):
+        """Test that data not produced by encode_result raises ValueError"""
+        data = encode_result([ClosedPolygon(points=[Point(0, 0), Point(1, 1)], handles=["A"])])
+
+        with pytest.raises(ValueError):
+            decode_result(b"not a result")
+        with pytest.raises(ValueError):
+            decode_result(data[:-4])
@@ -237,5 +237,28 @@ class TestCombineIntersectingPolygons:
         assert set(result[0].handles) == {"poly1", "poly2"}
 
 
+    def test_chain_of_overlaps_merges_transitively(self):
+        """Test that A-B and B-C overlaps merge A, B and C even though A and C are apart"""
+        polys = [
+            ClosedPolygon(
+                points=[Point(x, 0), Point(x + 2, 0), Point(x + 2, 2), Point(x, 2), Point(x, 0)],
+                handles=[f"poly{i}"]
+            )
+            for i, x in enumerate([0, 1.5, 3])
+        ]
+        isolated = ClosedPolygon(
+            points=[Point(10, 0), Point(11, 0), Point(11, 1), Point(10, 1), Point(10, 0)],
+            handles=["isolated"]
+        )
+
+        result = _combine_intersecting_polygons(polys + [isolated], 0.1)
+
+        assert len(result) == 2
+        assert set(result[0].handles) == {"poly0", "poly1", "poly2"}
+        assert result[1] == isolated
+
+        result_shp = ShapelyPolygon([(p.x, p.y) for p in result[0].points])
+        assert result_shp.equals(ShapelyPolygon([(0, 0), (5, 0), (5, 2), (0, 2)]))
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"]) 
\ No newline at end of file
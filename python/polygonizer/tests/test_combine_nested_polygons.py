@@ -42,6 +42,25 @@ class TestCombineNestedPolygons:
         assert len(result) == 1
         assert result[0] == parent
         assert set(result[0].handles) == {"parent_handle", "child_handle"}
+        assert len(result[0].holes) == 1
+        assert result[0].holes[0].tolist() == child.coords.tolist()
+    
+    def test_holes_of_nested_child_are_kept(self):
+        """Test that a child merged with its own holes hands them to the parent"""
+        parent = ClosedPolygon(
+            points=[Point(0, 0), Point(4, 0), Point(4, 4), Point(0, 4), Point(0, 0)],
+            handles=["parent"]
+        )
+        child = ClosedPolygon(
+            points=[Point(1, 1), Point(3, 1), Point(3, 3), Point(1, 3), Point(1, 1)],
+            handles=["child"],
+            holes=[[Point(1.5, 1.5), Point(2.5, 1.5), Point(2.5, 2.5), Point(1.5, 1.5)]]
+        )
+        
+        result = _combine_nested_polygons([parent, child], 0.1)
+        
+        assert len(result) == 1
+        assert [hole.tolist() for hole in result[0].holes] == [child.coords.tolist(), child.holes[0].tolist()]
     
     def test_multiple_nested_polygons(self):
         """Test multiple levels of nesting"""
@@ -239,6 +258,26 @@ class TestCombineNestedPolygons:
         
         assert len(result) == 1
         assert result[0] == parent
+
+    def test_grid_of_parents_each_keeps_own_children(self):
+        """Test that children are merged only into the parent that contains them"""
+        polys = []
+        for i in range(10):
+            x = i * 3
+            polys.append(ClosedPolygon(
+                points=[Point(x + 0.5, 0.5), Point(x + 1.5, 0.5), Point(x + 1.5, 1.5), Point(x + 0.5, 1.5), Point(x + 0.5, 0.5)],
+                handles=[f"child_{i}"]
+            ))
+            polys.append(ClosedPolygon(
+                points=[Point(x, 0), Point(x + 2, 0), Point(x + 2, 2), Point(x, 2), Point(x, 0)],
+                handles=[f"parent_{i}"]
+            ))
+
+        result = _combine_nested_polygons(polys, 0.1)
+
+        assert len(result) == 10
+        for i, poly in enumerate(result):
+            assert set(poly.handles) == {f"parent_{i}", f"child_{i}"}
         
 if __name__ == "__main__":
     pytest.main([__file__, "-v"]) 
\ No newline at end of file
@@ -1,6 +1,6 @@
 import pytest
 from polygonizer.dto import Point, PolygonPart, ClosedPolygon
-from polygonizer.core import combine_polygon_parts
+from polygonizer.core import combine_polygon_parts, _attach_open_parts_to_closed
 
 
 class TestCombineOpenWithClose:
@@ -23,3 +23,40 @@ class TestCombineOpenWithClose:
         assert len(open_result) == 0
         assert len(closed_result) == 1
         assert set(closed_result[0].handles) == {"closed1", "open1"}
+
+    def test_open_part_goes_to_the_closed_polygon_that_contains_it(self):
+        """Test that each open part is attached to the closed polygon around it, not the first one."""
+        left = ClosedPolygon(
+            points=[Point(0, 0), Point(1, 0), Point(1, 1), Point(0, 1), Point(0, 0)],
+            handles=["left"]
+        )
+        right = ClosedPolygon(
+            points=[Point(2, 0), Point(3, 0), Point(3, 1), Point(2, 1), Point(2, 0)],
+            handles=["right"]
+        )
+        stroke = PolygonPart(
+            points=[Point(2.2, 0.2), Point(2.5, 0.8), Point(2.8, 0.2)],
+            handles=["stroke"]
+        )
+
+        remaining = _attach_open_parts_to_closed([stroke], [left, right])
+
+        assert remaining == []
+        assert left.handles == ["left"]
+        assert right.handles == ["right", "stroke"]
+
+    def test_open_part_crossing_the_outline_is_not_attached(self):
+        """Test that an open part with a vertex outside every closed polygon stays open."""
+        closed_part = ClosedPolygon(
+            points=[Point(0, 0), Point(1, 0), Point(1, 1), Point(0, 1), Point(0, 0)],
+            handles=["closed1"]
+        )
+        open_part = PolygonPart(
+            points=[Point(0.5, 0.5), Point(1.5, 0.5)],
+            handles=["open1"]
+        )
+
+        remaining = _attach_open_parts_to_closed([open_part], [closed_part])
+
+        assert remaining == [open_part]
+        assert closed_part.handles == ["closed1"]
@@ -0,0 +1,120 @@
+import math
+import random
+
+import numpy as np
+from polygonizer.congruence import _least_rotation, canonical_ring, congruent_groups, rigid_alignment
+
+
+def _place(ring, angle, dx, dy):
+    c, s = math.cos(angle), math.sin(angle)
+    pts = np.asarray(ring, dtype=float)
+    return pts @ np.array([[c, -s], [s, c]]).T + (dx, dy)
+
+
+L_SHAPE = [(0, 0), (40, 0), (40, 10), (10, 10), (10, 30), (0, 30)]
+
+
+class TestCongruentGroups:
+    """Test cases for grouping outlines equal up to rotation and translation"""
+
+    def test_least_rotation_matches_brute_force(self):
+        """Test that Booth's algorithm finds the first least rotation"""
+        rng = random.Random(1)
+        for _ in range(200):
+            seq = [rng.randint(0, 3) for _ in range(rng.randint(1, 12))]
+            rotations = [seq[i:] + seq[:i] for i in range(len(seq))]
+            assert _least_rotation(seq) == rotations.index(min(rotations))
+
+    def test_rotated_and_shifted_copies_are_grouped(self):
+        """Test that copies at any rotation, start vertex and direction form one group"""
+        copies = [
+            _place(L_SHAPE, 0.0, 0, 0),
+            _place(L_SHAPE, math.radians(37), 500, -20),
+            np.roll(_place(L_SHAPE, math.radians(90), 10, 10), 2, axis=0)[::-1],
+        ]
+        closed = np.vstack([copies[1], copies[1][:1]])
+
+        groups = congruent_groups(copies + [closed], 0.01)
+
+        assert len(groups) == 1
+        assert [index for index, _ in groups[0].members] == [0, 1, 2, 3]
+
+    def test_alignment_maps_instance_onto_representative(self):
+        """Test that each member's matrix moves its vertices onto the representative"""
+        rings = [_place(L_SHAPE, 0.3, 5, 5), _place(L_SHAPE, 2.1, -80, 40)]
+
+        (group,) = congruent_groups(rings, 0.01)
+
+        _, matrix = group.members[1]
+        moved = rings[1] @ matrix[:2, :2].T + matrix[:2, 2]
+        _, representative = canonical_ring(rings[0], 0.01)
+        _, aligned = canonical_ring(moved, 0.01)
+        assert np.allclose(representative, aligned, atol=1e-9)
+
+    def test_mirror_image_and_other_shapes_stay_apart(self):
+        """Test that a mirrored part and a scaled part are not merged"""
+        mirrored = [(-x, y) for x, y in L_SHAPE]
+        scaled = [(x * 1.01, y * 1.01) for x, y in L_SHAPE]
+
+        groups = congruent_groups([L_SHAPE, mirrored, scaled], 0.01)
+
+        assert [g.representative for g in groups] == [0, 1, 2]
+
+    def test_rigid_alignment_rejects_deviation_above_tolerance(self):
+        """Test that the fit fails when a vertex stays further away than the tolerance"""
+        target = np.asarray(L_SHAPE, dtype=float)
+        moved = target.copy()
+        moved[3] += (0.5, 0)
+
+        assert rigid_alignment(target, target, 0.01) is not None
+        assert rigid_alignment(moved, target, 0.01) is None
+
+    def test_only_allowed_orientations_are_grouped(self):
+        """Test that with orientations a copy at another angle gets its own group"""
+        rings = [
+            _place(L_SHAPE, 0.0, 0, 0),
+            _place(L_SHAPE, math.radians(37), 500, -20),
+            _place(L_SHAPE, math.radians(90), 10, 10),
+            _place(L_SHAPE, math.radians(180) + 1e-7, -50, 10),
+        ]
+
+        groups = congruent_groups(rings, 0.01, orientations=[0, 90, 180, 270])
+
+        assert [[index for index, _ in g.members] for g in groups] == [[0, 2, 3], [1]]
+        for _, matrix in groups[0].members:
+            angle = math.degrees(math.atan2(matrix[1, 0], matrix[0, 0]))
+            assert min(abs((angle - o + 180) % 360 - 180) for o in (0, 90, 180, 270)) < 1e-3
+
+    def test_symmetric_outline_matched_at_allowed_angle(self):
+        """Test that a symmetric outline is tried at each symmetric start"""
+        hexagon = np.array([(math.cos(a), math.sin(a)) for a in np.radians(np.arange(0, 360, 60))]) * 20
+        rings = [hexagon, _place(hexagon, math.radians(120), 100, 0)]
+
+        groups = congruent_groups(rings, 0.01, orientations=[0, 90, 180, 270])
+
+        assert len(groups) == 1
+
+    def test_holes_are_part_of_the_signature(self):
+        """Test that equal outlines with different holes stay apart"""
+        plate = [(0, 0), (40, 0), (40, 40), (0, 40)]
+        hole = [(5, 5), (10, 5), (10, 10), (5, 10)]
+        moved_hole = [(x + 20, y + 20) for x, y in hole]
+        round_hole = [(7.5 + 3 * math.cos(a), 7.5 + 3 * math.sin(a)) for a in np.linspace(0, 2 * math.pi, 12, endpoint=False)]
+
+        groups = congruent_groups([plate, plate, plate, plate], 0.01, holes=[[hole], [moved_hole], [round_hole], []])
+
+        assert [g.representative for g in groups] == [0, 1, 2, 3]
+
+    def test_rotated_parts_with_holes_are_grouped(self):
+        """Test that a rotated copy keeps its holes matched, in any hole order and start vertex"""
+        plate = [(0, 0), (40, 0), (40, 40), (0, 40)]
+        holes = [[(5, 5), (10, 5), (10, 10), (5, 10)], [(30, 5), (33, 5), (33, 30)]]
+        angle = math.radians(90)
+        rings = [plate, _place(plate, angle, 100, 7)]
+        copy_holes = [np.roll(_place(holes[1], angle, 100, 7), 1, axis=0), _place(holes[0], angle, 100, 7)]
+
+        (group,) = congruent_groups(rings, 0.01, holes=[holes, copy_holes], orientations=[0, 90, 180, 270])
+
+        _, matrix = group.members[1]
+        moved = _place(copy_holes[1], 0, 0, 0) @ matrix[:2, :2].T + matrix[:2, 2]
+        assert np.allclose(moved, holes[0], atol=1e-9)
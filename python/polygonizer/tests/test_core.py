@@ -1,7 +1,7 @@
 import pytest
 from shapely.geometry import Polygon as ShapelyPolygon
 from polygonizer.core import combine_polygon_parts
-from polygonizer.dto import PolygonPart, Point, ClosedPolygon
+from polygonizer.dto import PolygonPart, Point, ClosedPolygon, CombineStats
 
 
 class TestCombinePolygonParts:
@@ -107,6 +107,32 @@ class TestCombinePolygonParts:
         expected_shapely = ShapelyPolygon([(p.x, p.y) for p in expected_points])
         
         assert result_shapely.equals(expected_shapely)
+
+    def test_stats_count_only_dirty_pairs_after_first_pass(self):
+        """Test that after a merge only the new polygon is re-checked against the rest"""
+        poly_1 = ClosedPolygon(
+            points=[Point(0, 0), Point(1, 0), Point(1, 1), Point(0, 1), Point(0, 0)],
+            handles=["poly_1"]
+        )
+        poly_2 = ClosedPolygon(
+            points=[Point(0.5, 0.5), Point(1.5, 0.5), Point(1.5, 1.5), Point(0.5, 1.5), Point(0.5, 0.5)],
+            handles=["poly_2"]
+        )
+        poly_3 = ClosedPolygon(
+            points=[Point(1.4, 1.4), Point(1.6, 1.4), Point(1.6, 1.6), Point(1.4, 1.6), Point(1.4, 1.4)],
+            handles=["poly_3"]
+        )
+        stats = CombineStats()
+        
+        open, close = combine_polygon_parts([], [poly_1, poly_2, poly_3], 0.01, stats=stats)
+        
+        assert len(open) == 0
+        assert len(close) == 1
+        assert set(close[0].handles) == {"poly_1", "poly_2", "poly_3"}
+        assert stats.iterations == 2
+        # first pass: every envelope-overlapping pair, second pass: merged polygon only
+        assert stats.nested_pair_checks == 4 + 0
+        assert stats.intersecting_pair_checks == 2 + 0
         
 if __name__ == "__main__":
     pytest.main([__file__]) 
\ No newline at end of file
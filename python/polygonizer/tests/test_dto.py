@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+from polygonizer.dto import Point, PolygonPart, ClosedPolygon
+
+
+class TestVertexStorage:
+    """Test cases for the array-backed PolygonPart and ClosedPolygon"""
+
+    def test_points_and_array_inputs_are_equivalent(self):
+        """Test that a list of Points and an (N, 2) array produce the same part"""
+        from_points = PolygonPart(points=[Point(0, 0), Point(1, 0), Point(1, 1)], handles=["h"])
+        from_array = PolygonPart(points=np.array([[0, 0], [1, 0], [1, 1]]), handles=["h"])
+
+        assert from_points == from_array
+        assert from_points.coords.dtype == np.float64
+        assert from_points.coords.shape == (3, 2)
+        assert from_array.points == [Point(0, 0), Point(1, 0), Point(1, 1)]
+
+    def test_points_setter_replaces_coords(self):
+        """Test that assigning points updates the coordinate array"""
+        poly = ClosedPolygon(points=[Point(0, 0), Point(1, 0)], handles=["h"])
+
+        poly.points = [Point(2, 2), Point(3, 3), Point(2, 2)]
+
+        assert poly.coords.tolist() == [[2, 2], [3, 3], [2, 2]]
+
+    def test_bounds(self):
+        """Test that bounds are computed from the array"""
+        part = PolygonPart(points=[Point(1, 5), Point(-2, 3), Point(4, -1)], handles=["h"])
+
+        assert part.bounds() == (-2, -1, 4, 5)
+
+    def test_is_closed_and_to_closed_polygon(self):
+        """Test closing detection with tolerance and conversion to ClosedPolygon"""
+        part = PolygonPart(points=[Point(0, 0), Point(1, 0), Point(1, 1), Point(0.01, 0)], handles=["h"])
+
+        assert part.is_closed(0.1)
+        assert not part.is_closed(0.001)
+        closed = part.to_closed_polygon()
+        assert isinstance(closed, ClosedPolygon)
+        assert closed.handles == ["h"]
+        assert np.array_equal(closed.coords, part.coords)
+
+    def test_different_types_are_not_equal(self):
+        """Test that an open part never equals a closed polygon with the same data"""
+        points = [Point(0, 0), Point(1, 0), Point(0, 0)]
+
+        assert PolygonPart(points=points, handles=["h"]) != ClosedPolygon(points=points, handles=["h"])
+
+
+
+class TestClosedPolygonGeometryCache:
+    """Test cases for the memoized geometry on ClosedPolygon"""
+
+    def square(self):
+        return ClosedPolygon(
+            points=[Point(0, 0), Point(2, 0), Point(2, 2), Point(0, 2), Point(0, 0)],
+            handles=["square"]
+        )
+
+    def test_geometry_and_derived_values_are_memoized(self):
+        """Test that geometry, area, bounds and the buffered variant are built once"""
+        poly = self.square()
+
+        assert poly.geometry is poly.geometry
+        assert poly.prepared_geometry is poly.geometry
+        assert poly.area == 4
+        assert poly.bounds() == (0, 0, 2, 2)
+        assert poly.buffered(0.1) is poly.buffered(0.1)
+        assert poly.buffered(0.1).area > poly.area
+
+    def test_buffered_rebuilt_for_other_tolerance(self):
+        """Test that asking for another tolerance rebuilds the buffered geometry"""
+        poly = self.square()
+
+        small = poly.buffered(0.1)
+        large = poly.buffered(0.5)
+
+        assert large is not small
+        assert large.area > small.area
+
+    def test_assigning_points_invalidates_cache(self):
+        """Test that the cache is rebuilt only after the vertices change"""
+        poly = self.square()
+        geometry = poly.geometry
+        poly.handles.append("other")
+
+        assert poly.geometry is geometry
+
+        poly.points = [Point(0, 0), Point(1, 0), Point(1, 1), Point(0, 1), Point(0, 0)]
+
+        assert poly.geometry is not geometry
+        assert poly.area == 1
+        assert poly.bounds() == (0, 0, 1, 1)
+
+    def test_coords_cannot_be_changed_in_place(self):
+        """Test that in-place edits are rejected so the cache cannot go stale"""
+        poly = self.square()
+
+        with pytest.raises(ValueError):
+            poly.coords[0, 0] = 5
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,144 @@
+import math
+from unittest.mock import patch
+
+import ezdxf
+import numpy as np
+from shapely.geometry import LineString
+import polygonizer.dxf as dxf_module
+from polygonizer.dxf import BlockInstance, _flatten_entity, _remove_duplicate_points, polygon_parts_from_dxf
+
+
+def _ezdxf_xy(vertices):
+    return np.array([(v.x, v.y) for v in vertices])
+
+
+class TestAnalyticTessellation:
+    """Test cases for the NumPy ARC/CIRCLE/ELLIPSE tessellation"""
+
+    def setup_method(self):
+        self.msp = ezdxf.new().modelspace()
+
+    def test_circle_matches_ezdxf_flattening(self):
+        """Test that a circle has ezdxf's segment count and vertices and closes exactly"""
+        circle = self.msp.add_circle((3, 4), 7.5)
+
+        pts, handle = _flatten_entity(circle, 0.01)
+
+        expected = _ezdxf_xy(circle.flattening(sagitta=0.01))
+        assert handle == circle.dxf.handle
+        assert pts.shape == expected.shape
+        assert np.allclose(pts, expected, atol=1e-9)
+        assert pts[0].tolist() == pts[-1].tolist()
+
+    def test_arc_with_mirrored_extrusion_matches_ezdxf(self):
+        """Test that an arc in a mirrored OCS is mapped to the same WCS vertices"""
+        arc = self.msp.add_arc((10, 2, 1), 5, 300, 45, dxfattribs={"extrusion": (0, 0, -1)})
+
+        pts, _ = _flatten_entity(arc, 0.05)
+
+        expected = _ezdxf_xy(arc.flattening(sagitta=0.05))
+        assert pts.shape == expected.shape
+        assert np.allclose(pts, expected, atol=1e-9)
+
+    def test_arc_smaller_than_tolerance_is_empty(self):
+        """Test that arcs with a radius below the tolerance produce no vertices"""
+        arc = self.msp.add_arc((0, 0), 0.001, 0, 90)
+
+        pts, _ = _flatten_entity(arc, 0.01)
+
+        assert len(pts) == 0
+
+    def test_ellipse_stays_within_tolerance(self):
+        """Test that ellipse vertices deviate from the curve by at most the tolerance"""
+        ellipse = self.msp.add_ellipse((1, 1), (8, 2, 0), 0.3, 0, math.tau)
+
+        pts, _ = _flatten_entity(ellipse, 0.01)
+
+        reference = _ezdxf_xy(ellipse.flattening(distance=0.0001))
+        assert pts[0].tolist() == pts[-1].tolist()
+        assert LineString(reference).hausdorff_distance(LineString(pts)) <= 0.01
+
+
+class TestRemoveDuplicatePoints:
+    """Test cases for vertex de-duplication"""
+
+    @staticmethod
+    def _reference(pts, tol):
+        keep = [0]
+        last_x, last_y = pts[0]
+        for i, (x, y) in enumerate(pts.tolist()):
+            if abs(x - last_x) < tol and abs(y - last_y) < tol:
+                continue
+            keep.append(i)
+            last_x, last_y = x, y
+        return pts[keep]
+
+    def test_compares_against_last_kept_point(self):
+        """Test that a run of small steps is measured from the last kept vertex"""
+        pts = np.array([[0, 0], [0.4, 0], [0.8, 0], [1.2, 0], [5, 5], [5.1, 5]])
+
+        result = _remove_duplicate_points(pts, 1.0)
+
+        assert result.tolist() == [[0, 0], [1.2, 0], [5, 5]]
+
+    def test_matches_sequential_reference(self):
+        """Test the vectorized version against the sequential definition"""
+        rng = np.random.default_rng(0)
+        for _ in range(200):
+            n = int(rng.integers(2, 40))
+            steps = rng.normal(0, 1, (n, 2)) * rng.choice([0.01, 1.0], (n, 1))
+            pts = np.cumsum(steps, axis=0)
+
+            assert np.array_equal(_remove_duplicate_points(pts, 0.3), self._reference(pts, 0.3))
+
+
+class TestBlockTessellationCache:
+    """Test cases for placing cached block tessellations at every reference"""
+
+    def _decomposed_doc(self, references):
+        doc = ezdxf.new()
+        block = doc.blocks.new("HOLE")
+        block.add_circle((2, 0), 1.5)
+        block.add_arc((0, 0), 4, 10, 170)
+        block.add_line((0, 0), (1, 1))
+
+        msp = doc.modelspace()
+        blocks = {}
+        for key, attribs in enumerate(references):
+            insert = msp.add_blockref("HOLE", (key * 20, 5), dxfattribs=attribs)
+            matrix = np.array(list(insert.matrix44().rows()))
+            for entity in list(insert.virtual_entities()):
+                msp.add_entity(entity)
+                doc.entitydb.add(entity)
+                blocks[entity.dxf.handle] = BlockInstance(
+                    block="HOLE", source=entity.source_of_copy, insert=key, matrix=matrix
+                )
+            msp.delete_entity(insert)
+        return doc, blocks
+
+    def test_cached_parts_match_direct_flattening(self):
+        """Test that placed block curves stay within tolerance of the flattened copies"""
+        doc, blocks = self._decomposed_doc([
+            {"rotation": 0},
+            {"rotation": 33, "xscale": 2, "yscale": 2},
+            {"rotation": 90, "extrusion": (0, 0, -1)},
+        ])
+
+        direct = polygon_parts_from_dxf(doc, 0.01)
+        cached = polygon_parts_from_dxf(doc, 0.01, blocks)
+
+        assert [part.handles for part in cached] == [part.handles for part in direct]
+        for a, b in zip(direct, cached):
+            assert LineString(a.coords).hausdorff_distance(LineString(b.coords)) <= 0.01
+
+    def test_each_definition_is_tessellated_once_per_scale(self):
+        """Test that references with the same scale share one tessellation"""
+        doc, blocks = self._decomposed_doc([{"rotation": 10 * i} for i in range(5)] + [{"xscale": 3, "yscale": 3}])
+
+        with patch("polygonizer.dxf._flatten_entity", wraps=dxf_module._flatten_entity) as flatten:
+            polygon_parts_from_dxf(doc, 0.01, blocks)
+
+        curves = [call.args[0] for call in flatten.call_args_list if call.args[0].dxftype() in ("ARC", "CIRCLE")]
+        # circle and arc of the definition, once for scale 1 and once for scale 3
+        assert len(curves) == 4
+        assert all(curve.dxf.owner != doc.modelspace().layout_key for curve in curves)
@@ -0,0 +1,99 @@
+import pytest
+from shapely.geometry import Polygon as ShapelyPolygon
+from polygonizer.core import combine_polygon_parts
+from polygonizer.dto import PolygonPart, Point, ClosedPolygon
+from polygonizer.planar import polygonize_parts
+
+
+def square(x, y, size, handle):
+    return PolygonPart(
+        points=[Point(x, y), Point(x + size, y), Point(x + size, y + size), Point(x, y + size), Point(x, y)],
+        handles=[handle]
+    )
+
+
+def handle_groups(polygons):
+    return sorted(sorted(p.handles) for p in polygons)
+
+
+class TestPolygonizeParts:
+    """Test cases for the planar-graph polygonizer, checked against the join-based engine"""
+
+    def assert_same_as_join_engine(self, parts, tol):
+        closed = [part.to_closed_polygon() for part in parts if part.is_closed(tol)]
+        opened = [part for part in parts if not part.is_closed(tol)]
+        _, join_result = combine_polygon_parts(
+            [PolygonPart(points=p.coords, handles=list(p.handles)) for p in opened],
+            [ClosedPolygon(points=p.coords, handles=list(p.handles)) for p in closed],
+            tol
+        )
+        planar_result = polygonize_parts(parts, tol)
+        assert handle_groups(planar_result) == handle_groups(join_result)
+        return planar_result
+
+    def test_empty_inputs_raises_error(self):
+        """Test that empty input raises ValueError like the join-based engine"""
+        with pytest.raises(ValueError, match="Open and closed parts are empty"):
+            polygonize_parts([], 0.1)
+
+    def test_separate_closed_parts(self):
+        """Test that separate closed parts stay separate"""
+        result = self.assert_same_as_join_engine([square(0, 0, 1, "a"), square(2, 2, 1, "b")], 0.1)
+
+        assert len(result) == 2
+
+    def test_intersecting_closed_parts_merge(self):
+        """Test that two overlapping squares become their union"""
+        result = self.assert_same_as_join_engine([square(0, 0, 1, "a"), square(0.5, 0.5, 1, "b")], 0.1)
+
+        assert len(result) == 1
+        expected = ShapelyPolygon([(0, 0), (1, 0), (1, 0.5), (1.5, 0.5), (1.5, 1.5), (0.5, 1.5), (0.5, 1), (0, 1)])
+        assert ShapelyPolygon(result[0].coords).equals(expected)
+
+    def test_open_line_inside_closed_polygon(self):
+        """Test that an open line inside a closed polygon joins its handles"""
+        line = PolygonPart(points=[Point(0.25, 0.25), Point(0.25, 0.5)], handles=["line"])
+
+        self.assert_same_as_join_engine([square(0, 0, 1, "outline"), line], 0.1)
+
+    def test_open_lines_form_rectangle_with_gaps(self):
+        """Test that loose segments with sub-tolerance gaps form one polygon"""
+        parts = [
+            PolygonPart(points=[Point(0, 0), Point(1, 0)], handles=["h1"]),
+            PolygonPart(points=[Point(1.02, 0.01), Point(1, 1)], handles=["h2"]),
+            PolygonPart(points=[Point(0, 1), Point(0.99, 1.01)], handles=["h3"]),
+            PolygonPart(points=[Point(0, 1), Point(0.01, 0.02)], handles=["h4"]),
+        ]
+
+        result = self.assert_same_as_join_engine(parts, 0.05)
+
+        assert len(result) == 1
+        assert ShapelyPolygon(result[0].coords).area == pytest.approx(1, abs=0.05)
+
+    def test_nested_and_shared_edge_faces_merge_into_outline(self):
+        """Test that a hole and a dividing line merge into the outer outline"""
+        parts = [
+            square(0, 0, 4, "outer"),
+            PolygonPart(points=[Point(2, 0), Point(2, 4)], handles=["divider"]),
+            square(0.5, 0.5, 1, "hole"),
+        ]
+
+        result = self.assert_same_as_join_engine(parts, 0.1)
+
+        assert len(result) == 1
+
+    def test_dangling_parts_are_boxed(self):
+        """Test that parts outside every face end up in one bounding-box polygon"""
+        parts = [
+            square(0, 0, 1, "outline"),
+            PolygonPart(points=[Point(5, 5), Point(6, 5)], handles=["dangle1"]),
+            PolygonPart(points=[Point(5, 6), Point(6, 7)], handles=["dangle2"]),
+        ]
+
+        result = self.assert_same_as_join_engine(parts, 0.1)
+
+        assert ["dangle1", "dangle2"] in handle_groups(result)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
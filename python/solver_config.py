@@ -0,0 +1,117 @@
+"""
+Solver configuration sized to the job instead of fixed values.
+
+`n_samples` is the main cost driver. A linear cost model, fitted on the
+worker hardware by benchmarks/bench_solver_calibration.py, predicts the
+solver time from it, the number of parts and their mean vertex count. The
+planner takes as many samples as the time budget allows, no more than the
+job's size calls for. `quadtree_depth` and `hpg_n_cells` follow the total
+edge and part counts; a job of about 100 parts and 1000 edges gets the
+former fixed values.
+
+The budget comes from the owner's remaining balance, in minutes.
+
+The planner is off until a cost model calibrated on the worker hardware
+is deployed: the built-in coefficients are rough guesses.
+"""
+from __future__ import annotations
+
+import json
+import math
+import os
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+
+# The values used for every job before the planner
+DEFAULT_PLAN = {"quadtree_depth": 5, "hpg_n_cells": 2000, "n_samples": 500000}
+
+PLANNER = os.environ.get("NEST_SOLVER_PLANNER", "off") == "on"
+COST_MODEL_PATH = os.environ.get("NEST_SOLVER_COST_MODEL")
+MIN_BUDGET = float(os.environ.get("NEST_SOLVER_MIN_BUDGET_S", 10))
+MAX_BUDGET = float(os.environ.get("NEST_SOLVER_MAX_BUDGET_S", 600))
+
+MIN_SAMPLES = 20000
+MAX_SAMPLES = DEFAULT_PLAN["n_samples"]
+SAMPLES_PER_PART = 20000
+
+@dataclass
+class CostModel:
+    """
+    seconds = base + n_samples * (per_sample + per_part_sample * parts
+                                  + per_vertex_sample * mean vertices)
+
+    The defaults are rough; run the calibration and point
+    NEST_SOLVER_COST_MODEL at its output.
+    """
+    base: float = 0.5
+    per_sample: float = 2e-6
+    per_part_sample: float = 2e-7
+    per_vertex_sample: float = 1e-8
+
+    @staticmethod
+    def features(n_samples, parts, mean_vertices) -> np.ndarray:
+        n_samples = np.asarray(n_samples, dtype=float)
+        return np.column_stack((
+            np.ones_like(n_samples),
+            n_samples,
+            n_samples * np.asarray(parts, dtype=float),
+            n_samples * np.asarray(mean_vertices, dtype=float),
+        ))
+
+    @classmethod
+    def fit(cls, n_samples, parts, mean_vertices, seconds) -> CostModel:
+        coefficients, *_ = np.linalg.lstsq(cls.features(n_samples, parts, mean_vertices), np.asarray(seconds, dtype=float), rcond=None)
+        return cls(*(max(float(c), 0.0) for c in coefficients))
+
+    @classmethod
+    def load(cls, path: Optional[str] = COST_MODEL_PATH) -> CostModel:
+        if not path:
+            return cls()
+        with open(path) as fp:
+            return cls(**json.load(fp))
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as fp:
+            json.dump(asdict(self), fp, indent=2)
+
+    def predict(self, n_samples: float, parts: float, mean_vertices: float) -> float:
+        return self.base + n_samples * self._per_sample(parts, mean_vertices)
+
+    def samples_within(self, seconds: float, parts: float, mean_vertices: float) -> int:
+        per_sample = self._per_sample(parts, mean_vertices)
+        if per_sample <= 0:
+            return MAX_SAMPLES
+        return int(max(seconds - self.base, 0.0) / per_sample)
+
+    def _per_sample(self, parts: float, mean_vertices: float) -> float:
+        return self.per_sample + self.per_part_sample * parts + self.per_vertex_sample * mean_vertices
+
+@lru_cache(maxsize=1)
+def default_model() -> CostModel:
+    """The model at NEST_SOLVER_COST_MODEL, read once per process."""
+    return CostModel.load(COST_MODEL_PATH)
+
+def budget_for_balance(balance_minutes: Optional[float]) -> float:
+    """Seconds of solver time for a job of an owner with this balance, unknown balances get the maximum."""
+    if balance_minutes is None:
+        return MAX_BUDGET
+    return min(max(float(balance_minutes) * 60, MIN_BUDGET), MAX_BUDGET)
+
+def plan(items: list[dict], budget: float, model: Optional[CostModel] = None) -> dict:
+    """Solver parameters for the jagua-rs `items` within `budget` seconds."""
+    model = model or default_model()
+    parts = sum(item["Demand"] for item in items)
+    if parts == 0:
+        return dict(DEFAULT_PLAN)
+    edges = sum(len(item["Shape"]["Data"]) * item["Demand"] for item in items)
+    mean_vertices = edges / parts
+
+    n_samples = min(model.samples_within(budget, parts, mean_vertices), SAMPLES_PER_PART * parts, MAX_SAMPLES)
+    return {
+        "quadtree_depth": min(max(math.ceil(math.log(max(edges, 1), 4)), 3), 8),
+        "hpg_n_cells": min(max(20 * parts, 200), 10000),
+        "n_samples": max(n_samples, MIN_SAMPLES),
+    }
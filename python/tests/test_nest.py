@@ -0,0 +1,231 @@
+import math
+
+import ezdxf
+import ezdxf.path
+import numpy as np
+import pytest
+import shapely
+from ezdxf import transform
+from ezdxf.math import Matrix44
+from shapely.geometry import LineString, Polygon
+
+import nest
+import nest_portfolio
+from nest_bridge import PLACEMENT_DTYPE, NestSolution
+from nest import (
+    MAX_QUAD_SEGS, NestPolygone, NestRequest, NestResultLayout, Transform, buildLayoutDoc, buildResultBlocks, buildResultDxf,
+    convertPolygoneGroupsToJaguarRequest, offsetDistance, offsetQuadSegs, partBlockName, thinRing
+)
+from polygone import DxfPolygon
+
+
+def thin_loop(xs, ys, tolerance: float) -> list[list[float]]:
+    """The vertex thinning of the former per-polygon conversion"""
+    prev_point = [xs[0], ys[0]]
+    points = [prev_point]
+    for i in range(len(xs)):
+        dx = xs[i] - prev_point[0]
+        dy = ys[i] - prev_point[1]
+        if dx * dx + dy * dy < tolerance * tolerance * 2:
+            continue
+        prev_point = [xs[i], ys[i]]
+        points.append([xs[i], ys[i]])
+    return points
+
+
+def outlines(count: int, seed: int = 0) -> list[Polygon]:
+    rng = np.random.default_rng(seed)
+    result = []
+    for _ in range(count):
+        vertices = int(rng.integers(3, 40))
+        angles = np.sort(rng.uniform(0, 2 * math.pi, vertices))
+        radius = rng.uniform(5, 50, vertices)
+        result.append(Polygon(np.column_stack((np.cos(angles) * radius, np.sin(angles) * radius)) + rng.uniform(-100, 100, 2)).convex_hull)
+    return result
+
+
+class TestThinRing:
+    """Test cases for the vectorized vertex thinning"""
+
+    @pytest.mark.parametrize("seed", range(5))
+    def test_matches_loop(self, seed):
+        """Test that clustered, evenly spaced and random rings thin like the former loop"""
+        rng = np.random.default_rng(seed)
+        steps = np.where(rng.random((500, 1)) < 0.6, rng.normal(0, 0.05, (500, 2)), rng.normal(0, 2, (500, 2)))
+        ring = np.cumsum(steps, axis=0)
+        ring = np.vstack((ring, ring[:1]))
+
+        for tolerance in (0.01, 0.1, 0.5, 3):
+            expected = thin_loop(ring[:, 0].tolist(), ring[:, 1].tolist(), tolerance)
+            np.testing.assert_array_equal(thinRing(ring, tolerance), expected)
+
+    def test_nothing_to_drop(self):
+        ring = np.array([[0, 0], [10, 0], [10, 10], [0, 0]], dtype=float)
+
+        assert thinRing(ring, 0.1) is ring
+
+    def test_run_of_close_vertices(self):
+        """Test that a run is measured from the last vertex kept, not from each predecessor"""
+        ring = np.array([[0, 0], [0.1, 0], [0.2, 0], [0.3, 0], [0.4, 0], [5, 0], [5, 5], [0, 0]], dtype=float)
+
+        np.testing.assert_array_equal(thinRing(ring, 0.15), [[0, 0], [0.3, 0], [5, 0], [5, 5], [0, 0]])
+
+
+class TestConvertPolygoneGroups:
+    """Test cases for the bulk offset of the solver outlines"""
+
+    def test_matches_per_polygon_loop(self):
+        """Test that the default settings give the outlines of the former per-polygon buffer"""
+        polygons = outlines(30)
+        groups = [DxfPolygon(polygon, []) for polygon in polygons]
+
+        items = convertPolygoneGroupsToJaguarRequest(groups, list(range(1, 31)), 2.0, 0.1)
+
+        assert len(items) == 30
+        for polygon, item, count in zip(polygons, items, range(1, 31)):
+            xs, ys = polygon.buffer(2.0).exterior.xy
+            assert item["Demand"] == count
+            np.testing.assert_allclose(item["Shape"]["Data"], thin_loop(xs, ys, 0.1))
+
+    def test_empty_groups_skipped(self):
+        groups = [DxfPolygon(Polygon(), []), DxfPolygon(outlines(1)[0], [])]
+
+        items = convertPolygoneGroupsToJaguarRequest(groups, [5, 7], 1.0, 0.1)
+
+        assert [item["Demand"] for item in items] == [7]
+
+    def test_default_quad_segs(self):
+        assert offsetQuadSegs(2.0, 0.5) == MAX_QUAD_SEGS
+        assert offsetDistance(2.0, MAX_QUAD_SEGS) == 2.0
+
+    @pytest.mark.parametrize("quad_segs", [1, 2, 3, 5, 8, 15])
+    def test_reduced_quad_segs_keep_spacing(self, quad_segs):
+        """Test that fewer segments per quarter circle do not bring the offset closer than the spacing"""
+        for polygon in outlines(10, seed=1):
+            offset = shapely.buffer(polygon, offsetDistance(2.0, quad_segs), quad_segs=quad_segs)
+
+            assert shapely.distance(offset.exterior, polygon) >= 2.0 * (1 - 1e-9)
+
+    @pytest.mark.parametrize("spacing, tolerance", [(2.0, 0.1), (2.0, 0.5), (1.0, 1.0), (5.0, 0.01)])
+    def test_auto_quad_segs_keeps_spacing(self, monkeypatch, spacing, tolerance):
+        """Test that with "auto" only the vertex thinning, not the arcs, eats into the spacing"""
+        monkeypatch.setattr(nest, "OFFSET_QUAD_SEGS", "auto")
+        polygons = outlines(10, seed=1)
+
+        items = convertPolygoneGroupsToJaguarRequest([DxfPolygon(p, []) for p in polygons], [1] * 10, spacing, tolerance)
+
+        for polygon, item in zip(polygons, items):
+            offset = Polygon(item["Shape"]["Data"])
+            assert shapely.distance(offset.exterior, polygon) >= spacing - math.sqrt(2) * tolerance
+
+
+def part_entities() -> list:
+    """Entities of one part, among them an arc drawn with a mirrored extrusion"""
+    doc = ezdxf.new()
+    msp = doc.modelspace()
+    msp.add_line((0, 0), (40, 0), dxfattribs={"color": 1})
+    msp.add_lwpolyline([(40, 0, 0, 0, 0.5), (40, 20), (0, 20), (0, 0)], format="xyseb", close=False, dxfattribs={"color": 2})
+    msp.add_circle((10, 10), 4, dxfattribs={"color": 3})
+    msp.add_arc((30, 10), 5, 30, 200, dxfattribs={"color": 1})
+    msp.add_arc((20, 5), 3, 10, 120, dxfattribs={"color": 5, "extrusion": (0, 0, -1)})
+    msp.add_ellipse((20, 14), major_axis=(6, 2), ratio=0.4, start_param=0.3, end_param=4.0, dxfattribs={"color": 2})
+    return list(msp)
+
+
+def outline_points(entity) -> np.ndarray:
+    return np.array([(v.x, v.y) for v in ezdxf.path.make_path(entity).flattening(0.001)])
+
+
+def assert_same_geometry(entities: list, exploded: list) -> None:
+    assert [e.dxftype() for e in entities] == [e.dxftype() for e in exploded]
+    for expected, actual in zip(entities, exploded):
+        assert actual.dxf.layer == expected.dxf.layer
+        distance = shapely.hausdorff_distance(LineString(outline_points(expected)), LineString(outline_points(actual)))
+        assert distance < 0.005, f"{expected.dxftype()} differs by {distance}"
+
+
+def rotation(degrees: float) -> np.ndarray:
+    c, s = math.cos(math.radians(degrees)), math.sin(math.radians(degrees))
+    return np.array([[c, -s, 3.5], [s, c, -7.25], [0, 0, 1]])
+
+
+class TestBlocksLayout:
+    """Test cases for the BLOCK/INSERT output against copied entities"""
+
+    def layouts(self, transforms: list[Transform]) -> tuple:
+        request = NestRequest([NestPolygone(DxfPolygon(Polygon([(0, 0), (40, 0), (40, 20), (0, 20)]), part_entities()), 4)], 500, 500, 1, 0.1, 1)
+        entities = buildLayoutDoc(NestResultLayout(buildResultDxf(request, transforms)))
+        blocks = buildLayoutDoc(buildResultBlocks(request, transforms))
+        return entities, blocks
+
+    @pytest.mark.parametrize("transforms", [
+        [Transform(0, 100, 50, 0)],
+        [Transform(0, 100, 50, 90), Transform(0, 10, 300, 270)],
+        [Transform(0, 250, 120, 180, rotation(90)), Transform(0, 40, 40, 90, rotation(-90))],
+        [Transform(0, 60, 60, 270, rotation(37))],
+    ])
+    def test_inserts_match_entities(self, transforms):
+        """Test that each exploded INSERT equals the entities placed by the same transform"""
+        entities, blocks = self.layouts(transforms)
+
+        inserts = list(blocks.modelspace().query("INSERT"))
+        assert len(inserts) == len(transforms)
+        assert len(blocks.blocks.get(partBlockName(0))) == len(part_entities())
+        exploded = [entity for insert in inserts for entity in insert.virtual_entities()]
+        assert_same_geometry(list(entities.modelspace()), exploded)
+
+    @pytest.mark.parametrize("degrees", [0, 90, 215])
+    def test_mirrored_matrix(self, degrees):
+        """Test that a mirroring placement matrix turns into a negative y scale"""
+        matrix = Matrix44.scale(1, -1, 1) @ Matrix44.z_rotate(math.radians(degrees)) @ Matrix44.translate(120, 80, 0)
+        placed = [entity.copy() for entity in part_entities()]
+        transform.inplace(placed, m=matrix)
+
+        entities = buildLayoutDoc(NestResultLayout(placed))
+        blocks = buildLayoutDoc(NestResultLayout([], {0: part_entities()}, [(0, matrix)]))
+
+        (insert,) = blocks.modelspace().query("INSERT")
+        assert insert.dxf.yscale == pytest.approx(-1)
+        assert_same_geometry(list(entities.modelspace()), list(insert.virtual_entities()))
+
+
+def two_sheet_solution(request_object: dict, item_areas, sheet_area) -> NestSolution:
+    """Three placements of the first item and two of the second over two sheets"""
+    placements = np.zeros(5, dtype=PLACEMENT_DTYPE)
+    placements["layout"] = [0, 0, 0, 1, 1]
+    placements["item"] = [0, 1, 0, 0, 1]
+    placements["rotation"] = [0, 90, 180, 270, 0]
+    placements["x"] = [10, 200, 60, 10, 300]
+    placements["y"] = [10, 20, 150, 40, 80]
+    return NestSolution(2, placements)
+
+
+def layout_geometry(layout: NestResultLayout) -> list:
+    entities = list(buildLayoutDoc(layout).modelspace())
+    exploded = [e for entity in entities for e in (entity.virtual_entities() if entity.dxftype() == "INSERT" else [entity])]
+    return [(entity.dxftype(), outline_points(entity).round(6).tolist()) for entity in exploded]
+
+
+class TestStreamLayouts:
+    """Test cases for building layouts one by one instead of all at once"""
+
+    @pytest.mark.parametrize("output_mode", ["entities", "blocks"])
+    def test_stream_matches_list(self, monkeypatch, output_mode):
+        """Test that the streamed layouts are the layouts of list mode, in the same order"""
+        monkeypatch.setattr(nest, "OUTPUT_MODE", output_mode)
+        monkeypatch.setattr(nest_portfolio, "run_portfolio", two_sheet_solution)
+        triangle = ezdxf.new().modelspace().add_lwpolyline([(0, 0), (30, 0), (0, 30)], close=True)
+        request = NestRequest([
+            NestPolygone(DxfPolygon(Polygon([(0, 0), (40, 0), (40, 20), (0, 20)]), part_entities()), 3),
+            NestPolygone(DxfPolygon(Polygon([(0, 0), (30, 0), (0, 30)]), [triangle]), 2),
+        ], 500, 500, 1, 0.1, 1)
+
+        listed = nest.nest(request)
+        streamed = nest.nest(request, stream_layouts=True)
+
+        assert not isinstance(streamed.layouts, list)
+        assert (streamed.requestCount, streamed.placedCount, streamed.layoutCount) == (5, 5, 2)
+        streamed_layouts = list(streamed.layouts)
+        assert len(streamed_layouts) == len(listed.layouts) == 2
+        for expected, actual in zip(listed.layouts, streamed_layouts):
+            assert layout_geometry(actual) == layout_geometry(expected) != []
@@ -0,0 +1,76 @@
+import json
+
+import numpy as np
+from nest_bridge import PLACEMENT_DTYPE, decode_json, encode_json
+
+
+def request_object() -> dict:
+    shapes = [
+        np.array([[0, 0], [10, 0], [10, 5], [0, 5]], dtype=float),
+        [[0.5, 0.25], [3.0, 0.0], [1.5, 2.75]],
+        np.array([[0, 0], [2, 0], [2, 2], [1, 3], [0, 2]], dtype=float),
+    ]
+    return {
+        "uuid": "test",
+        "input": {
+            "Name": "Test",
+            "Items": [
+                {"Demand": i + 1, "AllowedOrientations": [0, 90, 180, 270], "Shape": {"Type": "SimplePolygon", "Data": shape}}
+                for i, shape in enumerate(shapes)
+            ],
+            "Objects": [],
+        },
+        "config": {"prng_seed": 0},
+    }
+
+
+def placements() -> np.ndarray:
+    return np.array([
+        (0, 0, 0.0, 1.5, 2.0),
+        (0, 2, 90.0, 20.25, 0.0),
+        (1, 1, 270.0, 3.0, -4.5),
+        (1, 1, 180.0, 1e-9, 1e9),
+    ], dtype=PLACEMENT_DTYPE)
+
+
+def solution_json(records: np.ndarray) -> str:
+    layouts = [[] for _ in range(int(records["layout"].max()) + 1)]
+    for layout, item, rotation, x, y in records.tolist():
+        layouts[layout].append({"Index": item, "Transformation": {"Rotation": rotation, "Translation": [x, y]}})
+    return json.dumps({"Solution": {"Layouts": [{"PlacedItems": placed} for placed in layouts]}})
+
+
+class TestRequestEncoding:
+    """Test cases for the JSON request"""
+
+    def test_json_keeps_request(self):
+        """Test that the JSON request carries every field and vertex"""
+        obj = request_object()
+
+        decoded = json.loads(encode_json(obj))
+
+        assert decoded["config"] == obj["config"]
+        for item, sent in zip(obj["input"]["Items"], decoded["input"]["Items"]):
+            assert sent["Demand"] == item["Demand"]
+            assert sent["Shape"]["Type"] == "SimplePolygon"
+            np.testing.assert_array_equal(sent["Shape"]["Data"], np.asarray(item["Shape"]["Data"], dtype=float))
+
+
+class TestSolutionDecoding:
+    """Test cases for decoding the JSON solution"""
+
+    def test_json_round_trip(self):
+        """Test that the JSON response decodes to its placements, in layout order"""
+        records = placements()
+
+        solution = decode_json(solution_json(records))
+
+        assert solution.layout_count == 2
+        np.testing.assert_array_equal(solution.placements, records)
+        np.testing.assert_array_equal(solution.layout(1), records[2:])
+
+    def test_empty_solution(self):
+        solution = decode_json(json.dumps({"Solution": {"Layouts": []}}))
+
+        assert solution.layout_count == 0
+        assert len(solution.placements) == 0
@@ -0,0 +1,130 @@
+import multiprocessing
+import os
+import time
+
+import numpy as np
+import pytest
+from nest_bridge import PLACEMENT_DTYPE, NestSolution
+from nest_portfolio import run_portfolio, utilization, variants
+
+SHEET_AREA = 100.0
+ITEM_AREAS = np.array([10.0, 20.0])
+
+
+def request_object() -> dict:
+    return {
+        "input": {"Items": [{"Demand": 3}, {"Demand": 2}]},
+        "config": {"prng_seed": 7, "ls_frac": 0.2},
+    }
+
+
+def solution(seed: int, layouts: int, placed: int = 5) -> NestSolution:
+    """`placed` of the five parts over `layouts` sheets, the seed as x of every placement"""
+    placements = np.zeros(placed, dtype=PLACEMENT_DTYPE)
+    placements["item"] = [0, 0, 0, 1, 1][:placed]
+    placements["layout"] = np.arange(placed) % layouts
+    placements["x"] = seed
+    return NestSolution(layouts, placements)
+
+
+def solve_by_seed(request_object: dict) -> NestSolution:
+    """Seed offset 0 needs 3 sheets, 1 places only four parts, 2 needs 2 sheets"""
+    seed = request_object["config"]["prng_seed"]
+    return {7: solution(7, 3), 8: solution(8, 1, placed=4), 9: solution(9, 2)}[seed]
+
+
+def solve_or_fail(request_object: dict) -> NestSolution:
+    seed = request_object["config"]["prng_seed"]
+    if seed == 8:
+        raise ValueError("solver error")
+    return solution(seed, 3 if seed == 7 else 2)
+
+
+def solve_or_crash(request_object: dict) -> NestSolution:
+    seed = request_object["config"]["prng_seed"]
+    if seed == 8:
+        time.sleep(3)
+        os._exit(1)
+    return solution(seed, 2)
+
+
+def solve_or_hang(request_object: dict) -> NestSolution:
+    seed = request_object["config"]["prng_seed"]
+    if seed == 8:
+        time.sleep(600)
+    return solution(seed, 2)
+
+
+def always_fail(request_object: dict) -> NestSolution:
+    raise ValueError("solver error")
+
+
+class TestVariants:
+    """Test cases for the fan-out of a request over seeds and ls_frac values"""
+
+    def test_seeds_and_ls_fracs(self):
+        result = variants(request_object(), 4, [0.1, 0.3])
+
+        assert [v["config"]["prng_seed"] for v in result] == [7, 8, 9, 10]
+        assert [v["config"]["ls_frac"] for v in result] == [0.1, 0.3, 0.1, 0.3]
+        assert all(v["input"] == request_object()["input"] for v in result)
+
+    def test_first_variant_is_request(self):
+        """Test that without ls_frac values the first variant is the request as built"""
+        assert variants(request_object(), 1, []) == [request_object()]
+
+    def test_utilization(self):
+        assert utilization(solution(0, 2), ITEM_AREAS, SHEET_AREA) == pytest.approx(70 / 200)
+        assert utilization(NestSolution(0, np.zeros(0, dtype=PLACEMENT_DTYPE)), ITEM_AREAS, SHEET_AREA) == 0.0
+
+
+class TestRunPortfolio:
+    """Test cases for picking the best solution of a portfolio with stub solvers"""
+
+    def run(self, solve, size=3, **kw):
+        return run_portfolio(request_object(), ITEM_AREAS, SHEET_AREA, size=size, workers=size, ls_fracs=[], target_utilization=1.0, solve=solve, **kw)
+
+    def test_single_run_in_process(self):
+        assert self.run(solve_by_seed, size=1).placements["x"][0] == 7
+
+    def test_most_placed_then_fewest_layouts(self):
+        """Test that a full solution on more sheets beats a partial one on fewer"""
+        best = self.run(solve_by_seed)
+
+        assert best.layout_count == 2
+        assert best.placements["x"][0] == 9
+
+    def test_failed_run_skipped(self):
+        assert self.run(solve_or_fail).placements["x"][0] == 9
+
+    def test_crashed_worker_skipped(self):
+        """Test that a dying worker process breaks the pool without hanging the job"""
+        best = self.run(solve_or_crash)
+
+        assert best.layout_count == 2
+        assert best.placements["x"][0] in (7, 9)
+
+    def test_run_past_time_limit_skipped(self):
+        start = time.monotonic()
+
+        best = self.run(solve_or_hang, timeout=5)
+
+        assert best.placements["x"][0] in (7, 9)
+        assert time.monotonic() - start < 60
+
+    def test_runs_beyond_workers_queued(self):
+        """Test that with one worker the runs go one by one, each with its own time limit, and none is left running"""
+        start = time.monotonic()
+
+        best = run_portfolio(
+            request_object(), ITEM_AREAS, SHEET_AREA, size=3, workers=1, ls_fracs=[], target_utilization=1.0,
+            timeout=3, solve=solve_or_hang
+        )
+
+        assert best.placements["x"][0] == 7
+        assert time.monotonic() - start < 60
+        assert multiprocessing.active_children() == []
+
+    def test_all_runs_failed(self):
+        with pytest.raises(RuntimeError, match="solver error"):
+            self.run(always_fail)
@@ -0,0 +1,80 @@
+import mongomock
+import pytest
+
+from nest_results import NestResultStore, request_hash
+
+FILES = [("sha256:a", 2), ("sha256:b", 1)]
+PARAMS = {"width": 1000, "height": 500, "tolerance": 0.1, "space": 2}
+CONFIG = {"polygonizerVersion": "0.3.0", "outputMode": "entities"}
+
+
+@pytest.fixture
+def store():
+    store = NestResultStore(mongomock.MongoClient().db)
+    store.ensure_indexes()
+    return store
+
+
+class TestRequestHash:
+    """Test cases for the canonical hash of a nest request"""
+
+    def test_file_order_does_not_matter(self):
+        """Test that the same files in another order hash the same"""
+        assert request_hash("u", FILES, PARAMS, CONFIG) == request_hash("u", FILES[::-1], dict(reversed(PARAMS.items())), CONFIG)
+
+    def test_result_inputs_change_the_hash(self):
+        """Test that the owner, the files, their counts, the parameters and the settings are all part of the hash"""
+        key = request_hash("u", FILES, PARAMS, CONFIG)
+
+        assert request_hash("v", FILES, PARAMS, CONFIG) != key
+        assert request_hash("u", [("sha256:a", 3), ("sha256:b", 1)], PARAMS, CONFIG) != key
+        assert request_hash("u", [("sha256:c", 2), ("sha256:b", 1)], PARAMS, CONFIG) != key
+        assert request_hash("u", FILES, {**PARAMS, "space": 3}, CONFIG) != key
+        assert request_hash("u", FILES, PARAMS, {**CONFIG, "outputMode": "blocks"}) != key
+
+
+class TestNestResultStore:
+    """Test cases for claiming, completing and abandoning nest results"""
+
+    def test_claim_then_identical_request(self, store):
+        """Test that the first job claims the result and an identical one gets the claim, then the result"""
+        assert store.claim("key", "a", 3600) is None
+
+        entry = store.claim("key", "b", 3600)
+        assert (entry["status"], entry["jobId"]) == ("processing", "a")
+
+        store.complete("key", "a", {"layoutCount": 2})
+        entry = store.claim("key", "b", 3600)
+        assert (entry["status"], entry["jobId"], entry["layoutCount"]) == ("done", "a", 2)
+
+    def test_only_the_claiming_job_completes_or_abandons(self, store):
+        """Test that a job no longer holding the claim neither completes nor drops it"""
+        store.claim("key", "a", 3600)
+
+        store.complete("key", "b", {"layoutCount": 2})
+        store.abandon("key", "b")
+        assert store.get("key")["status"] == "processing"
+
+        store.abandon("key", "a")
+        assert store.get("key") is None
+        assert store.claim("key", "b", 3600) is None
+
+    def test_stale_claim_taken_over(self, store):
+        """Test that a claim older than the stale limit passes to the next identical job"""
+        store.claim("key", "a", 3600)
+
+        assert store.claim("key", "b", -1) is None
+        assert store.get("key")["jobId"] == "b"
+
+        store.complete("key", "a", {"layoutCount": 1})
+        assert store.get("key")["status"] == "processing"
+
+    def test_done_entry_discarded(self, store):
+        """Test that discard drops a done entry only"""
+        store.claim("key", "a", 3600)
+        store.discard("key")
+        assert store.get("key") is not None
+
+        store.complete("key", "a", {"layoutCount": 1})
+        store.discard("key")
+        assert store.get("key") is None
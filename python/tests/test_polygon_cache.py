@@ -0,0 +1,170 @@
+import datetime
+import hashlib
+import io
+
+import gridfs
+import mongomock
+import pytest
+
+import polygon_cache
+from polygon_cache import GridFSTier, MemoryTier, PolygonCache, cache_key, file_identity
+from polygonizer import __version__ as POLYGONIZER_VERSION
+from polygonizer.dto import ClosedPolygon, Point
+
+
+class Upload(io.BytesIO):
+    """The parts of a GridOut file_identity uses"""
+    def __init__(self, data: bytes, _id, metadata=None):
+        super().__init__(data)
+        self._id = _id
+        self.metadata = metadata
+
+
+class FilesCollection:
+    def __init__(self):
+        self.updates = []
+
+    def update_one(self, query, update):
+        self.updates.append((query, update))
+
+
+class Bucket:
+    """GridFSBucket over a mongomock database, mongomock has no GridFS of its own"""
+    def __init__(self, db, bucket_name):
+        self._files = db[f"{bucket_name}.files"]
+        self._data = {}
+
+    def upload_from_stream(self, filename, data, metadata=None):
+        _id = self._files.insert_one({
+            "filename": filename, "length": len(data), "uploadDate": datetime.datetime.now(), "metadata": metadata
+        }).inserted_id
+        self._data[_id] = data
+
+    def open_download_stream(self, _id):
+        if _id not in self._data:
+            raise gridfs.errors.NoFile(_id)
+        return io.BytesIO(self._data[_id])
+
+    def delete(self, _id):
+        if self._data.pop(_id, None) is None:
+            raise gridfs.errors.NoFile(_id)
+        self._files.delete_one({"_id": _id})
+
+
+@pytest.fixture
+def shared_tier(monkeypatch):
+    monkeypatch.setattr(polygon_cache.gridfs, "GridFSBucket", Bucket)
+    tier = GridFSTier(mongomock.MongoClient().db, limit_bytes=10, pinned_limit_bytes=10)
+    tier.ensure_indexes()
+    return tier
+
+
+class TestFileIdentity:
+    """Test cases for the content hash identifying an upload"""
+
+    def test_same_content_same_identity(self):
+        """Test that two uploads of the same drawing share an identity and other content does not"""
+        data = b"0\nSECTION\n" * 300000
+
+        first = file_identity(Upload(data, 1))
+
+        assert first == f"sha256:{hashlib.sha256(data).hexdigest()}"
+        assert file_identity(Upload(data, 2)) == first
+        assert file_identity(Upload(data + b"\n", 1)) != first
+
+    def test_stream_rewound_and_hash_recorded(self):
+        upload = Upload(b"drawing", "file-id", {"ownerId": "u"})
+        files = FilesCollection()
+
+        identity = file_identity(upload, files)
+
+        assert upload.read() == b"drawing"
+        assert files.updates == [({"_id": "file-id"}, {"$set": {"metadata.sha256": identity.split(":", 1)[1]}})]
+
+    def test_recorded_hash_used(self):
+        """Test that a recorded hash is taken without reading the stream"""
+        upload = Upload(b"drawing", 1, {"sha256": "abc"})
+        files = FilesCollection()
+
+        assert file_identity(upload, files) == "sha256:abc"
+        assert upload.tell() == 0
+        assert files.updates == []
+
+
+class TestPolygonCache:
+    """Test cases for the memory tier of the polygon cache"""
+
+    def test_round_trip_and_counters(self):
+        cache = PolygonCache(MemoryTier(2**20))
+        polygons = [ClosedPolygon(points=[Point(0, 0), Point(1, 0), Point(1, 1), Point(0, 0)], handles=["A"])]
+        key = cache_key("sha256:abc", 0.1, "join")
+
+        assert cache.get(key) is None
+        cache.put(key, polygons, "0\nEOF\n")
+
+        assert cache.get(key) == (polygons, "0\nEOF\n")
+        assert (cache.hits["memory"], cache.misses) == (1, 1)
+        assert cache_key("sha256:abc", 0.2, "join") != key
+
+    def test_memory_tier_bounded_by_size(self):
+        tier = MemoryTier(10)
+        tier.put("a", b"12345")
+        tier.put("b", b"12345")
+        tier.get("a")
+        tier.put("c", b"12345")
+
+        assert tier.get("b") is None
+        assert tier.get("a") == b"12345"
+        assert tier.size == 10
+
+
+class TestGridFSTier:
+    """Test cases for the shared tier of the polygon cache"""
+
+    def test_indexes_created_on_request_only(self, monkeypatch):
+        """Test that constructing the tier does not touch the database, it is done in every job process"""
+        monkeypatch.setattr(polygon_cache.gridfs, "GridFSBucket", Bucket)
+        db = mongomock.MongoClient().db
+        tier = GridFSTier(db)
+
+        assert db.list_collection_names() == []
+
+        tier.ensure_indexes()
+
+        assert "metadata.lastUsedAt_1" in db["polygonCache.files"].index_information()
+
+    def test_pinned_kept_until_first_use(self, shared_tier):
+        """Test that unpinned writes do not evict pinned entries, and a read unpins them"""
+        shared_tier.put("pinned", b"12345", {}, pinned=True)
+        shared_tier.put("a", b"12345", {})
+        shared_tier.put("b", b"12345", {})
+        shared_tier.put("c", b"12345", {})
+
+        assert shared_tier.get("a") is None
+        assert shared_tier.get("pinned") == b"12345"
+
+        shared_tier.put("d", b"12345", {})
+        shared_tier.put("e", b"12345", {})
+
+        assert shared_tier.get("pinned") is None
+
+    def test_pinned_bounded_by_own_limit(self, shared_tier):
+        """Test that pinned entries are trimmed to their own limit, oldest first"""
+        for key in ("a", "b", "c"):
+            shared_tier.put(key, b"12345", {}, pinned=True)
+
+        assert shared_tier.get("a") is None
+        assert shared_tier.get("b") == b"12345"
+        assert shared_tier.get("c") == b"12345"
+
+    def test_prune_deleted_uploads_and_old_versions(self, shared_tier):
+        """Test that prune drops entries of files no longer uploaded and of other polygonizer versions"""
+        shared_tier.limit_bytes = shared_tier.pinned_limit_bytes = 2**20
+        shared_tier.put("live", b"1", {"fileId": "sha256:a", "polygonizerVersion": POLYGONIZER_VERSION}, pinned=True)
+        shared_tier.put("deleted", b"1", {"fileId": "sha256:b", "polygonizerVersion": POLYGONIZER_VERSION}, pinned=True)
+        shared_tier.put("old", b"1", {"fileId": "sha256:a", "polygonizerVersion": "0.0.1"})
+
+        assert shared_tier.prune({"sha256:a"}) == 2
+        assert shared_tier.get("live") == b"1"
+        assert shared_tier.get("deleted") is None
+        assert shared_tier.get("old") is None
@@ -0,0 +1,72 @@
+import io
+from unittest import mock
+
+import ezdxf
+
+import polygone
+from polygon_cache import MemoryTier, PolygonCache
+from polygone import find_closed_polygons_for_files
+
+
+def drawing() -> bytes:
+    doc = ezdxf.new()
+    msp = doc.modelspace()
+    msp.add_lwpolyline([(0, 0), (40, 0), (40, 20), (0, 20)], close=True)
+    msp.add_circle((10, 10), 3)
+    msp.add_lwpolyline([(100, 0), (130, 0), (130, 30)], close=True)
+    stream = io.StringIO()
+    doc.write(stream)
+    return stream.getvalue().encode("utf-8")
+
+
+class Upload(io.BytesIO):
+    def __init__(self, data: bytes, _id):
+        super().__init__(data)
+        self._id = _id
+        self.metadata = {}
+
+
+def summary(groups) -> list:
+    return [sorted((round(p.polygon.area, 6), sorted(e.dxftype() for e in p.entities)) for p in group) for group in groups]
+
+
+class TestFindClosedPolygonsForFiles:
+    """Test cases for polygonizing the files of a job with the polygon cache"""
+
+    def test_cache_hit_matches_fresh_result(self):
+        """Test that a hit gives the same outlines, holes and entities as polygonizing"""
+        data = drawing()
+        cache = PolygonCache(MemoryTier(2**24))
+
+        fresh = find_closed_polygons_for_files([Upload(data, 1)], 0.01, workers=1, cache=cache)
+        cached = find_closed_polygons_for_files([Upload(data, 2)], 0.01, workers=1, cache=cache)
+
+        assert cache.hits["memory"] == 1
+        assert summary(cached) == summary(fresh)
+        assert [len(p.holes) for p in cached[0]] == [len(p.holes) for p in fresh[0]]
+
+    def test_cache_hit_parses_document_on_first_entity_use(self):
+        """Test that the cached document is parsed only once entities are needed, and only once"""
+        data = drawing()
+        cache = PolygonCache(MemoryTier(2**24))
+        find_closed_polygons_for_files([Upload(data, 1)], 0.01, workers=1, cache=cache)
+
+        with mock.patch.object(polygone.ezdxf, "read", wraps=ezdxf.read) as read:
+            (group,) = find_closed_polygons_for_files([Upload(data, 1)], 0.01, workers=1, cache=cache)
+            assert read.call_count == 0
+
+            entities = [entity for polygon in group for entity in polygon.entities]
+            assert read.call_count == 1
+            assert len(entities) == 3
+            assert all(polygon.entities is polygon.entities for polygon in group)
+            assert read.call_count == 1
+
+    def test_pool_matches_inline(self):
+        """Test that files polygonized in the process pool give the inline result"""
+        data = drawing()
+
+        inline = find_closed_polygons_for_files([Upload(data, 1), Upload(data, 2)], 0.01, workers=1)
+        pooled = find_closed_polygons_for_files([Upload(data, 1), Upload(data, 2)], 0.01, workers=2)
+
+        assert summary(pooled) == summary(inline)
+        assert polygone._pools[2]._max_workers == 2
@@ -0,0 +1,74 @@
+import math
+
+import pytest
+import solver_config
+from solver_config import DEFAULT_PLAN, MAX_BUDGET, MAX_SAMPLES, MIN_BUDGET, MIN_SAMPLES, SAMPLES_PER_PART, CostModel, budget_for_balance, plan
+
+
+def items(parts: int, vertices: int = 4, kinds: int = 1) -> list[dict]:
+    square = [[0, 0], [10, 0], [10, 10], [0, 10]]
+    data = (square * math.ceil(vertices / 4))[:vertices]
+    return [{"Demand": parts // kinds + (i < parts % kinds), "Shape": {"Data": data}} for i in range(kinds)]
+
+
+class TestBudgetForBalance:
+    """Test cases for the solver time budget taken from the owner's balance"""
+
+    def test_unknown_balance_gets_maximum(self):
+        assert budget_for_balance(None) == MAX_BUDGET
+
+    def test_minutes_become_seconds_within_limits(self):
+        """Test that the balance is converted to seconds and clamped"""
+        assert budget_for_balance(2) == min(max(120.0, MIN_BUDGET), MAX_BUDGET)
+        assert budget_for_balance(0) == MIN_BUDGET
+        assert budget_for_balance(-5) == MIN_BUDGET
+        assert budget_for_balance(10**6) == MAX_BUDGET
+
+
+class TestPlan:
+    """Test cases for solver parameters planned from job size and budget"""
+
+    model = CostModel(base=0.5, per_sample=1e-5, per_part_sample=0.0, per_vertex_sample=0.0)
+
+    def test_empty_job_gets_default_plan(self):
+        assert plan([], 60, self.model) == DEFAULT_PLAN
+
+    def test_samples_follow_budget(self):
+        """Test that n_samples is what the model predicts fits the budget"""
+        result = plan(items(100), 2.5, self.model)
+
+        assert result["n_samples"] == self.model.samples_within(2.5, 100, 4)
+        assert self.model.predict(result["n_samples"], 100, 4) == pytest.approx(2.5, abs=1e-4)
+
+    def test_samples_bounded_by_job_size_and_limits(self):
+        """Test that a large budget is capped and a tiny one floored"""
+        assert plan(items(3), 10**6, self.model)["n_samples"] == 3 * SAMPLES_PER_PART
+        assert plan(items(1000), 10**6, self.model)["n_samples"] == MAX_SAMPLES
+        assert plan(items(100), 0.1, self.model)["n_samples"] == MIN_SAMPLES
+
+    def test_structure_follows_edges_and_parts(self):
+        """Test that a job of about 100 parts and 1000 edges gets the former fixed values"""
+        result = plan(items(100, vertices=10, kinds=4), 10**6, self.model)
+
+        assert result["quadtree_depth"] == DEFAULT_PLAN["quadtree_depth"]
+        assert result["hpg_n_cells"] == DEFAULT_PLAN["hpg_n_cells"]
+        assert plan(items(1), 10**6, self.model)["quadtree_depth"] == 3
+        assert plan(items(10**5, vertices=100), 10**6, self.model)["hpg_n_cells"] == 10000
+
+    def test_default_model_loaded_once(self, tmp_path, monkeypatch):
+        """Test that plan() without a model reads the model file only once"""
+        path = tmp_path / "model.json"
+        self.model.save(str(path))
+        loads = []
+        load = CostModel.load.__func__
+        monkeypatch.setattr(CostModel, "load", classmethod(lambda cls, p=None: loads.append(p) or load(cls, p)))
+        solver_config.default_model.cache_clear()
+        monkeypatch.setattr(solver_config, "COST_MODEL_PATH", str(path))
+
+        first = plan(items(100), 2.5)
+        second = plan(items(50), 2.5)
+
+        assert len(loads) == 1
+        assert first == plan(items(100), 2.5, self.model)
+        assert second == plan(items(50), 2.5, self.model)
+        solver_config.default_model.cache_clear()
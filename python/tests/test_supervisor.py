@@ -0,0 +1,76 @@
+import os
+import subprocess
+import time
+
+from utils.supervisor import run_supervised
+
+
+def finish():
+    pass
+
+
+def exit_with(code: int):
+    os._exit(code)
+
+
+def allocate(size: int):
+    bytearray(size)
+
+
+def sleep_with_grandchild(pid_file: str):
+    """Start a process of its own and outlive any deadline"""
+    grandchild = subprocess.Popen(["sleep", "60"])
+    with open(pid_file, "w") as file:
+        file.write(str(grandchild.pid))
+    time.sleep(60)
+
+
+def alive(pid: int) -> bool:
+    """Whether `pid` runs, a zombie left to a container's init counts as gone"""
+    try:
+        with open(f"/proc/{pid}/stat") as file:
+            return file.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+class TestRunSupervised:
+    """Test cases for running a job in a supervised child process"""
+
+    def test_finished(self):
+        """Test that a target returning normally gives no reason"""
+        assert run_supervised(finish, (), 30) is None
+
+    def test_non_zero_exit(self):
+        """Test that a non-zero exit code is the reason"""
+        assert run_supervised(exit_with, (3,), 30) == "Job process exited with code 3"
+
+    def test_memory_limit(self):
+        """Test that an allocation over the limit fails the process and the reason names the limit"""
+        reason = run_supervised(allocate, (4 * 2**30,), 30, 2**30)
+
+        assert reason == "Job process exited with code 1, memory limit is 1024 MB"
+
+    def test_timeout_kills_process_group(self, tmp_path):
+        """Test that past the deadline the process and the processes it started are killed"""
+        pid_file = tmp_path / "pid"
+        start = time.time()
+        deadline = start + 20
+        while True:
+            reason = run_supervised(sleep_with_grandchild, (str(pid_file),), 3)
+            # a slow start can leave no time to start the grandchild
+            if pid_file.exists() or time.time() > deadline:
+                break
+
+        assert reason == "Time limit of 3s exceeded"
+        grandchild = int(pid_file.read_text())
+        while alive(grandchild) and time.time() < deadline:
+            time.sleep(0.05)
+        assert not alive(grandchild)
+
+    def test_timeout_while_starting(self):
+        """Test that a process killed before it set up its process group does not hang the caller"""
+        start = time.time()
+
+        assert run_supervised(time.sleep, (60,), 0) == "Time limit of 0s exceeded"
+        assert time.time() - start < 30
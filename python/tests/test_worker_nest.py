@@ -0,0 +1,269 @@
+import datetime
+import io
+import os
+import re
+from types import SimpleNamespace
+
+import gridfs
+import mongomock
+import pytest
+
+# the client connects lazily, the collections are replaced below
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017/nest")
+
+import nest
+import nest_bridge
+import nest_portfolio
+import solver_config
+import worker_nest
+from nest_results import NestResultStore
+
+KEY = "request-key"
+OUTCOME = {"requested": 3, "placed": 3, "layoutCount": 1, "dxf_files": ["a_part_1.dxf"], "svg_files": ["a_part_1.svg"]}
+
+
+class Bucket:
+    """GridFS bucket by file name, in memory"""
+    def __init__(self):
+        self.files = {}
+        self.uploads = []
+
+    def upload_from_stream(self, filename, source, metadata=None):
+        self.uploads.append(filename)
+        self.files[filename] = source if isinstance(source, bytes) else source.read()
+
+    def open_download_stream_by_name(self, filename):
+        if filename not in self.files:
+            raise gridfs.errors.NoFile(filename)
+        return io.BytesIO(self.files[filename])
+
+    def find(self, query):
+        pattern = re.compile(query["filename"]["$regex"])
+        return [SimpleNamespace(_id=filename) for filename in self.files if pattern.match(filename)]
+
+    def delete(self, _id):
+        del self.files[_id]
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = mongomock.MongoClient().db
+    monkeypatch.setattr(worker_nest, "collection", db["nesting_jobs"])
+    monkeypatch.setattr(worker_nest, "users_collection", db["users"])
+    monkeypatch.setattr(worker_nest, "nest_results", NestResultStore(db))
+    monkeypatch.setattr(worker_nest, "nestDxfBucket", Bucket())
+    monkeypatch.setattr(worker_nest, "nestSvgBucket", Bucket())
+    db["users"].insert_one({"id": "u", "balance": 10})
+    return db
+
+
+def add_job(db, slug: str) -> dict:
+    job = {"_id": slug, "slug": slug, "ownerId": "u", "status": "processing", "requestHash": KEY}
+    db["nesting_jobs"].insert_one(job)
+    return job
+
+
+def compute(job: dict):
+    """What doJob leaves behind for `job`, the layouts uploaded and the result stored"""
+    worker_nest.nestDxfBucket.upload_from_stream("a_part_1.dxf", b"dxf")
+    worker_nest.nestSvgBucket.upload_from_stream("a_part_1.svg", b"svg")
+    worker_nest.nest_results.claim(KEY, job["_id"], 3600)
+    worker_nest.nest_results.complete(KEY, job["_id"], OUTCOME)
+
+
+class TestIdenticalJobs:
+    """Test cases for jobs finished with the result of an identical job"""
+
+    def test_coalesced_job_finished_with_copies(self, db):
+        """Test that a job parked on an identical running one gets its own copies of the layouts, free of charge"""
+        first = add_job(db, "a")
+        second = add_job(db, "b")
+        assert worker_nest.nest_results.claim(KEY, "a", 3600) is None
+
+        worker_nest.joinIdenticalJob(second, KEY, worker_nest.nest_results.claim(KEY, "b", 3600))
+        assert db["nesting_jobs"].find_one({"_id": "b"})["coalescedWith"] == "a"
+
+        compute(first)
+        worker_nest.completeWaitingJobs(first, KEY, OUTCOME)
+
+        job = db["nesting_jobs"].find_one({"_id": "b"})
+        assert (job["status"], job["placed"], job["dxf_files"], job["svg_files"]) == ("done", 3, ["b_part_1.dxf"], ["b_part_1.svg"])
+        assert "coalescedWith" not in job
+        assert worker_nest.nestDxfBucket.files["b_part_1.dxf"] == b"dxf"
+        assert worker_nest.nestSvgBucket.files["b_part_1.svg"] == b"svg"
+        user = db["users"].find_one({"id": "u"})
+        assert (user["balance"], user["nestingJobs"]) == (10, 1)
+
+    def test_reused_job_charged_fixed_fee(self, db, monkeypatch):
+        """Test that a job reusing a done result is charged the reuse fee"""
+        monkeypatch.setattr(worker_nest, "REUSED_JOB_FEE", 2)
+        compute(add_job(db, "a"))
+        job = add_job(db, "c")
+
+        worker_nest.joinIdenticalJob(job, KEY, worker_nest.nest_results.get(KEY))
+
+        assert db["nesting_jobs"].find_one({"_id": "c"})["status"] == "done"
+        assert db["users"].find_one({"id": "u"})["balance"] == 8
+
+    def test_deleted_result_computed_anew(self, db):
+        """Test that a job whose identical job's layouts were deleted goes back to the queue"""
+        compute(add_job(db, "a"))
+        worker_nest.nestDxfBucket.files.clear()
+        job = add_job(db, "c")
+
+        worker_nest.joinIdenticalJob(job, KEY, worker_nest.nest_results.get(KEY))
+
+        assert db["nesting_jobs"].find_one({"_id": "c"})["status"] == "pending"
+        assert worker_nest.nest_results.get(KEY) is None
+        assert db["users"].find_one({"id": "u"})["balance"] == 10
+
+    def test_copied_once(self, db):
+        """Test that a job reached from two paths, parking and the identical job finishing, is copied once"""
+        compute(add_job(db, "a"))
+        job = add_job(db, "b")
+
+        worker_nest.completeFromResult(job, OUTCOME)
+        worker_nest.completeFromResult(job, worker_nest.nest_results.get(KEY))
+
+        assert worker_nest.nestDxfBucket.uploads == ["a_part_1.dxf", "b_part_1.dxf"]
+        assert worker_nest.nestSvgBucket.uploads == ["a_part_1.svg", "b_part_1.svg"]
+        assert db["users"].find_one({"id": "u"})["nestingJobs"] == 1
+
+    def test_copy_in_progress_left_alone(self, db):
+        """Test that a job another worker is copying layouts for is not copied again, until that copy is stale"""
+        compute(add_job(db, "a"))
+        job = add_job(db, "b")
+        db["nesting_jobs"].update_one({"_id": "b"}, {"$set": {"copyingAt": datetime.datetime.now()}})
+
+        worker_nest.completeFromResult(job, OUTCOME)
+        worker_nest.requeueOrphanedJobs()
+
+        assert db["nesting_jobs"].find_one({"_id": "b"})["status"] == "processing"
+        assert "b_part_1.dxf" not in worker_nest.nestDxfBucket.files
+
+        db["nesting_jobs"].update_one({"_id": "b"}, {"$set": {"copyingAt": datetime.datetime(2000, 1, 1)}})
+        worker_nest.requeueOrphanedJobs()
+
+        job = db["nesting_jobs"].find_one({"_id": "b"})
+        assert job["status"] == "pending"
+        assert "copyingAt" not in job
+
+    def test_failure_requeues_waiting_jobs(self, db):
+        """Test that when the computing job fails, the jobs parked on it are requeued and the claim dropped"""
+        first = add_job(db, "a")
+        second = add_job(db, "b")
+        worker_nest.nest_results.claim(KEY, "a", 3600)
+        worker_nest.joinIdenticalJob(second, KEY, worker_nest.nest_results.claim(KEY, "b", 3600))
+
+        worker_nest.failJob(first, "boom")
+
+        assert db["nesting_jobs"].find_one({"_id": "a"})["status"] == "error"
+        job = db["nesting_jobs"].find_one({"_id": "b"})
+        assert job["status"] == "pending"
+        assert "coalescedWith" not in job
+        assert worker_nest.nest_results.get(KEY) is None
+
+
+class TestFailedJob:
+    """Test cases for the outputs of a job failing part way"""
+
+    def test_streamed_layouts_removed(self, db):
+        """Test that the sheets a job streamed before failing are dropped from it and deleted"""
+        job = add_job(db, "a")
+        for name in ("a_part_1", "a_part_2"):
+            worker_nest.nestDxfBucket.upload_from_stream(f"{name}.dxf", b"dxf")
+            worker_nest.nestSvgBucket.upload_from_stream(f"{name}.svg", b"svg")
+        worker_nest.nestDxfBucket.upload_from_stream("a_part_1.dxf.bak", b"other")
+        worker_nest.nestDxfBucket.upload_from_stream("ab_part_1.dxf", b"other")
+        db["nesting_jobs"].update_one({"_id": "a"}, {"$set": {"dxf_files": ["a_part_1.dxf"], "svg_files": ["a_part_1.svg"]}})
+
+        worker_nest.failJob(job, "boom")
+
+        failed = db["nesting_jobs"].find_one({"_id": "a"})
+        assert failed["status"] == "error"
+        assert "dxf_files" not in failed and "svg_files" not in failed
+        assert sorted(worker_nest.nestDxfBucket.files) == ["a_part_1.dxf.bak", "ab_part_1.dxf"]
+        assert worker_nest.nestSvgBucket.files == {}
+
+    def test_finished_job_keeps_layouts(self, db):
+        """Test that failing a job that already finished changes nothing"""
+        job = add_job(db, "a")
+        worker_nest.nestDxfBucket.upload_from_stream("a_part_1.dxf", b"dxf")
+        db["nesting_jobs"].update_one({"_id": "a"}, {"$set": {"status": "done", "dxf_files": ["a_part_1.dxf"]}})
+
+        worker_nest.failJob(job, "Time limit of 1s exceeded")
+
+        assert db["nesting_jobs"].find_one({"_id": "a"})["dxf_files"] == ["a_part_1.dxf"]
+        assert "a_part_1.dxf" in worker_nest.nestDxfBucket.files
+
+
+def run_out_of_memory(nesting_job):
+    raise MemoryError()
+
+
+def run_into_blank_error(nesting_job):
+    raise KeyError()
+
+
+class TestRunJob:
+    """Test cases for the error a failed job is left with"""
+
+    def test_out_of_memory_reason(self, db, monkeypatch):
+        """Test that a bare MemoryError fails the job with a reason naming the limit"""
+        monkeypatch.setattr(worker_nest, "doJob", run_out_of_memory)
+        monkeypatch.setattr(worker_nest, "JOB_MEMORY_LIMIT", 512 * 2**20)
+        job = add_job(db, "a")
+
+        worker_nest.runJob(job)
+
+        failed = db["nesting_jobs"].find_one({"_id": "a"})
+        assert (failed["status"], failed["error"]) == ("error", "Out of memory, memory limit is 512 MB per process")
+
+    def test_blank_error_named(self, db, monkeypatch):
+        """Test that an exception without a message fails the job with its type"""
+        monkeypatch.setattr(worker_nest, "doJob", run_into_blank_error)
+        job = add_job(db, "a")
+
+        worker_nest.runJob(job)
+
+        assert db["nesting_jobs"].find_one({"_id": "a"})["error"] == "KeyError"
+
+
+class TestRequestKey:
+    """Test cases for the settings a memoized result is keyed by"""
+
+    JOB = {"ownerId": "u", "files": [{"slug": "f", "count": 2}], "params": {"width": 100, "height": 100, "tolerance": 0.1}}
+
+    @pytest.mark.parametrize("module, name, value", [
+        (nest_portfolio, "PORTFOLIO_TARGET_UTILIZATION", 0.8),
+        (nest_portfolio, "PORTFOLIO_RUN_TIMEOUT", 30.0),
+        (nest, "ALLOWED_ORIENTATIONS", [0, 180]),
+        (solver_config, "PLANNER", True),
+    ])
+    def test_result_settings_change_the_key(self, monkeypatch, module, name, value):
+        """Test that each setting affecting the layouts is part of the key"""
+        key = worker_nest.requestKey(self.JOB, ["sha256:a"])
+
+        monkeypatch.setattr(module, name, value)
+
+        assert worker_nest.requestKey(self.JOB, ["sha256:a"], 60.0) != key
+
+    def test_solver_build_changes_the_key(self, monkeypatch):
+        """Test that results of another nest_rust build are not reused"""
+        monkeypatch.setattr(nest_bridge, "solver_version", lambda: "0.1.0")
+        key = worker_nest.requestKey(self.JOB, ["sha256:a"])
+
+        monkeypatch.setattr(nest_bridge, "solver_version", lambda: "0.2.0")
+
+        assert worker_nest.requestKey(self.JOB, ["sha256:a"]) != key
+
+    def test_planner_budget_and_model_change_the_key(self, monkeypatch):
+        """Test that with the planner on, the budget and the cost model are part of the key"""
+        monkeypatch.setattr(solver_config, "PLANNER", True)
+        key = worker_nest.requestKey(self.JOB, ["sha256:a"], 60.0)
+
+        assert worker_nest.requestKey(self.JOB, ["sha256:a"], 120.0) != key
+
+        monkeypatch.setattr(solver_config, "default_model", lambda: solver_config.CostModel(base=2.0))
+
+        assert worker_nest.requestKey(self.JOB, ["sha256:a"], 60.0) != key
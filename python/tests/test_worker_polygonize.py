@@ -0,0 +1,68 @@
+import datetime
+import os
+
+import mongomock
+import pytest
+
+# the client connects lazily, the collections are replaced below
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017/nest")
+
+import worker_polygonize
+
+SINCE = datetime.datetime(2026, 1, 1)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = mongomock.MongoClient().db
+    monkeypatch.setattr(worker_polygonize, "files_collection", db["validDxf.files"])
+    monkeypatch.setattr(worker_polygonize, "jobs_collection", db["nesting_jobs"])
+    return db
+
+
+def add_upload(db, _id: str, precompute: dict = None, uploaded: datetime.datetime = datetime.datetime(2026, 2, 1)):
+    metadata = {"ownerId": "u"}
+    if precompute is not None:
+        metadata["precompute"] = precompute
+    db["validDxf.files"].insert_one({"_id": _id, "filename": f"{_id}.dxf", "uploadDate": uploaded, "metadata": metadata})
+
+
+class TestClaimFile:
+    """Test cases for claiming uploads to precompute"""
+
+    def test_newest_unclaimed_since_deploy(self, db):
+        """Test that the newest upload without a claim is taken, uploads before the backfill window are not"""
+        add_upload(db, "old", uploaded=datetime.datetime(2025, 12, 1))
+        add_upload(db, "a", uploaded=datetime.datetime(2026, 2, 1))
+        add_upload(db, "b", uploaded=datetime.datetime(2026, 3, 1))
+
+        assert worker_polygonize.claimFile(SINCE)["_id"] == "b"
+        assert worker_polygonize.claimFile(SINCE)["_id"] == "a"
+        assert worker_polygonize.claimFile(SINCE) is None
+
+    def test_stale_claim_taken_over(self, db):
+        """Test that a claim left by a worker that died is taken over once stale, a running one is not"""
+        add_upload(db, "running", {"status": "processing", "startedAt": datetime.datetime.now()})
+        add_upload(db, "orphaned", {"status": "processing", "startedAt": datetime.datetime(2026, 2, 1)})
+        add_upload(db, "failed", {"status": "error", "startedAt": datetime.datetime(2026, 2, 1)})
+
+        claimed = worker_polygonize.claimFile(SINCE)
+
+        assert claimed["_id"] == "orphaned"
+        assert claimed["metadata"]["precompute"]["startedAt"] > datetime.datetime(2026, 2, 1)
+        assert worker_polygonize.claimFile(SINCE) is None
+
+
+class TestDoFile:
+    """Test cases for precomputing an upload"""
+
+    def test_nothing_to_precompute_skipped(self, db, monkeypatch):
+        """Test that an upload without configured or recent tolerances is recorded as skipped, not done"""
+        monkeypatch.setattr(worker_polygonize, "PRECOMPUTE_TOLERANCES", [])
+        add_upload(db, "a")
+
+        worker_polygonize.doFile(worker_polygonize.claimFile(SINCE))
+
+        precompute = db["validDxf.files"].find_one({"_id": "a"})["metadata"]["precompute"]
+        assert precompute["status"] == "skipped"
+        assert "tolerances" not in precompute
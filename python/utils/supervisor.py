@@ -0,0 +1,44 @@
+import multiprocessing
+import os
+import resource
+import signal
+from typing import Optional
+
+
+def _run_limited(target, args, memory_bytes: int):
+    # own process group, so a kill also takes down pools the target started
+    os.setpgrp()
+    if memory_bytes:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+    target(*args)
+
+
+def run_supervised(target, args: tuple, timeout: float, memory_bytes: int = 0, name: Optional[str] = None) -> Optional[str]:
+    """
+    Run `target(*args)` in a fresh spawned process with a wall-clock deadline
+    and an address-space limit (0 for none). The limit is per process:
+    processes the target starts inherit it, each their own. Returns None
+    when it finished normally, else why it did not; past the deadline the
+    whole process group is killed.
+    """
+    process = multiprocessing.get_context("spawn").Process(
+        target=_run_limited, args=(target, args, memory_bytes), name=name
+    )
+    process.start()
+    process.join(timeout)
+
+    reason = None
+    if process.is_alive():
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            # still starting up, it has no process group of its own yet
+            process.kill()
+        process.join()
+        reason = f"Time limit of {timeout:g}s exceeded"
+    elif process.exitcode != 0:
+        reason = f"Job process exited with code {process.exitcode}"
+        if memory_bytes:
+            reason += f", memory limit is {memory_bytes // 2**20} MB"
+    process.close()
+    return reason
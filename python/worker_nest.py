@@ -1,47 +1,62 @@
 import time
 import datetime
 import io
-import ezdxf
-from typing import List
+import os
+import re
+from dataclasses import asdict
+from typing import List, Optional
+import gridfs
 from pymongo import ReturnDocument
 from mongo import db, userDxfBucket, nestDxfBucket, nestSvgBucket
-from nest import NestPolygone, NestRequest, NestResult, nest, NestResultLayout
+from nest import NestPolygone, NestRequest, NestResult, nest, NestResultLayout, buildLayoutDoc
 from svg_generator import create_svg_from_doc
 from polygone import DxfPolygon 
 import traceback
-from polygone import find_closed_polygons
+from polygone import find_closed_polygons_for_files, DEFAULT_ENGINE
+import polygone
+from polygon_cache import PolygonCache, MemoryTier, GridFSTier, file_identity
+from polygonizer import __version__ as POLYGONIZER_VERSION
+from nest_results import NestResultStore, request_hash
+import nest as nest_module
+import nest_bridge
+import nest_portfolio
 from utils.logger import setup_json_logger
+from utils.supervisor import run_supervised
+import solver_config
 
 collection = db["nesting_jobs"]
 users_collection = db["users"]
+files_collection = db["validDxf.files"]
 logger = setup_json_logger("worker_nest")
 
-def buildLayout(nest_layout: NestResultLayout, dxf_file_name: str, svg_file_name: str, ownerId: str):
-    doc = ezdxf.new(dxfversion='R2010', units=4)
-    msp = doc.modelspace()
-    
-    # Get all unique colors from entities
-    colors = set()
-    for entity in nest_layout.dxf_entities:
-        if hasattr(entity, 'dxf') and hasattr(entity.dxf, 'color'):
-            colors.add(entity.dxf.color)
-    
-    # Create layers for each color and add them to the document
-    for color in colors:
-        layer_name = f"Color_{color}"
-        if layer_name not in doc.layers:
-            layer = doc.layers.add(name=layer_name)
-            layer.color = color
-    
-    # Attach entities to their corresponding color layers
-    for entity in nest_layout.dxf_entities:
-        if hasattr(entity, 'dxf') and hasattr(entity.dxf, 'color'):
-            color = entity.dxf.color
-            layer_name = f"Color_{color}"
-            entity.dxf.layer = layer_name
+# "inline" runs jobs in the worker process, "process" runs each job in a
+# fresh child process with the deadline and address-space limit below.
+# The child re-imports this module, so nothing at module level touches the
+# database; indexes are created by main().
+JOB_ISOLATION = os.environ.get("NEST_JOB_ISOLATION", "inline")
+JOB_TIMEOUT = float(os.environ.get("NEST_JOB_TIMEOUT_S", 3600))
+# Per process, 0 for no limit. Processes the job starts, the solver
+# portfolio runs, inherit the same limit each, so it does not bound the job.
+JOB_MEMORY_LIMIT = int(os.environ.get("NEST_JOB_MEMORY_MB", 0)) * 2**20
 
-    for entity in nest_layout.dxf_entities:
-        msp.add_entity(entity)
+# A child process starts cold and lives for one job, so only the shared tier
+# pays off there, and it polygonizes inline: a pool would spawn and import
+# its workers again for every job.
+polygon_cache = PolygonCache(memory=MemoryTier(0) if JOB_ISOLATION == "process" else None, shared=GridFSTier(db))
+PARSE_WORKERS = 1 if JOB_ISOLATION == "process" else polygone.PARSE_WORKERS
+
+# Reuse the result of an identical earlier job, wait for an identical running one
+MEMOIZE = os.environ.get("NEST_MEMOIZE", "on") != "off"
+nest_results = NestResultStore(db)
+# Publish every layout as soon as it is built instead of all at the end
+STREAM_LAYOUTS = os.environ.get("NEST_STREAM_LAYOUTS", "on") == "on"
+# Balance charged for a job finished with the result of an identical one
+REUSED_JOB_FEE = int(os.environ.get("NEST_REUSED_JOB_FEE", 0))
+# Job fields making up a result, copied to identical jobs
+RESULT_FIELDS = ("requested", "placed", "layoutCount")
+
+def buildLayout(nest_layout: NestResultLayout, dxf_file_name: str, svg_file_name: str, ownerId: str):
+    doc = buildLayoutDoc(nest_layout)
 
     text_stream = io.StringIO()
     doc.write(text_stream)
@@ -60,6 +75,12 @@ def buildLayout(nest_layout: NestResultLayout, dxf_file_name: str, svg_file_name
         metadata={"ownerId": ownerId}
     )
 
+def solverBudget(nesting_job):
+    if not solver_config.PLANNER:
+        return None
+    user = users_collection.find_one({"id": nesting_job.get("ownerId")}, {"balance": 1})
+    return solver_config.budget_for_balance(user.get("balance") if user else None)
+
 def doJob(nesting_job):
     slug = nesting_job.get("slug")
     files = nesting_job.get("files")
@@ -69,6 +90,7 @@ def doJob(nesting_job):
     tolerance = params.get("tolerance")
     space = params.get("space")
     sheet_count = params.get("sheetCount")
+    engine = params.get("polygonizer") or DEFAULT_ENGINE
 
     start_at = datetime.datetime.now()
     collection.update_one(
@@ -76,25 +98,39 @@ def doJob(nesting_job):
         {"$set": {"startAt": start_at}}
     )
 
+    grid_outs = [userDxfBucket.open_download_stream_by_name(file.get("slug")) for file in files]
+
+    # content hashes, recorded on the uploads the first time they are read
+    file_ids = [file_identity(grid_out, files_collection) for grid_out in grid_outs]
+
+    budget = solverBudget(nesting_job)
+    request_key = None
+    if MEMOIZE:
+        request_key = requestKey(nesting_job, file_ids, budget)
+        collection.update_one({"_id": nesting_job["_id"]}, {"$set": {"requestHash": request_key}})
+        identical = nest_results.claim(request_key, nesting_job["_id"], JOB_TIMEOUT)
+        if identical is not None:
+            joinIdenticalJob(nesting_job, request_key, identical)
+            return
+
+    file_polygones: List[List[DxfPolygon]] = find_closed_polygons_for_files(
+        grid_outs, tolerance, engine, workers=PARSE_WORKERS, cache=polygon_cache, file_ids=file_ids
+    )
+
     nest_polygones = []
-    for file in files:
-        fileSlug: str = file.get("slug")
+    for file, dxf_polygones in zip(files, file_polygones):
         fileCount: int = file.get("count")
 
-        grid_out = userDxfBucket.open_download_stream_by_name(fileSlug)
-        dxf_polygones: List[DxfPolygon]
-        dxf_polygones = find_closed_polygons(grid_out, tolerance)
-
         for group in dxf_polygones:
             nest_polygones.append(NestPolygone(group, fileCount))
 
     result: NestResult = nest(NestRequest(
-        nest_polygones, width, height, space, tolerance, sheet_count
-    ))
+        nest_polygones, width, height, space, tolerance, sheet_count, budget
+    ), stream_layouts=STREAM_LAYOUTS)
    
     collection.update_one(
         {"_id": nesting_job["_id"]},
-        {"$set": { "requested": result.requestCount, "placed": result.placedCount }}
+        {"$set": { "requested": result.requestCount, "placed": result.placedCount, "layoutCount": result.layoutCount }}
     )
     
     if (result.placedCount == 0 or result.requestCount == 0):
@@ -111,12 +147,52 @@ def doJob(nesting_job):
         buildLayout(layout, dxf_file_name, svg_file_name, nesting_job.get("ownerId"))
         dxf_files.append(dxf_file_name)
         svg_files.append(svg_file_name)
+        publishLayout(nesting_job, index, dxf_file_name, svg_file_name, start_at)
         
     collection.update_one(
         {"_id": nesting_job["_id"]},
-        {"$set": {"dxf_files": dxf_files, "svg_files": svg_files, "layoutCount": len(result.layouts), "status": "done" }}
+        {"$set": {"dxf_files": dxf_files, "svg_files": svg_files, "layoutCount": result.layoutCount, "status": "done" }}
     )
+    minutes_taken = finishJob(nesting_job, start_at)
+    billJob(nesting_job, minutes_taken, minutes_taken + 1)
+
+    if request_key is not None:
+        outcome = {
+            "requested": result.requestCount,
+            "placed": result.placedCount,
+            "dxf_files": dxf_files,
+            "svg_files": svg_files,
+            "layoutCount": result.layoutCount
+        }
+        nest_results.complete(request_key, nesting_job["_id"], outcome)
+        completeWaitingJobs(nesting_job, request_key, outcome)
 
+
+def completeWaitingJobs(nesting_job, request_key: str, outcome: dict):
+    """Finish the identical jobs parked until this one finished."""
+    for waiting_job in collection.find({"requestHash": request_key, "coalescedWith": nesting_job["_id"], "status": "processing"}):
+        completeFromResult(waiting_job, outcome)
+
+
+def publishLayout(nesting_job, index: int, dxf_file_name: str, svg_file_name: str, start_at):
+    """Record the first uploaded sheet's latency; when streaming, add each sheet to the job right away."""
+    update = {}
+    if index == 0:
+        time_to_first_sheet = (datetime.datetime.now() - start_at).total_seconds()
+        logger.info("First sheet published", extra={"slug": nesting_job.get("slug"), "timeToFirstSheet": time_to_first_sheet})
+        update["$set"] = {"timeToFirstSheet": time_to_first_sheet}
+    if STREAM_LAYOUTS:
+        if index == 0:
+            # drop files left from an earlier attempt of the job
+            update["$set"].update({"dxf_files": [dxf_file_name], "svg_files": [svg_file_name]})
+        else:
+            update["$push"] = {"dxf_files": dxf_file_name, "svg_files": svg_file_name}
+    if update:
+        collection.update_one({"_id": nesting_job["_id"]}, update)
+
+
+def finishJob(nesting_job, start_at) -> int:
+    """Record when the job finished and how long it took, in minutes, which are returned."""
     finishAt = datetime.datetime.now()
     time_taken = finishAt - start_at
 
@@ -131,6 +207,11 @@ def doJob(nesting_job):
             }
         }
     )
+    return minutes_taken
+
+
+def billJob(nesting_job, minutes_taken: int, fee: int):
+    """Count the job on its owner and take `fee` off their balance."""
     user_id = nesting_job.get("ownerId")
     users_collection.update_one(
         {"id": user_id},
@@ -138,34 +219,223 @@ def doJob(nesting_job):
             "$inc": {
                 "nestingJobs": 1,
                 "nestingTimeInMinute": minutes_taken,
-                "balance": -(minutes_taken + 1)
+                "balance": -fee
             }
         }
     )
 
 
-# Run the worker
-logger.info("Worker nestincg started", extra={"event": "start", "time": str(datetime.datetime.now())})
+def requestKey(nesting_job, file_ids: list[str], budget: Optional[float] = None) -> str:
+    """Hash of the job's request and of every setting of this worker its result depends on."""
+    files = [(file_id, file.get("count")) for file, file_id in zip(nesting_job.get("files"), file_ids)]
+    params = dict(nesting_job.get("params"))
+    params["polygonizer"] = params.get("polygonizer") or DEFAULT_ENGINE
+    config = {
+        "solverVersion": nest_bridge.solver_version(),
+        "polygonizerVersion": POLYGONIZER_VERSION,
+        "outputMode": nest_module.OUTPUT_MODE,
+        "offset": [nest_module.OFFSET_JOIN_STYLE, nest_module.OFFSET_MITRE_LIMIT, nest_module.OFFSET_QUAD_SEGS],
+        "orientations": nest_module.ALLOWED_ORIENTATIONS,
+        "portfolio": [
+            nest_portfolio.PORTFOLIO_SIZE,
+            nest_portfolio.PORTFOLIO_LS_FRACS,
+            nest_portfolio.PORTFOLIO_TARGET_UTILIZATION,
+            nest_portfolio.PORTFOLIO_RUN_TIMEOUT
+        ],
+        "planner": solver_config.PLANNER,
+        "solver": solver_config.DEFAULT_PLAN
+    }
+    if solver_config.PLANNER:
+        # the plan follows the budget, within its bounds, and the cost model
+        config["solver"] = {"budget": budget, "costModel": asdict(solver_config.default_model())}
+    return request_hash(nesting_job.get("ownerId"), files, params, config)
 
 
-while True:
-    logger.info("Worker nesting try to find a pending job")
+def copyLayoutFiles(nesting_job, outcome: dict) -> tuple[list[str], list[str]]:
+    """
+    Copy the layouts of an identical job under this job's slug, so deleting
+    the outputs of either job leaves the other's intact.
+    """
+    slug = nesting_job.get("slug")
+    dxf_files = []
+    svg_files = []
+    for index, (dxf_file_name, svg_file_name) in enumerate(zip(outcome["dxf_files"], outcome["svg_files"])):
+        for bucket, source, target, names in (
+            (nestDxfBucket, dxf_file_name, f"{slug}_part_{index + 1}.dxf", dxf_files),
+            (nestSvgBucket, svg_file_name, f"{slug}_part_{index + 1}.svg", svg_files)
+        ):
+            bucket.upload_from_stream(
+                filename=target,
+                source=bucket.open_download_stream_by_name(source),
+                metadata={"ownerId": nesting_job.get("ownerId")}
+            )
+            names.append(target)
+    return dxf_files, svg_files
+
 
-    nesting_job = collection.find_one_and_update(
-        {"status": "pending"},
-        {"$set": {"status": "processing"}},
-        return_document=ReturnDocument.AFTER
+def completeFromResult(nesting_job, outcome: dict):
+    """
+    Finish a job with copies of the layouts of an identical one, unless it
+    finished already or another worker is finishing it. When the identical
+    job's outputs are gone the result is dropped and the job computed anew.
+    """
+    # claimed before copying, the job can be reached from several paths at once
+    claimed = collection.find_one_and_update(
+        {"_id": nesting_job["_id"], "status": "processing", "copyingAt": {"$exists": False}},
+        {"$set": {"copyingAt": datetime.datetime.now()}}
     )
+    if claimed is None:
+        return
 
-    if nesting_job is None:
-        time.sleep(5)
-        continue
     try:
-        logger.info("Worker nesting job found", extra={"slug": nesting_job.get("slug"), "time": str(datetime.datetime.now())})
+        dxf_files, svg_files = copyLayoutFiles(nesting_job, outcome)
+    except gridfs.errors.NoFile:
+        logger.info("Result of identical job deleted, nesting job requeued", extra={"slug": nesting_job.get("slug")})
+        nest_results.discard(nesting_job["requestHash"])
+        requeueJobs({"_id": nesting_job["_id"]})
+        return
+
+    collection.update_one(
+        {"_id": nesting_job["_id"]},
+        {
+            "$set": {
+                **{field: outcome[field] for field in RESULT_FIELDS},
+                "dxf_files": dxf_files,
+                "svg_files": svg_files,
+                "status": "done"
+            },
+            "$unset": {"coalescedWith": "", "copyingAt": ""}
+        }
+    )
+    finishJob(nesting_job, nesting_job.get("startAt") or datetime.datetime.now())
+    # nothing was computed for it
+    billJob(nesting_job, 0, REUSED_JOB_FEE)
+
+
+def joinIdenticalJob(nesting_job, request_key: str, identical: dict):
+    """
+    Reuse the result of an identical job, or park this job until the
+    identical running one finishes; the worker moves on meanwhile.
+    """
+    if identical.get("status") != "done":
+        collection.update_one({"_id": nesting_job["_id"]}, {"$set": {"coalescedWith": identical["jobId"]}})
+        # the identical job may have finished before this one was parked
+        identical = nest_results.get(request_key)
+        if identical is None:
+            requeueJobs({"_id": nesting_job["_id"]})
+            return
+        if identical.get("status") != "done":
+            logger.info("Nesting job waits for identical job", extra={"slug": nesting_job.get("slug"), "jobId": str(identical["jobId"])})
+            return
+
+    logger.info("Nesting job reuses identical job", extra={"slug": nesting_job.get("slug"), "jobId": str(identical["jobId"])})
+    completeFromResult({**nesting_job, "requestHash": request_key, "startAt": datetime.datetime.now()}, identical)
+
+
+def requeueJobs(query: dict):
+    collection.update_many(
+        {**query, "status": "processing"},
+        {"$set": {"status": "pending"}, "$unset": {"coalescedWith": "", "copyingAt": ""}}
+    )
+
+
+def requeueOrphanedJobs():
+    """
+    Requeue parked jobs whose identical job died without finishing or
+    failing, and jobs whose worker died copying an identical job's layouts.
+    """
+    stale_before = datetime.datetime.now() - datetime.timedelta(seconds=JOB_TIMEOUT)
+    requeueJobs({"copyingAt": {"$lt": stale_before}})
+    for waiting_job in collection.find(
+        {"coalescedWith": {"$exists": True}, "copyingAt": {"$exists": False}, "status": "processing"},
+        {"requestHash": 1, "coalescedWith": 1}
+    ):
+        entry = nest_results.get(waiting_job["requestHash"])
+        if entry is None or entry["jobId"] != waiting_job["coalescedWith"] or (entry["status"] == "processing" and entry["startedAt"] < stale_before):
+            requeueJobs({"_id": waiting_job["_id"]})
+        elif entry["status"] == "done":
+            completeFromResult(collection.find_one({"_id": waiting_job["_id"]}), entry)
+
+
+def deleteLayoutFiles(slug: str):
+    """Delete the layouts uploaded for a job, including ones not yet added to it."""
+    for bucket, extension in ((nestDxfBucket, "dxf"), (nestSvgBucket, "svg")):
+        for grid_out in bucket.find({"filename": {"$regex": rf"^{re.escape(slug)}_part_\d+\.{extension}$"}}):
+            bucket.delete(grid_out._id)
+
+
+def failJob(nesting_job, error: str):
+    # a job that already finished keeps its status and files
+    failed = collection.find_one_and_update(
+        {"_id": nesting_job["_id"], "status": "processing"},
+        {"$set": {"status": "error", "error": error}, "$unset": {"dxf_files": "", "svg_files": ""}}
+    )
+    if failed is not None:
+        # sheets streamed before the failure
+        try:
+            deleteLayoutFiles(nesting_job.get("slug"))
+        except Exception as e:
+            logger.error("Error deleting layouts of failed job", extra={"slug": nesting_job.get("slug"), "error": str(e)})
+    # identical jobs waiting on this one compute it themselves
+    request_key = (collection.find_one({"_id": nesting_job["_id"]}, {"requestHash": 1}) or {}).get("requestHash")
+    if request_key is not None:
+        nest_results.abandon(request_key, nesting_job["_id"])
+        requeueJobs({"requestHash": request_key, "coalescedWith": nesting_job["_id"]})
+
+
+def runJob(nesting_job):
+    try:
         doJob(nesting_job)
+    except MemoryError:
+        # raised bare when the address-space limit is hit
+        error = "Out of memory"
+        if JOB_MEMORY_LIMIT:
+            error += f", memory limit is {JOB_MEMORY_LIMIT // 2**20} MB per process"
+        logger.error("Error in nesting job", extra={"error": error, "traceback": traceback.format_exc()})
+        failJob(nesting_job, error)
     except Exception as e:
-        logger.error("Error in nesting job", extra={"error": str(e), "traceback": traceback.format_exc()})
-        collection.update_one(
-            {"_id": nesting_job["_id"]},
-            {"$set": {"status": "error", "error": str(e)}}
+        error = str(e) or type(e).__name__
+        logger.error("Error in nesting job", extra={"error": error, "traceback": traceback.format_exc()})
+        failJob(nesting_job, error)
+
+
+def runJobSupervised(nesting_job):
+    """runJob in a child process, which is killed and the job failed when it runs out of time or memory."""
+    reason = run_supervised(
+        runJob, (nesting_job,), JOB_TIMEOUT, JOB_MEMORY_LIMIT, name=f"nest-{nesting_job.get('slug')}"
+    )
+    if reason is not None:
+        logger.error("Nesting job process failed", extra={"slug": nesting_job.get("slug"), "error": reason})
+        failJob(nesting_job, reason)
+
+
+def main():
+    logger.info("Worker nestincg started", extra={"event": "start", "time": str(datetime.datetime.now())})
+    polygon_cache.shared.ensure_indexes()
+    if MEMOIZE:
+        nest_results.ensure_indexes()
+
+    while True:
+        logger.info("Worker nesting try to find a pending job")
+
+        nesting_job = collection.find_one_and_update(
+            {"status": "pending"},
+            {"$set": {"status": "processing"}},
+            return_document=ReturnDocument.AFTER
         )
+
+        if nesting_job is None:
+            if MEMOIZE:
+                requeueOrphanedJobs()
+            time.sleep(5)
+            continue
+        logger.info("Worker nesting job found", extra={"slug": nesting_job.get("slug"), "time": str(datetime.datetime.now())})
+        if JOB_ISOLATION == "process":
+            runJobSupervised(nesting_job)
+        else:
+            runJob(nesting_job)
+
+
+# Run the worker
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import time
+import datetime
+import os
+import traceback
+from pymongo import ReturnDocument
+from mongo import db, userDxfBucket
+from polygone import polygonize_dxf, DEFAULT_ENGINE
+from polygon_cache import PolygonCache, MemoryTier, GridFSTier, cache_key, file_identity
+from utils.logger import setup_json_logger
+
+files_collection = db["validDxf.files"]
+jobs_collection = db["nesting_jobs"]
+logger = setup_json_logger("worker_polygonize")
+
+# Tolerances always precomputed, comma separated, e.g. "0.1,0.5"
+PRECOMPUTE_TOLERANCES = [float(t) for t in os.environ.get("NEST_PRECOMPUTE_TOLERANCES", "").split(",") if t.strip()]
+# Recent jobs of the uploader whose tolerances are precomputed as well
+RECENT_JOBS = int(os.environ.get("NEST_PRECOMPUTE_RECENT_JOBS", 20))
+# Uploads older than this when the worker starts are not precomputed
+BACKFILL_HOURS = float(os.environ.get("NEST_PRECOMPUTE_BACKFILL_HOURS", 24))
+# Seconds after which a claim of a worker that died or was replaced is taken over
+CLAIM_STALE = float(os.environ.get("NEST_PRECOMPUTE_STALE_S", 3600))
+# Seconds between passes dropping cache entries of deleted uploads and older polygonizers
+PRUNE_INTERVAL = float(os.environ.get("NEST_POLYGON_CACHE_PRUNE_INTERVAL_S", 3600))
+
+# Results go straight to the shared tier, this process never reads them back
+polygon_cache = PolygonCache(memory=MemoryTier(0), shared=GridFSTier(db))
+
+def tolerancesFor(file_doc) -> list[float]:
+    tolerances = set(PRECOMPUTE_TOLERANCES)
+    owner_id = (file_doc.get("metadata") or {}).get("ownerId")
+    if owner_id is not None and RECENT_JOBS > 0:
+        recent_jobs = jobs_collection.find(
+            {"ownerId": owner_id, "params.tolerance": {"$exists": True}},
+            {"params.tolerance": 1}
+        ).sort("_id", -1).limit(RECENT_JOBS)
+        tolerances.update(float(job["params"]["tolerance"]) for job in recent_jobs)
+    return sorted(tolerances)
+
+def claimFile(since: datetime.datetime):
+    """
+    Claim the newest upload since `since` not yet precomputed, or whose
+    claim went stale. Returns None when there is none.
+    """
+    now = datetime.datetime.now()
+    # newest uploads first, they are the ones about to be nested
+    return files_collection.find_one_and_update(
+        {
+            "uploadDate": {"$gte": since},
+            "$or": [
+                {"metadata.precompute": {"$exists": False}},
+                {
+                    "metadata.precompute.status": "processing",
+                    "metadata.precompute.startedAt": {"$lt": now - datetime.timedelta(seconds=CLAIM_STALE)}
+                }
+            ]
+        },
+        {"$set": {"metadata.precompute": {"status": "processing", "startedAt": now}}},
+        sort=[("uploadDate", -1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+def doFile(file_doc):
+    tolerances = tolerancesFor(file_doc)
+    if not tolerances:
+        # nothing configured and no jobs of the uploader to go by
+        files_collection.update_one(
+            {"_id": file_doc["_id"]},
+            {"$set": {"metadata.precompute.status": "skipped", "metadata.precompute.finishedAt": datetime.datetime.now()}}
+        )
+        return
+
+    stream = userDxfBucket.open_download_stream(file_doc["_id"])
+    # recorded on the upload, nesting jobs take it from there
+    file_id = file_identity(stream, files_collection)
+    dxf_data = stream.read()
+
+    for tolerance in tolerances:
+        start_time = time.time()
+        polygonized = polygonize_dxf(dxf_data, tolerance, DEFAULT_ENGINE)
+        polygon_cache.put(
+            cache_key(file_id, tolerance, DEFAULT_ENGINE), polygonized.polygons, polygonized.dxf_text,
+            pinned=True, fileId=file_id, tolerance=tolerance, engine=DEFAULT_ENGINE
+        )
+        logger.info("File precomputed", extra={
+            "filename": file_doc.get("filename"),
+            "tolerance": tolerance,
+            "polygons": len(polygonized.polygons),
+            "time": time.time() - start_time
+        })
+
+    files_collection.update_one(
+        {"_id": file_doc["_id"]},
+        {"$set": {
+            "metadata.precompute.status": "done",
+            "metadata.precompute.tolerances": tolerances,
+            "metadata.precompute.engine": DEFAULT_ENGINE,
+            "metadata.precompute.finishedAt": datetime.datetime.now()
+        }}
+    )
+
+
+def pruneCache():
+    start_time = time.time()
+    live_file_ids = {f"sha256:{digest}" for digest in files_collection.distinct("metadata.sha256")}
+    deleted = polygon_cache.shared.prune(live_file_ids)
+    logger.info("Polygon cache pruned", extra={"deleted": deleted, "time": time.time() - start_time})
+
+
+def main():
+    logger.info("Worker polygonize started", extra={"event": "start", "time": str(datetime.datetime.now())})
+    files_collection.create_index([("metadata.precompute", 1), ("uploadDate", -1)])
+    files_collection.create_index([("metadata.precompute.status", 1), ("metadata.precompute.startedAt", 1)])
+    polygon_cache.shared.ensure_indexes()
+    since = datetime.datetime.now() - datetime.timedelta(hours=BACKFILL_HOURS)
+    next_prune = time.time()
+
+    while True:
+        if time.time() >= next_prune:
+            try:
+                pruneCache()
+            except Exception as e:
+                logger.error("Error pruning polygon cache", extra={"error": str(e), "traceback": traceback.format_exc()})
+            next_prune = time.time() + PRUNE_INTERVAL
+
+        file_doc = claimFile(since)
+
+        if file_doc is None:
+            time.sleep(5)
+            continue
+        try:
+            logger.info("Worker polygonize file found", extra={"filename": file_doc.get("filename"), "time": str(datetime.datetime.now())})
+            doFile(file_doc)
+        except Exception as e:
+            logger.error("Error in polygonize job", extra={"error": str(e), "traceback": traceback.format_exc()})
+            files_collection.update_one(
+                {"_id": file_doc["_id"]},
+                {"$set": {"metadata.precompute.status": "error", "metadata.precompute.error": str(e)}}
+            )
+
+
+# Run the worker
+if __name__ == "__main__":
+    main()